@@ -1,10 +1,10 @@
 import reflowrestclient.utils as Rest
+from reflowrestclient import panels
 import flowio
 import json
 import csv
 import sys
 import os
-import re
 import hashlib
 import getpass
 
@@ -75,21 +75,15 @@ class FCSFile(object):
 
         self.acq_date = None
 
+    def parameter_dict(self):
+        return panels.file_parameter_dict(self.file_path, self.metadata)
+
     def is_site_panel_match(self, reflow_host, reflow_token, site_panel_pk):
-        param_dict = {}
-        for key in self.metadata:
-            key_matches = re.search('^P(\d+)([N,S])$', key, flags=re.IGNORECASE)
-            if key_matches:
-                channel_number = int(key_matches.group(1))
-                n_or_s = str.lower(key_matches.group(2))
-                if not channel_number in param_dict:
-                    param_dict[channel_number] = {}
-                param_dict[channel_number][n_or_s] = self.metadata[key]
         return Rest.is_site_panel_match(
             reflow_host,
             reflow_token,
             site_panel_pk,
-            param_dict)
+            self.parameter_dict())
 
     def exists_in_project(self, reflow_host, reflow_token, reflow_project_pk):
         try:
@@ -165,7 +159,11 @@ if 'data' in subjects:
 else:
     sys.exit('Server reported no subjects')
 
-site_panels = Rest.get_site_panels(host, token, project_pk=project_pk)['data']
+# all the project's site panels, fetched once to match every file against
+panel_matcher = Rest.get_project_panel_matcher(
+    host,
+    token,
+    project_pk=project_pk)
 stimulations = Rest.get_stimulations(host, token, project_pk=project_pk)['data']
 
 with open(input_file, 'rb') as csv_file:
@@ -216,11 +214,12 @@ with open(input_file, 'rb') as csv_file:
         # determine site_panel_pk
         skip = False
         while not skip:
-            for site_panel in site_panels:
+            matching_site_panels = panel_matcher.matching_site_panels(
+                fcs_obj.parameter_dict())
+            for site_panel in matching_site_panels:
                 if site_panel['project_panel_name'] == fcs_obj.project_panel:
-                    if fcs_obj.is_site_panel_match(host, token, site_panel['id']):
-                        fcs_obj.site_panel_pk = site_panel['id']
-                        break
+                    fcs_obj.site_panel_pk = site_panel['id']
+                    break
             if not fcs_obj.site_panel_pk:
                 print "\tSite panel not found: %s, %s" % (
                     fcs_obj.file_name,
@@ -233,10 +232,10 @@ with open(input_file, 'rb') as csv_file:
                     skip = True
                     continue
                 print "Re-building site panel list..."
-                site_panels = Rest.get_site_panels(
+                panel_matcher = Rest.get_project_panel_matcher(
                     host,
                     token,
-                    project_pk=project_pk)['data']
+                    project_pk=project_pk)
             else:
                 break  # it was found so exit the while loop
 
@@ -0,0 +1,82 @@
+"""
+Micro-benchmark of the response decode path for each installed JSON codec,
+using payloads shaped like get_samples and get_sample_clusters responses.
+
+Like the other examples, it imports the installed reflowrestclient
+package, install it first from the repository root (orjson and ujson
+are benchmarked too when installed):
+
+    pip install .
+    python examples/benchmark_json_codecs.py
+"""
+from __future__ import print_function
+
+import json
+import random
+import timeit
+
+from reflowrestclient import json_codecs
+
+
+def sample_payload(count=2000):
+    return [
+        {
+            'id': pk,
+            'subject': random.randint(1, 500),
+            'subject_code': 'SUBJ-%05d' % random.randint(1, 500),
+            'site': random.randint(1, 20),
+            'site_panel': random.randint(1, 100),
+            'panel_name': 'Panel %d' % random.randint(1, 10),
+            'visit': random.randint(1, 5),
+            'specimen': random.randint(1, 5),
+            'pretreatment': 'In vitro',
+            'storage': 'Fresh',
+            'stimulation': random.randint(1, 10),
+            'compensation': None,
+            'acquisition_date': '2014-03-%02d' % random.randint(1, 28),
+            'upload_date': '2014-04-01T12:00:00Z',
+            'original_filename': 'sample_%d.fcs' % pk,
+            'sha1': '%040x' % random.getrandbits(160),
+        }
+        for pk in range(count)
+    ]
+
+
+def sample_cluster_payload(count=40, events=50000):
+    return [
+        {
+            'id': pk,
+            'cluster': pk % 8,
+            'sample': pk // 8,
+            'parameters': [
+                {'channel': channel, 'location': random.random()}
+                for channel in range(12)
+            ],
+            'event_indices': sorted(random.sample(range(events * 4), events)),
+            'components': [
+                {'covariance': [random.random() for _ in range(144)]}
+            ],
+        }
+        for pk in range(count)
+    ]
+
+
+def main():
+    payloads = [
+        ('samples', json.dumps(sample_payload()).encode('utf-8')),
+        ('sample clusters', json.dumps(
+            sample_cluster_payload()).encode('utf-8')),
+    ]
+
+    for payload_name, body in payloads:
+        print("%s (%.1f MB)" % (payload_name, len(body) / 1024.0 ** 2))
+
+        for codec_name in json_codecs.available_codecs():
+            codec = json_codecs.get_codec(codec_name)
+            seconds = min(
+                timeit.repeat(lambda: codec.loads(body), number=1, repeat=5))
+            print("    %-8s %8.1f ms" % (codec_name, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Micro-benchmark of the per-call overhead of each client transport, for
+small metadata GETs against a local HTTP server returning a tiny JSON
+object. CPU time is measured on the calling thread only, so it excludes
+the server.
+
+Like the other examples, it imports the installed reflowrestclient
+package, install it first from the repository root:
+
+    pip install .
+    python examples/benchmark_transports.py
+"""
+from __future__ import print_function
+
+import json
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+from reflowrestclient.client import ReFlowClient, METHOD
+from reflowrestclient.transports import TRANSPORTS
+
+BODY = json.dumps({
+    'id': 42,
+    'subject_code': 'SUBJ-00042',
+    'subject_group_name': 'Control',
+    'project': 1,
+}).encode('utf-8')
+
+RESPONSE = (
+    b'HTTP/1.1 200 OK\r\n'
+    b'Content-Type: application/json\r\n'
+    b'Content-Length: ' + str(len(BODY)).encode('ascii') + b'\r\n'
+    b'\r\n' + BODY
+)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        # a single write, so the benchmark doesn't wait on delayed ACKs
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, *args):
+        pass
+
+
+def thread_time():
+    if hasattr(time, 'thread_time'):
+        return time.thread_time()
+    return time.clock()
+
+
+def main(calls=2000):
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    host = '127.0.0.1:%d' % server.server_address[1]
+
+    for name in sorted(TRANSPORTS):
+        client = ReFlowClient(
+            host,
+            token='benchmark',
+            method=METHOD['http'],
+            transport=name
+        )
+        client.get_subject(42)  # warm up the connection
+
+        start_time = time.time()
+        start_cpu = thread_time()
+        for _ in range(calls):
+            client.get_subject(42)
+        cpu = thread_time() - start_cpu
+        seconds = time.time() - start_time
+
+        client.close()
+
+        print("%-8s %8.1f us CPU / call %8.1f us wall / call" % (
+            name, cpu / calls * 1e6, seconds / calls * 1e6))
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -26,22 +26,25 @@ response_dict = utils.get_sample_clusters(
 )
 
 sample_cluster_list = response_dict['data']
-sample_dict = {}
 
 results = list()  # a list of rows, each row a list of values
 
-for sc in sample_cluster_list:
-    sample_pk = sc['sample']
-    if not sample_pk in sample_dict.keys():
-        response_dict = utils.get_sample(host, token, sample_pk=sample_pk)
-        sample_dict[sample_pk] = response_dict['data']
+# fetch each sample once, concurrently, then each sample's subject
+sample_dict = utils.get_samples_by_pks(
+    host,
+    token,
+    [sc['sample'] for sc in sample_cluster_list]
+)
 
-        subject_pk = sample_dict[sample_pk]['subject']
+utils.prefetch(host, token, list(sample_dict.values()), ['subject'])
 
-        response_dict = utils.get_subject(host, token, subject_pk=subject_pk)
-        sample_dict[sample_pk]['subject_group_name'] = response_dict['data']['subject_group_name']
+for sample in sample_dict.values():
+    sample['total_events'] = 0  # start w/zero
+    sample['subject_group_name'] = \
+        sample['subject_object']['subject_group_name']
 
-        sample_dict[sample_pk]['total_events'] = 0  # start w/zero
+for sc in sample_cluster_list:
+    sample_pk = sc['sample']
 
     # keep a running total of the sample's events
     sample_dict[sample_pk]['total_events'] += len(sc['event_indices'])
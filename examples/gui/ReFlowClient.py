@@ -13,6 +13,7 @@ from threading import Thread
 from exceptions import TypeError
 
 import reflowrestclient.utils as rest
+from reflowrestclient import panels
 import flowio
 
 VERSION = '0.13'
@@ -1571,22 +1572,22 @@ class Application(Tkinter.Frame):
 
         site_panel_pk = self.site_panel_dict[site_panel_selection]
 
-        for fcs_file in self.file_dict:
-            param_dict = {}
-            metadata = self.file_dict[fcs_file].flow_metadata
-            for key in metadata:
-                matches = re.search('^P(\d+)([N,S])$', key, flags=re.IGNORECASE)
-                if matches:
-                    channel_number = int(matches.group(1))
-                    n_or_s = str.lower(matches.group(2))
-                    if not param_dict.has_key(channel_number):
-                        param_dict[channel_number] = {}
-                    param_dict[channel_number][n_or_s] = metadata[key]
-            is_match = rest.is_site_panel_match(
+        # fetch the site panel once for all the files
+        try:
+            matcher = rest.get_site_panel_matcher(
                 self.host,
                 self.token,
-                site_panel_pk,
-                param_dict)
+                site_panel_pk)
+        except IOError, e:
+            print e
+            matcher = None
+
+        for fcs_file in self.file_dict:
+            # cached per file, so switching panels doesn't re-parse
+            param_dict = panels.file_parameter_dict(
+                fcs_file,
+                self.file_dict[fcs_file].flow_metadata)
+            is_match = matcher is not None and matcher.is_match(param_dict)
 
             if is_match:
                 self.file_dict[fcs_file].mark_as_matching()
@@ -1,3 +1,4 @@
 __all__ = []
 
+from reflowrestclient import client
 from reflowrestclient import utils
\ No newline at end of file
@@ -0,0 +1,4 @@
+__all__ = []
+
+from reflowrestclient.aio import client
+from reflowrestclient.aio import utils
\ No newline at end of file
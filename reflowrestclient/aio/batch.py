@@ -0,0 +1,74 @@
+import asyncio
+import inspect
+
+from reflowrestclient.batch import Batch
+
+
+class AsyncBatch(Batch):
+    """
+    asyncio version of batch.Batch, used with "async with". Queued calls
+    return asyncio futures, which are done once the block ends:
+
+        async with client.batch() as batch:
+            futures = [batch.get_sample(pk) for pk in sample_pks]
+
+        samples = [future.result()['data'] for future in futures]
+
+    max_workers of None leaves the limit to the client's max_concurrency.
+    """
+
+    def __init__(self, client, max_workers=None):
+        super(AsyncBatch, self).__init__(client, max_workers=max_workers)
+
+    @staticmethod
+    def new_future():
+        return asyncio.get_running_loop().create_future()
+
+    def __enter__(self):
+        raise TypeError("Use 'async with' with AsyncBatch")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            await self.run()
+        else:
+            self.cancel()
+
+    async def run(self):
+        """
+        Runs the queued calls, returns once all have finished
+        """
+        calls, self.calls = self.calls, []
+        self._futures = {}
+
+        semaphore = None
+        if self.max_workers is not None:
+            semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def call_method(method, args, kwargs):
+            result = method(*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+
+        async def run_call(call):
+            future, method, args, kwargs = call
+            if future.done():
+                return
+
+            try:
+                if semaphore is None:
+                    result = await call_method(method, args, kwargs)
+                else:
+                    async with semaphore:
+                        result = await call_method(method, args, kwargs)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+
+        await asyncio.gather(*[run_call(call) for call in calls])
@@ -0,0 +1,1280 @@
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+
+import aiohttp
+
+from reflowrestclient.client import ReFlowClient, METHOD, NO_RESPONSE, \
+    DEADLINE_EXCEEDED, ACCEPT_ENCODING
+from reflowrestclient.downloads import TempFileWriter, PartFileWriter, \
+    SegmentedFileWriter, hash_file
+from reflowrestclient.retry import RetryPolicy
+from reflowrestclient.aio.batch import AsyncBatch
+from reflowrestclient import json_codecs, limits, pagination, panels, \
+    related, streaming, timeouts
+
+# transient request errors worth retrying
+RETRY_EXCEPTIONS = (
+    aiohttp.ClientConnectionError,
+    aiohttp.ClientPayloadError,
+    asyncio.TimeoutError
+)
+
+# seconds between checks for a free slot of a shared limiter
+LIMIT_POLL_INTERVAL = 0.05
+
+
+def _response_dict(response, body, ok_status, loads=json.loads):
+    """
+    Returns the same status/reason/data dictionary as
+    ReFlowClient.response_dict, from an aiohttp response and its body
+    """
+    if response.status == ok_status:
+        try:
+            data = loads(body)
+        except Exception as e:
+            data = body.decode(response.charset or 'utf-8', 'replace')
+            print(e)
+    else:
+        data = body.decode(response.charset or 'utf-8', 'replace')
+
+    return {
+        'status': response.status,
+        'reason': response.reason,
+        'data': data,
+    }
+
+
+def _encoded_size(response, body):
+    """
+    Returns the size of the response body as received. aiohttp only
+    exposes the decoded body, so for compressed responses this relies on
+    Content-Length (chunked compressed responses count as uncompressed).
+    """
+    if response.headers.get('Content-Encoding') and \
+            'Content-Length' in response.headers:
+        return int(response.headers['Content-Length'])
+    return len(body)
+
+
+class AsyncReFlowClient(ReFlowClient):
+    """
+    asyncio version of ReFlowClient, built on aiohttp.
+
+    All the endpoint methods of ReFlowClient are available here and return
+    coroutines resolving to the same status/reason/data dictionaries.
+    Requests share a single pool of connections to the host, at most
+    max_concurrency of them are in flight at once, and downloads are
+    streamed to disk in chunks.
+
+    The aiohttp session is bound to the event loop it was created in, use
+    "async with" or await close() before that loop ends.
+
+    Options:
+        'max_concurrency': max number of requests in flight at once
+        'pool_maxsize': max number of connections kept open to the host
+        'keep_alive': set to False to close the connection after each request
+        'chunk_size': size in bytes of the chunks streamed to disk
+        'download_segments': number of byte ranges FCS sample downloads
+                             are split into and fetched in parallel,
+                             1 (the default) uses a single stream
+        'min_segment_size': minimum size in bytes of a download segment
+        'sample_cache': a cache.SampleCache used by the FCS sample
+                        downloads, None (the default) disables caching
+        'response_cache': a cache.ResponseCache used by get_request to
+                          revalidate responses with conditional GETs,
+                          None (the default) disables it
+        'metadata_cache': a cache.MetadataCache of single objects, see
+                          ReFlowClient
+        'compress_min_size': JSON request bodies of at least this many
+                             bytes are sent gzip compressed, None (the
+                             default) never compresses request bodies
+        'retry_policy': a retry.RetryPolicy for failed requests, the
+                        default retries idempotent requests up to 3 times
+        'connect_timeout': seconds to wait for a connection to the host
+        'read_timeout': seconds to wait for the host to send data (between
+                        bytes, not for the whole response)
+        'json_codec': name of the JSON library to use, see ReFlowClient
+        'token_store': a tokens.TokenStore for the tokens obtained with
+                       the credentials, see ReFlowClient
+        'credentials': function (or coroutine function) returning a
+                       (username, password) tuple, used to log in (again)
+                       when there is no token or the host rejects it
+        'limiter': a limits.AdaptiveLimiter, see ReFlowClient
+        'rate_limit': max number of requests per second, or a
+                      limits.TokenBucket
+
+    Under a deadline (see timeouts.deadline) every request is also limited
+    to the time left.
+    """
+
+    def __init__(
+            self,
+            host,
+            token=None,
+            method=METHOD['https'],
+            max_concurrency=20,
+            pool_maxsize=20,
+            keep_alive=True,
+            chunk_size=64 * 1024,
+            download_segments=1,
+            min_segment_size=8 * 1024 * 1024,
+            sample_cache=None,
+            response_cache=None,
+            compress_min_size=None,
+            retry_policy=None,
+            connect_timeout=10,
+            read_timeout=60,
+            json_codec=None,
+            token_store=None,
+            credentials=None,
+            limiter=None,
+            rate_limit=None,
+            metadata_cache=None):
+        self.host = host
+        self.token = token
+        self.method = method
+        self.token_store = token_store
+        self.credentials = credentials
+
+        if rate_limit is not None and \
+                not isinstance(rate_limit, limits.TokenBucket):
+            rate_limit = limits.TokenBucket(rate_limit)
+        self.limiter = limiter
+        self.rate_limit = rate_limit
+
+        self.max_concurrency = max_concurrency
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.chunk_size = chunk_size
+        self.download_segments = download_segments
+        self.min_segment_size = min_segment_size
+        self.sample_cache = sample_cache
+        self.response_cache = response_cache
+        self.metadata_cache = metadata_cache
+        self.compress_min_size = compress_min_size
+
+        if retry_policy is None:
+            retry_policy = RetryPolicy()
+        self.retry_policy = retry_policy
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.json_codec = json_codecs.get_codec(json_codec)
+
+        self.response_bytes = 0
+        self.response_decoded_bytes = 0
+        self.request_bytes = 0
+        self.request_uncompressed_bytes = 0
+        self._stats_lock = threading.Lock()
+
+        self.session = None
+        self._semaphore = None
+        self._auth_lock = None
+        self._limit_condition = None
+        self._loop = None
+
+    def __enter__(self):
+        raise TypeError("Use 'async with' with AsyncReFlowClient")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """
+        Closes all pooled connections
+        """
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    def _get_session(self):
+        loop = asyncio.get_running_loop()
+
+        if self.session is None or self.session.closed or \
+                self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_maxsize,
+                force_close=not self.keep_alive,
+                ssl=False
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                headers={
+                    'User-Agent': 'python',
+                    'Accept-Encoding': ACCEPT_ENCODING
+                }
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._auth_lock = asyncio.Lock()
+            self._limit_condition = asyncio.Condition()
+            self._loop = loop
+
+        return self.session
+
+    def request_timeout(self):
+        """
+        Returns the aiohttp.ClientTimeout for a request, limited to the
+        time left before the current deadline. Raises
+        timeouts.DeadlineExceeded if it passed.
+        """
+        deadline = timeouts.current_deadline()
+
+        total = None
+        if deadline is not None:
+            total = deadline.cap(None)
+
+        return aiohttp.ClientTimeout(
+            total=total,
+            sock_connect=self.connect_timeout,
+            sock_read=self.read_timeout
+        )
+
+    async def authenticate(self, failed_token=None):
+        """
+        See ReFlowClient.authenticate, credentials may also be a coroutine
+        function
+        """
+        if self.credentials is None:
+            return None
+
+        self._get_session()
+
+        async with self._auth_lock:
+            if self.token is not None and self.token != failed_token:
+                # already replaced by another task
+                return self.token
+
+            credentials = self.credentials()
+            if inspect.isawaitable(credentials):
+                credentials = await credentials
+            username, password = credentials
+
+            token = None
+            if self.token_store is not None:
+                token = self.token_store.get(self.host, username)
+                if token == failed_token:
+                    token = None
+
+            if token is None:
+                token = await self.get_token(username, password)
+                if token is not None and self.token_store is not None:
+                    self.token_store.store(self.host, username, token)
+
+            # delete all the user credentials
+            del(credentials, username, password)
+
+            if token is not None:
+                self.token = token
+
+        return token
+
+    async def request(self, verb, url, headers=None, data_function=None,
+                      **kwargs):
+        """
+        Sends a request through the pooled session, adding the
+        authorization header and the client's timeouts, and logging in
+        again on a 401 like ReFlowClient.request. Returns the aiohttp
+        response, which must be released. Note this bypasses the
+        max_concurrency limit. See retry_request for data_function.
+        """
+        if self.token is None and self.credentials is not None:
+            await self.authenticate()
+
+        token = self.token
+        if data_function is not None:
+            kwargs['data'] = data_function()
+        response = await self.send_request(verb, url, headers, **kwargs)
+
+        if response.status == 401 and self.credentials is not None:
+            if await self.authenticate(failed_token=token) is not None:
+                response.release()
+                if data_function is not None:
+                    kwargs['data'] = data_function()
+                response = await self.send_request(
+                    verb, url, headers, **kwargs)
+
+        return response
+
+    async def send_request(self, verb, url, headers=None, **kwargs):
+        """
+        Sends a single request, within the limits, see
+        ReFlowClient.send_request
+        """
+        await self.wait_for_limits()
+
+        request_headers = self.auth_headers()
+        if headers is not None:
+            request_headers.update(headers)
+
+        start_time = time.time()
+        try:
+            kwargs.setdefault('timeout', self.request_timeout())
+            response = await self._get_session().request(
+                verb,
+                url,
+                headers=request_headers,
+                **kwargs
+            )
+        except RETRY_EXCEPTIONS:
+            await self.release_limit(error=True)
+            raise
+        except BaseException:
+            # including cancellation, the slot must be given back
+            await self.release_limit()
+            raise
+
+        # for streamed responses, the time until the headers arrived
+        await self.release_limit(
+            latency=time.time() - start_time,
+            status=response.status
+        )
+
+        return response
+
+    async def wait_for_limits(self):
+        """
+        Waits until a request may be sent under the rate limit and, with
+        a limiter, takes a slot for it, see ReFlowClient.wait_for_limits
+        """
+        deadline = timeouts.current_deadline()
+
+        if self.rate_limit is not None:
+            delay = self.rate_limit.reserve()
+            if deadline is not None and delay >= deadline.remaining():
+                raise timeouts.DeadlineExceeded(
+                    "Rate limit delay exceeds the deadline")
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        if self.limiter is None:
+            return
+
+        self._get_session()
+
+        async with self._limit_condition:
+            while not self.limiter.try_acquire():
+                # slots freed by other clients or threads sharing the
+                # limiter don't notify this loop, check every so often
+                timeout = LIMIT_POLL_INTERVAL
+                if deadline is not None:
+                    if deadline.expired:
+                        raise timeouts.DeadlineExceeded(
+                            "Deadline exceeded waiting for the "
+                            "concurrency limit")
+                    timeout = min(timeout, deadline.remaining())
+
+                try:
+                    await asyncio.wait_for(
+                        self._limit_condition.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release_limit(self, latency=None, status=None, error=False):
+        if self.limiter is None:
+            return
+
+        self.limiter.release(latency, status, error)
+
+        async with self._limit_condition:
+            self._limit_condition.notify_all()
+
+    async def may_retry(self, verb, attempt, retry_check=None, delay=0,
+                        idempotent=None):
+        """
+        Like ReFlowClient.may_retry, retry_check may also be a coroutine
+        function
+        """
+        policy = self.retry_policy
+
+        if attempt >= policy.max_retries:
+            return False
+
+        deadline = timeouts.current_deadline()
+        if deadline is not None and delay >= deadline.remaining():
+            return False
+
+        if idempotent is None:
+            idempotent = policy.idempotent(verb)
+
+        if not idempotent:
+            if callable(retry_check):
+                retry_check = retry_check()
+                if inspect.isawaitable(retry_check):
+                    retry_check = await retry_check
+            if not retry_check:
+                return False
+
+        return policy.allow_retry()
+
+    async def retry_request(self, verb, url, retry_check=None,
+                            data_function=None, idempotent=None, **kwargs):
+        """
+        Sends a request like request, retrying as ReFlowClient.retry_request
+        does. Returns the last aiohttp response, which must be released, or
+        raises the last exception. data_function, if given, is called to
+        build the request data for every attempt, for single use data like
+        aiohttp.FormData.
+        """
+        policy = self.retry_policy
+        policy.request_started()
+
+        attempt = 0
+        while True:
+            try:
+                response = await self.request(
+                    verb, url, data_function=data_function, **kwargs)
+            except RETRY_EXCEPTIONS:
+                delay = policy.delay(attempt)
+                if not await self.may_retry(
+                        verb, attempt, retry_check, delay, idempotent):
+                    raise
+            else:
+                if response.status not in policy.retry_statuses:
+                    return response
+                delay = policy.delay(attempt, response.headers)
+                if not await self.may_retry(
+                        verb, attempt, retry_check, delay, idempotent):
+                    return response
+                response.release()
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def read_response(self, verb, url, **kwargs):
+        """
+        retry_request under the max_concurrency limit, returns the
+        response along with its body
+        """
+        self._get_session()
+
+        async with self._semaphore:
+            response = await self.retry_request(verb, url, **kwargs)
+            try:
+                body = await response.read()
+            finally:
+                response.release()
+
+        return response, body
+
+    async def send(self, verb, url, ok_status, raise_errors=False, **kwargs):
+        """
+        Like read_response, but returns the status/reason/data dictionary.
+        A missing response is reported in the dictionary unless
+        raise_errors is True.
+        """
+        try:
+            response, body = await self.read_response(verb, url, **kwargs)
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(e)
+            return dict(NO_RESPONSE)
+
+        self.count_response_bytes(_encoded_size(response, body), len(body))
+
+        return _response_dict(
+            response,
+            body,
+            ok_status,
+            loads=self.json_codec.loads
+        )
+
+    async def get_request(self, url, params=None, idempotent=True):
+        """
+        Returns a dictionary with the following keys:
+            status: HTTP response status code
+            reason: HTTP response reason
+            data: A dictionary converted from JSON response data
+
+        See ReFlowClient.get_request for the response_cache behavior and
+        idempotent.
+        """
+        cache = self.response_cache
+        headers = None
+        if cache is not None:
+            headers = cache.request_headers(url, params)
+
+        response, body = await self.read_response(
+            'GET',
+            url,
+            headers=headers,
+            params=params,
+            idempotent=idempotent
+        )
+
+        if response.status == 304:
+            data = cache.get(url, params)
+            if data is not None:
+                return {
+                    'status': 200,
+                    'reason': 'OK',
+                    'data': data,
+                }
+
+            # dropped from the cache since the request was sent
+            response, body = await self.read_response(
+                'GET',
+                url,
+                params=params,
+                idempotent=idempotent
+            )
+
+        self.count_response_bytes(_encoded_size(response, body), len(body))
+
+        result = _response_dict(
+            response,
+            body,
+            200,
+            loads=self.json_codec.loads
+        )
+
+        if cache is not None and response.status == 200 and \
+                isinstance(result['data'], (dict, list)):
+            cache.store(url, params, response.headers, result['data'])
+
+        return result
+
+    async def get_object(self, endpoint, pk):
+        """
+        GET the object with the given PK from the endpoint, through the
+        metadata_cache, see ReFlowClient.get_object
+        """
+        cache = self.metadata_cache
+        if cache is not None:
+            data = cache.get(self.host, endpoint, pk)
+            if data is not None:
+                return {
+                    'status': 200,
+                    'reason': 'OK',
+                    'data': data,
+                }
+
+        result = await self.get_request(self.build_url(endpoint, pk))
+
+        if cache is not None and result['status'] == 200 and \
+                isinstance(result['data'], dict):
+            cache.store(self.host, endpoint, pk, result['data'])
+
+        return result
+
+    async def cache_objects(self, endpoint, result):
+        """
+        Awaits the result of a list endpoint and warms the metadata_cache
+        with its objects, see ReFlowClient.cache_objects
+        """
+        result = await result
+
+        return super(AsyncReFlowClient, self).cache_objects(endpoint, result)
+
+    async def list_objects(self, endpoint, pks, in_filter):
+        """
+        GET the objects with the given PKs from the endpoint's list with
+        the in_filter query parameter, see ReFlowClient.list_objects
+        """
+        requested = set(str(pk) for pk in pks)
+
+        pages = self.iter_pages(
+            self.build_url(endpoint),
+            {in_filter: ','.join(str(pk) for pk in pks)}
+        )
+
+        # like match_objects, stop at the first record not requested
+        records = []
+        try:
+            async for record in pages:
+                records.append(record)
+                if str(record.get('id')) not in requested:
+                    break
+        finally:
+            await pages.aclose()
+
+        return self.match_objects(endpoint, pks, records)
+
+    async def get_objects(self, endpoint, pks, max_workers=8,
+                          in_filter=None, in_filter_size=100):
+        """
+        GET the objects with the given PKs from the endpoint concurrently,
+        at most max_workers at once (None for no limit other than
+        max_concurrency), see ReFlowClient.get_objects
+        """
+        pks = self.distinct_pks(pks)
+        objects = self.cached_objects(endpoint, pks)
+        pending = [pk for pk in pks if pk not in objects]
+
+        semaphore = None
+        if max_workers is not None:
+            semaphore = asyncio.Semaphore(max_workers)
+
+        async def limited(coroutine):
+            if semaphore is None:
+                return await coroutine
+            async with semaphore:
+                return await coroutine
+
+        if in_filter is not None and pending:
+            chunks = [
+                pending[start:start + in_filter_size]
+                for start in range(0, len(pending), in_filter_size)
+            ]
+
+            # the first chunk tells whether the host filters the list
+            found, filtered = await self.list_objects(
+                endpoint, chunks[0], in_filter)
+            objects.update(found)
+
+            if filtered:
+                results = await asyncio.gather(*[
+                    limited(self.list_objects(endpoint, chunk, in_filter))
+                    for chunk in chunks[1:]
+                ])
+                for found, filtered in results:
+                    objects.update(found)
+
+            pending = [pk for pk in pending if pk not in objects]
+
+        results = await asyncio.gather(*[
+            limited(self.get_object(endpoint, pk)) for pk in pending
+        ])
+        for pk, result in zip(pending, results):
+            self.add_object(objects, pk, result)
+
+        return objects
+
+    async def prefetch(self, records, relations, max_workers=8,
+                       in_filter=None):
+        """
+        Fetches the objects related to records for the given relations
+        and attaches them, see ReFlowClient.prefetch
+        """
+        fetched = {}
+
+        for level in related.plan(relations):
+            results = await asyncio.gather(*[
+                self.get_objects(
+                    related.RELATIONS[relation][2],
+                    related.foreign_keys(records, relation),
+                    max_workers=max_workers,
+                    in_filter=in_filter)
+                for relation in level
+            ])
+            for relation, objects in zip(level, results):
+                fetched[relation] = related.attach(records, relation, objects)
+
+        return fetched
+
+    async def get_page(self, url, params=None):
+        """
+        Returns the records and next page URL of a list endpoint page,
+        see ReFlowClient.get_page
+        """
+        response = await self.get_request(url, params)
+        if response['status'] != 200:
+            raise pagination.ResponseError(response)
+
+        return pagination.page_records(response['data'])
+
+    async def iter_pages(self, url, params=None, page_size=None,
+                         page_size_param='page_size'):
+        """
+        Asynchronous generator yielding the records of a list endpoint,
+        following the host's pagination. While the records of one page
+        are consumed, the next page is already being fetched. See
+        ReFlowClient.iter_pages for the options.
+        """
+        params = dict(params or {})
+        if page_size is not None:
+            params[page_size_param] = page_size
+
+        next_page = asyncio.ensure_future(self.get_page(url, params))
+        try:
+            while next_page is not None:
+                records, next_url = await next_page
+
+                next_page = None
+                if next_url:
+                    next_page = asyncio.ensure_future(
+                        self.get_page(next_url))
+
+                for record in records:
+                    yield record
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+
+    async def iterate(self, list_method, **kwargs):
+        """
+        Asynchronous generator over the records of list_method, one of
+        the client's get_* list methods, see ReFlowClient.iterate:
+
+            async for sample in client.iterate(client.get_samples):
+                ...
+        """
+        page_options = {}
+        for option in ('page_size', 'page_size_param'):
+            if option in kwargs:
+                page_options[option] = kwargs.pop(option)
+
+        url, params = self.list_query(list_method, **kwargs)
+
+        async for record in self.iter_pages(url, params, **page_options):
+            yield record
+
+    async def stream_request(self, url, params=None, raw_fields=None):
+        """
+        Asynchronous generator yielding the elements of a JSON array
+        response as they are received, following the pages of a
+        paginated list, see ReFlowClient.stream_request
+        """
+        self._get_session()
+
+        decoder = streaming.ArrayDecoder(
+            raw_fields=raw_fields,
+            loads=self.json_codec.loads
+        )
+        next_url = None
+
+        async with self._semaphore:
+            response = await self.retry_request('GET', url, params=params)
+
+            try:
+                if response.status != 200:
+                    raise pagination.ResponseError(
+                        _response_dict(response, await response.read(), 200))
+
+                chunks = self.iter_chunks(response)
+                head = b''
+                async for chunk in chunks:
+                    head += chunk
+                    if streaming.is_object(head) is not None:
+                        break
+
+                if streaming.is_object(head):
+                    body = [head]
+                    async for chunk in chunks:
+                        body.append(chunk)
+                    records, next_url = pagination.page_records(
+                        self.json_codec.loads(b''.join(body)))
+                    for record in records:
+                        yield decoder.convert(record)
+                else:
+                    for element in decoder.feed(head):
+                        yield element
+                    async for chunk in chunks:
+                        for element in decoder.feed(chunk):
+                            yield element
+                    decoder.close()
+            finally:
+                response.release()
+
+        if next_url:
+            async for record in self.iter_pages(next_url):
+                yield decoder.convert(record)
+
+    async def stream(self, list_method, raw_fields=None, **kwargs):
+        """
+        Asynchronous generator over the records of list_method, decoded
+        while the response streams in, see ReFlowClient.stream
+        """
+        url, params = self.list_query(list_method, **kwargs)
+
+        async for record in self.stream_request(
+                url, params, raw_fields=raw_fields):
+            yield record
+
+    async def iter_chunks(self, response):
+        """
+        Yields the response body in chunks of chunk_size bytes, raising
+        timeouts.DeadlineExceeded once the current deadline passed
+        """
+        deadline = timeouts.current_deadline()
+
+        async for chunk in response.content.iter_chunked(self.chunk_size):
+            if deadline is not None:
+                deadline.check()
+            yield chunk
+
+    async def download(self, url, file_path, resume=False, sha1=None):
+        """
+        GET url and stream the response body to file_path in chunks of
+        chunk_size bytes. The body is written to a temporary file that only
+        replaces file_path once the whole body has been received.
+
+        If resume is True, the body is written to <file_path>.part instead
+        and kept if the download fails. A later call with resume=True
+        requests only the remaining bytes (see downloads.PartFileWriter).
+
+        The body is hashed as it streams to disk. If sha1 is given and does
+        not match, the file is not saved and the status is None with the
+        reason 'SHA-1 mismatch'.
+
+        Returns a dictionary with keys:
+            'status': The HTTP response code, 200 for a resumed download
+                      completed with a 206 partial response
+            'reason': The HTTP response reason
+            'data': Empty string on success, response text otherwise
+            'file_path': The path of the downloaded file
+            'bytes': Number of bytes received by this call
+            'sha1': Hex SHA-1 digest of the downloaded file
+        """
+        if resume:
+            writer = PartFileWriter(url, file_path, sha1=sha1)
+        else:
+            writer = TempFileWriter(file_path, sha1=sha1)
+
+        data = ''
+        self._get_session()
+
+        async with self._semaphore:
+            try:
+                r = await self.retry_request(
+                    'GET',
+                    url,
+                    headers=writer.request_headers()
+                )
+                if r.status == 416 and writer.offset > 0:
+                    # the partial file doesn't fit the remote one, start over
+                    r.release()
+                    writer.discard()
+                    r = await self.retry_request(
+                        'GET',
+                        url,
+                        headers=writer.request_headers()
+                    )
+            except Exception as e:
+                print(e)
+                return dict(NO_RESPONSE)
+
+            status = r.status
+            reason = r.reason
+            try:
+                if status in writer.ok_statuses:
+                    try:
+                        writer.open(status, r.headers)
+                        async for chunk in self.iter_chunks(r):
+                            writer.write(chunk)
+                        writer.commit()
+                    except Exception as e:
+                        writer.abort()
+                        print(e)
+                        return self.failed_download_dict(
+                            file_path, writer, e)
+
+                    # the whole file is there, however it was received
+                    status = 200
+                    reason = 'OK'
+                else:
+                    data = await r.text()
+            finally:
+                r.release()
+
+        return {
+            'status': status,
+            'reason': reason,
+            'data': data,
+            'file_path': file_path,
+            'bytes': writer.size,
+            'sha1': writer.hash.hexdigest(),
+        }
+
+    async def segmented_download(self, url, file_path, sha1=None):
+        """
+        GET url as download_segments byte ranges fetched concurrently and
+        written straight into a preallocated temporary file, which replaces
+        file_path once every segment is complete. See
+        ReFlowClient.segmented_download for the details.
+        """
+        range_headers = {'Accept-Encoding': 'identity'}
+        self._get_session()
+
+        try:
+            async with self._semaphore:
+                async with await self.retry_request(
+                        'GET',
+                        url,
+                        headers=dict(range_headers, Range='bytes=0-0')
+                ) as probe:
+                    if probe.status not in (200, 206):
+                        return {
+                            'status': probe.status,
+                            'reason': probe.reason,
+                            'data': await probe.text(),
+                            'file_path': file_path,
+                            'bytes': 0,
+                        }
+                    length, ranges = self.plan_segmented_download(
+                        probe.status, probe.headers)
+                    etag = probe.headers.get('ETag')
+        except Exception as e:
+            print(e)
+            return dict(NO_RESPONSE)
+
+        if len(ranges) < 2:
+            return await self.download(url, file_path, sha1=sha1)
+
+        if etag:
+            # a changed file is sent as a 200, failing the segment
+            range_headers['If-Range'] = etag
+
+        writer = SegmentedFileWriter(file_path, length, sha1=sha1)
+
+        async def download_segment(start, end):
+            async with self._semaphore:
+                async with await self.retry_request(
+                        'GET',
+                        url,
+                        headers=dict(
+                            range_headers,
+                            Range='bytes=%d-%d' % (start, end))
+                ) as r:
+                    self.check_segment_response(
+                        r.status, r.reason, r.headers, start, end)
+
+                    with writer.segment(start, end) as segment:
+                        async for chunk in self.iter_chunks(r):
+                            segment.write(chunk)
+
+        try:
+            writer.open()
+            await asyncio.gather(
+                *[download_segment(start, end) for start, end in ranges])
+            writer.commit()
+        except Exception as e:
+            writer.abort()
+            print(e)
+            return self.failed_download_dict(file_path, writer, e)
+
+        return {
+            'status': 200,
+            'reason': 'OK',
+            'data': '',
+            'file_path': file_path,
+            'bytes': writer.size,
+            'sha1': writer.hash.hexdigest() if writer.hash else None,
+        }
+
+    async def download_sample(
+            self,
+            sample_pk,
+            filename=None,
+            directory=None,
+            resume=False,
+            sha1=None,
+            verify=False):
+        """
+        Download sample as FCS, see ReFlowClient.download_sample
+        """
+        if sha1 is None and (verify or self.sample_cache is not None):
+            response = await self.get_sample(sample_pk)
+            if response['status'] != 200:
+                return response
+            sha1 = response['data']['sha1']
+
+        return await super(AsyncReFlowClient, self).download_sample(
+            sample_pk,
+            filename=filename,
+            directory=directory,
+            resume=resume,
+            sha1=sha1
+        )
+
+    async def download_clean_sample(
+            self,
+            sample_pk,
+            filename=None,
+            directory=None,
+            resume=False):
+        """
+        Download clean sample as FCS, see
+        ReFlowClient.download_clean_sample
+        """
+        if self.sample_cache is None:
+            return await super(AsyncReFlowClient, self).download_clean_sample(
+                sample_pk,
+                filename=filename,
+                directory=directory,
+                resume=resume
+            )
+
+        response = await self.get_sample(sample_pk)
+        if response['status'] != 200:
+            return response
+
+        if filename is None:
+            filename = str(sample_pk) + '_clean.fcs'
+        if directory is None:
+            directory = os.getcwd()
+
+        return await self.download_fcs(
+            self.build_url('SAMPLES', sample_pk, 'fcs_clean'),
+            "%s/%s" % (directory, filename),
+            resume=resume,
+            cache_key=response['data']['sha1'] + '_clean'
+        )
+
+    async def download_fcs(
+            self,
+            url,
+            file_path,
+            resume=False,
+            sha1=None,
+            cache_key=None):
+        """
+        Download an FCS file from url, or from the sample cache, see
+        ReFlowClient.download_fcs
+        """
+        result = self.cached_download(cache_key, file_path, sha1)
+        if result is not None:
+            return result
+
+        if self.download_segments > 1 and not resume:
+            result = await self.segmented_download(url, file_path, sha1=sha1)
+        else:
+            result = await self.download(
+                url,
+                file_path,
+                resume=resume,
+                sha1=sha1
+            )
+
+        self.add_to_sample_cache(cache_key, result)
+
+        return result
+
+    async def bulk_download(self, download_function, pk_list, max_workers=4,
+                            deadline=None, **kwargs):
+        """
+        Awaits download_function, one of the client's download_* methods,
+        for every PK in pk_list, running at most max_workers downloads
+        at once. Any other keyword arguments are passed on to
+        download_function. See ReFlowClient.bulk_download for deadline.
+
+        Returns the bulk_download_summary dictionary.
+        """
+        semaphore = asyncio.Semaphore(max_workers)
+
+        if deadline is None:
+            deadline = timeouts.current_deadline()
+        elif not isinstance(deadline, timeouts.Deadline):
+            deadline = timeouts.Deadline(deadline)
+
+        async def download_pk(pk):
+            async with semaphore:
+                if deadline is not None and deadline.expired:
+                    return dict(DEADLINE_EXCEEDED)
+
+                with timeouts.deadline(deadline):
+                    return await download_function(pk, **kwargs)
+
+        start_time = time.time()
+        results = await asyncio.gather(*[download_pk(pk) for pk in pk_list])
+
+        return self.bulk_download_summary(
+            pk_list,
+            list(results),
+            time.time() - start_time
+        )
+
+    def batch(self, max_workers=None):
+        """
+        Returns an aio.batch.AsyncBatch, see ReFlowClient.batch. By default
+        only max_concurrency limits the queued calls.
+        """
+        return AsyncBatch(self, max_workers=max_workers)
+
+    async def post_file(self, url, data, field_name, file_path,
+                        find_existing=None):
+        """
+        POST the form data along with the file at file_path as a multipart
+        upload, returning the status/reason/data dictionary. See
+        ReFlowClient.post_file for find_existing, which may also be a
+        coroutine function.
+        """
+        existing = []
+
+        async def retry_check():
+            try:
+                result = find_existing()
+                if inspect.isawaitable(result):
+                    result = await result
+            except Exception as e:
+                # can't tell whether the POST went through
+                print(e)
+                return False
+
+            if result is not None:
+                existing.append(result)
+                return False
+
+            return True
+
+        # aiohttp closes the file once sent, every attempt opens it again
+        file_objs = []
+
+        def build_form():
+            file_obj = open(file_path, "rb")
+            file_objs.append(file_obj)
+
+            form = aiohttp.FormData()
+            for key, value in data.items():
+                form.add_field(key, str(value))
+            form.add_field(
+                field_name,
+                file_obj,
+                filename=os.path.basename(file_path)
+            )
+            return form
+
+        try:
+            result = await self.send(
+                'POST',
+                url,
+                201,
+                retry_check=retry_check if find_existing else None,
+                data_function=build_form
+            )
+        finally:
+            for file_obj in file_objs:
+                file_obj.close()
+
+        if existing:
+            return existing[0]
+
+        return result
+
+    async def posted_sample(self, file_path):
+        """
+        Returns the POST status/reason/data dictionary of the sample on the
+        host with the same SHA-1 as the file at file_path, None if there
+        is none
+        """
+        sha1 = hash_file(hashlib.sha1(), file_path).hexdigest()
+
+        return self.posted_sample_dict(await self.get_samples(sha1=sha1))
+
+    async def get_token(self, username, password):
+        """
+        Login to host url using user credentials given.
+
+        Returns the authenticating user's token (string) if successful,
+        returns None if authentication failed.
+        """
+        url = self.build_url('TOKEN')
+        data = {
+            'username': username,
+            'password': password,
+        }
+
+        # capped to the current deadline like every other request
+        timeout = self.request_timeout()
+
+        try:
+            async with self._get_session().post(
+                    url, data=data, timeout=timeout) as response:
+                status = response.status
+                reason = response.reason
+                if status == 200:
+                    data = await response.json(content_type=None)
+        except Exception as e:
+            print(e)
+            return None
+
+        if status != 200:
+            print("Authentication failed (%s: %s)" % (status, reason))
+            return None
+
+        if 'token' not in data:
+            print("Authentication token not in response")
+            return None
+
+        return data['token']
+
+    async def login(self, username, password):
+        """
+        Same as get_token, but also saves the token on the client for
+        all subsequent requests (and in the token_store)
+        """
+        token = await self.get_token(username, password)
+
+        if token is not None:
+            self.token = token
+            if self.token_store is not None:
+                self.token_store.store(self.host, username, token)
+
+        return token
+
+    async def is_site_panel_match(self, site_panel_pk, parameter_dict):
+        """
+        GET a serialized ProjectPanel instance
+            site_panel_pk    (required)
+
+        Returns True/False whether dictionary matches the site panel
+        """
+        response = await self.get_site_panel(site_panel_pk)
+
+        return self.site_panel_response_match(response, parameter_dict)
+
+    async def get_site_panel_matcher(self, site_panel_pk):
+        """
+        Returns a panels.SitePanelMatcher for the site panel, see
+        ReFlowClient.get_site_panel_matcher
+        """
+        response = await self.get_site_panel(site_panel_pk)
+
+        return panels.SitePanelMatcher(
+            self.site_panels_from_response(response, single=True))
+
+    async def get_project_panel_matcher(
+            self,
+            project_pk=None,
+            project_panel_pk=None,
+            site_pk=None,
+            panel_type=None):
+        """
+        Returns a panels.PanelMatcher for all the site panels matching
+        the get_site_panels filters, see
+        ReFlowClient.get_project_panel_matcher
+        """
+        response = await self.get_site_panels(
+            project_panel_pk=project_panel_pk,
+            site_pk=site_pk,
+            project_pk=project_pk,
+            panel_type=panel_type
+        )
+        site_panels = self.site_panels_from_response(response)
+
+        async def full_site_panel(site_panel):
+            if 'parameters' in site_panel:
+                return site_panel
+            return self.site_panels_from_response(
+                await self.get_site_panel(site_panel['id']), single=True)
+
+        site_panels = await asyncio.gather(
+            *[full_site_panel(site_panel) for site_panel in site_panels])
+
+        return panels.PanelMatcher(site_panels)
+
+    async def download_compensation(self, *args, **kwargs):
+        result = super(AsyncReFlowClient, self).download_compensation(
+            *args, **kwargs)
+
+        # None is returned for an unsupported data format
+        if result is None:
+            return None
+
+        return await result
+
+    async def download_compensations(self, *args, **kwargs):
+        result = super(AsyncReFlowClient, self).download_compensations(
+            *args, **kwargs)
+
+        # None is returned for an unsupported data format
+        if result is None:
+            return None
+
+        return await result
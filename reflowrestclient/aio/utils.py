@@ -0,0 +1,189 @@
+"""
+asyncio versions of the reflowrestclient.utils functions.
+
+Every function takes the same arguments as its reflowrestclient.utils
+counterpart and returns a coroutine resolving to the same
+status/reason/data dictionary, e.g.:
+
+    response = await get_sample(host, token, sample_pk=42)
+
+Calls for the same host and token share one AsyncReFlowClient, and with
+it a bounded pool of connections.
+"""
+import functools
+import inspect
+from urllib.parse import urlsplit
+
+from reflowrestclient import utils
+from reflowrestclient.client import METHOD, URLS
+from reflowrestclient.aio.client import AsyncReFlowClient
+
+# Options passed to every shared AsyncReFlowClient created by get_client,
+# e.g. max_concurrency or pool_maxsize
+CLIENT_OPTIONS = {}
+
+# reflowrestclient.utils functions mirrored here, all of them take
+# host and token as their first arguments and method as the last
+MIRRORED_FUNCTIONS = (
+    'get_projects',
+    'get_project',
+    'get_projects_by_pks',
+    'get_specimens',
+    'get_subject_groups',
+    'get_subject_groups_by_pks',
+    'get_visit_types',
+    'get_visit_type',
+    'get_visit_types_by_pks',
+    'get_sites',
+    'get_site',
+    'get_sites_by_pks',
+    'get_subjects',
+    'get_subject',
+    'get_subjects_by_pks',
+    'get_project_panels',
+    'get_project_panel',
+    'get_project_panels_by_pks',
+    'get_site_panels',
+    'get_site_panel',
+    'get_site_panels_by_pks',
+    'is_site_panel_match',
+    'get_site_panel_matcher',
+    'get_project_panel_matcher',
+    'get_compensations',
+    'get_compensation',
+    'get_stimulations',
+    'get_stimulation',
+    'get_stimulations_by_pks',
+    'get_samples',
+    'get_sample',
+    'get_samples_by_pks',
+    'prefetch',
+    'download_sample',
+    'download_samples',
+    'download_clean_sample',
+    'post_sample',
+    'get_sample_metadata',
+    'get_sample_collection',
+    'download_compensation',
+    'download_compensations',
+    'post_compensation',
+    'get_processes',
+    'get_workers',
+    'get_process_requests',
+    'get_assigned_process_requests',
+    'get_viable_process_requests',
+    'get_process_request',
+    'request_pr_assignment',
+    'report_pr_error',
+    'verify_pr_assignment',
+    'revoke_pr_assignment',
+    'purge_pr_results',
+    'report_pr_progress',
+    'complete_pr_assignment',
+    'verify_worker',
+    'post_cluster',
+    'post_sample_cluster',
+    'get_sample_clusters',
+    'get_sample_cluster_components',
+    'download_sample_cluster_events',
+    'download_sample_clusters_events',
+)
+
+_clients = {}
+
+
+def get_client(host, token=None, method=METHOD['https']):
+    """
+    Returns the shared AsyncReFlowClient for the given host, token and
+    method, creating it on first use
+    """
+    key = (method, host, token)
+
+    client = _clients.get(key)
+    if client is None:
+        client = AsyncReFlowClient(
+            host,
+            token=token,
+            method=method,
+            **CLIENT_OPTIONS
+        )
+        _clients[key] = client
+
+    return client
+
+
+async def close_clients():
+    """
+    Closes the connections of all the shared clients
+    """
+    for client in list(_clients.values()):
+        await client.close()
+    _clients.clear()
+
+
+async def get_request(token, url, params=None):
+    """
+    Returns a dictionary with the following keys:
+        status: HTTP response status code
+        reason: HTTP response reason
+        data: A dictionary converted from JSON response data
+    """
+    split_url = urlsplit(url)
+    client = get_client(
+        split_url.netloc,
+        token,
+        method='%s://' % split_url.scheme
+    )
+
+    return await client.get_request(url, params)
+
+
+async def get_token(
+        host,
+        username,
+        password,
+        method=METHOD['https'],
+        token_store=None):
+    """
+    Login to host url using user credentials given. With a
+    tokens.TokenStore as token_store, a token stored for the user is
+    returned without logging in, and new tokens are stored.
+
+    Returns the authenticating user's token (string) if successful,
+    returns None if authentication failed.
+    """
+    if token_store is not None:
+        token = token_store.get(host, username)
+        if token is not None:
+            return token
+
+    token = await get_client(host, method=method).get_token(username, password)
+
+    if token is not None and token_store is not None:
+        token_store.store(host, username, token)
+
+    return token
+
+
+def _mirror(function):
+    signature = inspect.signature(function)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+
+        arguments = dict(bound.arguments)
+        client = get_client(
+            arguments.pop('host'),
+            arguments.pop('token'),
+            arguments.pop('method')
+        )
+
+        return getattr(client, function.__name__)(**arguments)
+
+    return wrapper
+
+
+for _name in MIRRORED_FUNCTIONS:
+    globals()[_name] = _mirror(getattr(utils, _name))
@@ -0,0 +1,121 @@
+"""
+Batches of client calls run concurrently.
+
+Inside a batch, client methods return futures instead of running right
+away. The queued calls run concurrently when the batch ends, so code
+making many independent requests one after another becomes concurrent
+with little change:
+
+    with client.batch() as batch:
+        futures = [batch.get_sample(pk) for pk in sample_pks]
+
+    samples = [future.result()['data'] for future in futures]
+
+Identical get_* calls within a batch share a single request (and
+future).
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from reflowrestclient import timeouts
+
+
+class Batch(object):
+    """
+    Queues calls to the client's methods and runs them on exit, at most
+    max_workers at once. Calls are run by the run method, which the
+    with statement calls on a clean exit; leaving the block with an
+    exception cancels the queued calls instead.
+    """
+
+    def __init__(self, client, max_workers=8):
+        self.client = client
+        self.max_workers = max_workers
+
+        self.calls = []
+        self._futures = {}
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+        if name.startswith('_') or not callable(method):
+            raise AttributeError(
+                "Batches only queue client methods, not %s" % name)
+
+        def queue_call(*args, **kwargs):
+            return self.queue(name, *args, **kwargs)
+
+        return queue_call
+
+    def queue(self, name, *args, **kwargs):
+        """
+        Queues a call to the named client method, returns its Future
+        """
+        key = None
+        if name.startswith('get_'):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            try:
+                future = self._futures.get(key)
+            except TypeError:
+                key = None  # unhashable arguments, no dedupe
+                future = None
+
+            if future is not None:
+                return future
+
+        future = self.new_future()
+        self.calls.append((future, getattr(self.client, name), args, kwargs))
+        if key is not None:
+            self._futures[key] = future
+
+        return future
+
+    @staticmethod
+    def new_future():
+        return Future()
+
+    def __len__(self):
+        return len(self.calls)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.run()
+        else:
+            self.cancel()
+
+    @staticmethod
+    def _run_call(call):
+        future, method, args, kwargs = call
+
+        if not future.set_running_or_notify_cancel():
+            return
+
+        try:
+            future.set_result(method(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+
+    def run(self):
+        """
+        Runs the queued calls, returns once all have finished
+        """
+        calls, self.calls = self.calls, []
+        self._futures = {}
+
+        if not calls:
+            return
+
+        executor = ThreadPoolExecutor(
+            max_workers=min(self.max_workers, len(calls)))
+        try:
+            list(executor.map(timeouts.bind(self._run_call), calls))
+        finally:
+            executor.shutdown()
+
+    def cancel(self):
+        for future, method, args, kwargs in self.calls:
+            future.cancel()
+
+        self.calls = []
+        self._futures = {}
@@ -0,0 +1,455 @@
+"""
+Client side caches: an on-disk cache of downloaded sample files, an
+in-memory cache of revalidated JSON responses and an in-memory cache of
+single metadata objects.
+"""
+from collections import OrderedDict
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, eviction runs without an inter-process lock
+    fcntl = None
+
+from reflowrestclient.downloads import commit_temp_file, remove_temp_file
+from reflowrestclient.timeouts import clock
+
+try:
+    STRING_TYPES = (bytes, unicode)
+except NameError:
+    # Python 3
+    STRING_TYPES = (bytes, str)
+
+# Linux ioctl request to share the data blocks of two files (reflink)
+FICLONE = 0x40049409
+
+
+def _reflink(source_path, target_path):
+    if fcntl is None or not sys.platform.startswith('linux'):
+        raise OSError("Reflinks are not supported on this platform")
+
+    with open(source_path, 'rb') as source_file:
+        with open(target_path, 'wb') as target_file:
+            fcntl.ioctl(target_file.fileno(), FICLONE, source_file.fileno())
+
+
+def place_file(source_path, target_path, hard_link=True):
+    """
+    Atomically puts the contents of source_path at target_path, using
+    (in order of preference) a hard link, a reflink or a plain copy
+    """
+    directory, filename = os.path.split(os.path.abspath(target_path))
+    temp_path = os.path.join(
+        directory,
+        '.%s.%s.tmp' % (filename, uuid.uuid4().hex[:12])
+    )
+
+    try:
+        try:
+            if not hard_link:
+                raise OSError("Hard links disabled")
+            os.link(source_path, temp_path)
+        except OSError:
+            try:
+                _reflink(source_path, temp_path)
+            except (IOError, OSError):
+                shutil.copyfile(source_path, temp_path)
+
+        commit_temp_file(temp_path, target_path)
+    except Exception:
+        remove_temp_file(temp_path)
+        raise
+
+
+class SampleCache(object):
+    """
+    Content addressed cache of downloaded FCS files, keyed by the sample's
+    SHA-1, so a file downloaded once is never transferred again.
+
+    Files are stored in <directory>/objects/<first 2 key chars>/<key> and
+    handed out to the download's target path as hard links (or reflinks,
+    or copies where neither is possible). Note a hard linked target shares
+    its data with the cache, so modify downloaded files only after making
+    a copy, or create the cache with hard_links=False.
+
+    The cache holds at most max_bytes, evicting the least recently used
+    files first. Use is tracked with the file access time, set explicitly
+    on every hit. Entries are added with an atomic rename and eviction
+    holds an exclusive lock on <directory>/.lock, so several processes
+    can share one cache directory.
+
+    Options:
+        'max_bytes': size budget of the cache in bytes
+        'hard_links': set to False to never hard link files in or out
+    """
+
+    def __init__(self, directory, max_bytes=10 * 1024 ** 3, hard_links=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hard_links = hard_links
+
+        self.objects_directory = os.path.join(directory, 'objects')
+        self.lock_path = os.path.join(directory, '.lock')
+
+        self.hits = 0
+        self.misses = 0
+
+        if not os.path.isdir(self.objects_directory):
+            try:
+                os.makedirs(self.objects_directory)
+            except OSError:
+                # created by another process in the meantime
+                if not os.path.isdir(self.objects_directory):
+                    raise
+
+    def path(self, key):
+        return os.path.join(self.objects_directory, key[:2], key)
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def _touch(self, path):
+        stat = os.stat(path)
+        os.utime(path, (time.time(), stat.st_mtime))
+
+    def copy_to(self, key, file_path):
+        """
+        Puts the cached file for key at file_path.
+        Returns True on a cache hit, False on a miss.
+        """
+        cached_path = self.path(key)
+
+        try:
+            place_file(cached_path, file_path, hard_link=self.hard_links)
+            self._touch(cached_path)
+        except (IOError, OSError):
+            self.misses += 1
+            return False
+
+        self.hits += 1
+        return True
+
+    def add(self, key, file_path):
+        """
+        Adds the file at file_path to the cache under key, then evicts
+        least recently used files if the cache is over its budget
+        """
+        cached_path = self.path(key)
+
+        if os.path.exists(cached_path):
+            self._touch(cached_path)
+            return
+
+        key_directory = os.path.dirname(cached_path)
+        if not os.path.isdir(key_directory):
+            try:
+                os.makedirs(key_directory)
+            except OSError:
+                if not os.path.isdir(key_directory):
+                    raise
+
+        place_file(file_path, cached_path, hard_link=self.hard_links)
+        self._touch(cached_path)
+
+        self.evict()
+
+    def entries(self):
+        """
+        Returns a list of (last use time, size, path) for all cached files
+        """
+        entries = []
+
+        for key_directory in os.listdir(self.objects_directory):
+            key_path = os.path.join(self.objects_directory, key_directory)
+            if not os.path.isdir(key_path):
+                continue
+            for filename in os.listdir(key_path):
+                if filename.startswith('.'):
+                    continue  # in progress temporary file
+                path = os.path.join(key_path, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # evicted by another process
+                entries.append((stat.st_atime, stat.st_size, path))
+
+        return entries
+
+    def size(self):
+        return sum(entry[1] for entry in self.entries())
+
+    def evict(self, max_bytes=None):
+        """
+        Removes least recently used files until the cache holds at most
+        max_bytes (default is the cache's max_bytes)
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+
+        with open(self.lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+
+            try:
+                entries = sorted(self.entries())
+                total_size = sum(entry[1] for entry in entries)
+
+                for last_used, size, path in entries:
+                    if total_size <= max_bytes:
+                        break
+                    remove_temp_file(path)
+                    total_size -= size
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def clear(self):
+        """
+        Removes every cached file
+        """
+        self.evict(max_bytes=0)
+
+
+class ResponseCache(object):
+    """
+    In-memory cache of decoded JSON responses along with their validators
+    (ETag / Last-Modified), used by ReFlowClient.get_request to revalidate
+    with a conditional GET. When the server replies 304 Not Modified, the
+    cached data is returned without transferring or decoding the body.
+
+    Cached data is shared between calls, treat it as read-only.
+
+    Options:
+        'max_entries': number of responses kept, least recently used
+                       responses are dropped first
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url, params=None):
+        if not params:
+            return url, ()
+        return url, tuple(sorted((k, str(v)) for k, v in params.items()))
+
+    def request_headers(self, url, params=None):
+        """
+        Returns the conditional request headers for a cached response,
+        or an empty dictionary when there is none
+        """
+        with self._lock:
+            entry = self._entries.get(self.key(url, params))
+
+        if entry is None:
+            return {}
+
+        headers = {}
+        if entry['etag'] is not None:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified'] is not None:
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        return headers
+
+    def get(self, url, params=None):
+        """
+        Returns the cached data after the server confirmed it is still
+        current (304), or None if it has been dropped in the meantime
+        """
+        key = self.key(url, params)
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            # re-insert as the most recently used
+            self._entries[key] = entry
+            self.hits += 1
+
+        return entry['data']
+
+    def store(self, url, params, headers, data):
+        """
+        Caches data if the response headers include a validator
+        """
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+
+        if etag is None and last_modified is None:
+            return
+
+        key = self.key(url, params)
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'data': data,
+            }
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def approximate_size(data):
+    """
+    Returns a rough size in bytes of decoded JSON data, about the size
+    of its JSON text
+    """
+    if isinstance(data, dict):
+        return 2 + sum(
+            approximate_size(key) + approximate_size(value) + 2
+            for key, value in data.items()
+        )
+    if isinstance(data, (list, tuple)):
+        return 2 + sum(approximate_size(value) + 1 for value in data)
+    if isinstance(data, STRING_TYPES):
+        return len(data) + 2
+    return 8
+
+
+class MetadataCache(object):
+    """
+    In-memory cache of single objects (projects, sites, subjects...)
+    keyed by host, endpoint (a client URLS key, e.g. 'SUBJECTS') and PK,
+    so getters called over and over for the same PKs don't hit the host
+    every time. Entries expire ttl seconds after they were stored, and
+    the least recently used entries are dropped to stay within
+    max_entries and max_bytes (measured with approximate_size).
+
+    Cached data is shared between calls, treat it as read-only.
+
+    Options:
+        'ttl': seconds an object is cached for, None never expires them
+        'max_entries': number of objects kept
+        'max_bytes': approximate size budget of the cached objects
+    """
+
+    def __init__(self, ttl=300, max_entries=4096, max_bytes=32 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(host, endpoint, pk):
+        return host, endpoint, str(pk)
+
+    def get(self, host, endpoint, pk):
+        """
+        Returns the cached object, or None if it isn't cached or expired
+        """
+        key = self.key(host, endpoint, pk)
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and entry['expires'] is not None and \
+                    entry['expires'] <= clock():
+                self.size -= entry['size']
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            # re-insert as the most recently used
+            self._entries[key] = entry
+            self.hits += 1
+
+        return entry['data']
+
+    def store(self, host, endpoint, pk, data):
+        size = approximate_size(data)
+        if size > self.max_bytes:
+            return
+
+        expires = None
+        if self.ttl is not None:
+            expires = clock() + self.ttl
+
+        key = self.key(host, endpoint, pk)
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous['size']
+
+            self._entries[key] = {
+                'data': data,
+                'size': size,
+                'expires': expires,
+            }
+            self.size += size
+
+            while len(self._entries) > self.max_entries or \
+                    self.size > self.max_bytes:
+                _, entry = self._entries.popitem(last=False)
+                self.size -= entry['size']
+
+    def store_list(self, host, endpoint, records):
+        """
+        Caches every object with an 'id' in a list response's records
+        """
+        for record in records:
+            if isinstance(record, dict) and 'id' in record:
+                self.store(host, endpoint, record['id'], record)
+
+    def invalidate(self, endpoint, pk=None, host=None):
+        """
+        Drops the cached object with the given PK, or with pk None all
+        the objects of the endpoint, for the given host or all hosts
+        """
+        pk = None if pk is None else str(pk)
+
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if key[1] == endpoint and
+                (host is None or key[0] == host) and
+                (pk is None or key[2] == pk)
+            ]
+
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self.size -= entry['size']
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self.size,
+            }
@@ -0,0 +1,3049 @@
+from __future__ import print_function
+
+import requests
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import itertools
+import os
+import threading
+import time
+import zlib
+
+from reflowrestclient.downloads import TempFileWriter, PartFileWriter, \
+    SegmentedFileWriter, ChecksumError, plan_segments, hash_file, \
+    CONTENT_RANGE_RE
+from reflowrestclient.batch import Batch
+from reflowrestclient.retry import RetryPolicy
+from reflowrestclient import json_codecs, limits, pagination, panels, \
+    related, streaming, timeouts, transports
+
+METHOD = {
+    'https': 'https://',
+    'http': 'http://'
+}
+
+URLS = {
+    'TOKEN':               '/api/token-auth/',
+    'PROJECTS':            '/api/repository/projects/',
+    'SPECIMENS':           '/api/repository/specimens/',
+    'SUBJECT_GROUPS':      '/api/repository/subject_groups/',
+    'SITES':               '/api/repository/sites/',
+    'SUBJECTS':            '/api/repository/subjects/',
+    'PROJECT_PANELS':      '/api/repository/panel_templates/',
+    'SITE_PANELS':         '/api/repository/site_panels/',
+    'COMPENSATIONS':       '/api/repository/compensations/',
+    'CREATE_COMPENSATION': '/api/repository/compensations/add/',
+    'STIMULATIONS':        '/api/repository/stimulations/',
+    'SAMPLES':             '/api/repository/samples/',
+    'CREATE_SAMPLES':      '/api/repository/samples/add/',
+    'SAMPLE_METADATA':     '/api/repository/samplemetadata/',
+    'VISIT_TYPES':         '/api/repository/visit_types/',
+    'SAMPLE_COLLECTION':   '/api/repository/sample_collections/',
+
+    # Process related API URLs
+    'PROCESSES':                 '/api/repository/processes/',
+    'WORKERS':                   '/api/repository/workers/',
+    'VERIFY_WORKER':             '/api/repository/verify_worker/',
+    'PROCESS_REQUESTS':          '/api/repository/process_requests/',
+    'VIABLE_PROCESS_REQUESTS':   '/api/repository/viable_process_requests/',
+    'ASSIGNED_PROCESS_REQUESTS': '/api/repository/assigned_process_requests/',
+    'CLUSTERS':                  '/api/repository/clusters/',
+    'SAMPLE_CLUSTERS':           '/api/repository/sample_clusters/',
+    'SAMPLE_CLUSTER_COMPONENTS': '/api/repository/sample_cluster_components/',
+}
+
+# list endpoints whose records leave out fields of the detail view (site
+# panels are listed without their parameters), never used to warm the
+# metadata cache
+PARTIAL_LIST_ENDPOINTS = frozenset(['SITE_PANELS'])
+
+NO_RESPONSE = {'status': None, 'reason': 'No response', 'data': ''}
+
+DEADLINE_EXCEEDED = {'status': None, 'reason': 'Deadline exceeded', 'data': ''}
+
+# transient request errors worth retrying
+RETRY_EXCEPTIONS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.Timeout
+)
+
+# response encodings negotiated with the host, brotli responses can only
+# be decoded with the brotli (or brotlicffi) package installed
+ACCEPT_ENCODING = 'gzip, deflate'
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING += ', br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING += ', br'
+    except ImportError:
+        pass
+
+
+def gzip_compress(data):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class ReFlowClient(object):
+    """
+    Client for a single ReFlow host.
+
+    Holds the host, method and token along with a pooled requests Session,
+    so every call made through the same client re-uses open connections
+    instead of paying for a new TCP + TLS handshake.
+
+    Options:
+        'pool_connections': number of per-host connection pools to cache
+        'pool_maxsize': max number of connections kept open per pool
+        'keep_alive': set to False to close the connection after each request
+        'chunk_size': size in bytes of the chunks streamed to disk by
+                      the download methods
+        'download_segments': number of byte ranges FCS sample downloads
+                             are split into and fetched in parallel,
+                             1 (the default) uses a single stream
+        'min_segment_size': minimum size in bytes of a download segment
+        'sample_cache': a cache.SampleCache used by the FCS sample
+                        downloads, None (the default) disables caching
+        'response_cache': a cache.ResponseCache used by get_request to
+                          revalidate responses with conditional GETs,
+                          None (the default) disables it
+        'metadata_cache': a cache.MetadataCache of the objects returned
+                          by single object getters like get_subject and
+                          warmed by the matching list getters (except
+                          those in PARTIAL_LIST_ENDPOINTS), None (the
+                          default) disables it
+        'compress_min_size': JSON request bodies of at least this many
+                             bytes are sent gzip compressed, None (the
+                             default) never compresses request bodies.
+                             Only enable for hosts accepting
+                             Content-Encoding: gzip request bodies.
+        'retry_policy': a retry.RetryPolicy for failed requests, the
+                        default retries idempotent requests up to 3 times
+        'connect_timeout': seconds to wait for a connection to the host
+        'read_timeout': seconds to wait for the host to send data (between
+                        bytes, not for the whole response)
+        'json_codec': name of the JSON library decoding responses and
+                      encoding request bodies ('orjson', 'ujson' or
+                      'json'), by default the fastest one installed, see
+                      json_codecs
+        'token_store': a tokens.TokenStore where tokens obtained with
+                       the credentials are saved and looked up, None
+                       (the default) always logs in
+        'credentials': function returning a (username, password) tuple,
+                       called to log in (again) when the client has no
+                       token or the host rejects it, see request
+        'limiter': a limits.AdaptiveLimiter adapting the number of
+                   requests in flight to how the host copes, None (the
+                   default) doesn't limit them
+        'rate_limit': max number of requests per second, or a
+                      limits.TokenBucket, None (the default) for no cap
+        'transport': HTTP transport sending the requests, 'requests'
+                     (the default) or the leaner 'urllib3', see
+                     transports
+
+    Limiters and rate limits may be shared by several clients, see
+    limit_stats for the current limits.
+
+    Both timeouts are capped to the time left before the current deadline
+    (see timeouts.deadline), None disables them.
+
+    Responses are always negotiated as gzip / deflate (and brotli when
+    installed), see compression_stats for the bytes saved.
+    """
+
+    def __init__(
+            self,
+            host,
+            token=None,
+            method=METHOD['https'],
+            pool_connections=10,
+            pool_maxsize=10,
+            keep_alive=True,
+            chunk_size=64 * 1024,
+            download_segments=1,
+            min_segment_size=8 * 1024 * 1024,
+            sample_cache=None,
+            response_cache=None,
+            compress_min_size=None,
+            retry_policy=None,
+            connect_timeout=10,
+            read_timeout=60,
+            json_codec=None,
+            token_store=None,
+            credentials=None,
+            limiter=None,
+            rate_limit=None,
+            transport='requests',
+            metadata_cache=None):
+        self.host = host
+        self.token = token
+        self.method = method
+        self.token_store = token_store
+        self.credentials = credentials
+        self._auth_lock = threading.Lock()
+
+        if rate_limit is not None and \
+                not isinstance(rate_limit, limits.TokenBucket):
+            rate_limit = limits.TokenBucket(rate_limit)
+        self.limiter = limiter
+        self.rate_limit = rate_limit
+        self.chunk_size = chunk_size
+        self.download_segments = download_segments
+        self.min_segment_size = min_segment_size
+        self.sample_cache = sample_cache
+        self.response_cache = response_cache
+        self.metadata_cache = metadata_cache
+        self.compress_min_size = compress_min_size
+
+        if retry_policy is None:
+            retry_policy = RetryPolicy()
+        self.retry_policy = retry_policy
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.json_codec = json_codecs.get_codec(json_codec)
+
+        self.response_bytes = 0
+        self.response_decoded_bytes = 0
+        self.request_bytes = 0
+        self.request_uncompressed_bytes = 0
+        self._stats_lock = threading.Lock()
+
+        self.transport = transports.get_transport(
+            transport,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            keep_alive=keep_alive,
+            headers={
+                'User-Agent': 'python',
+                'Accept-Encoding': ACCEPT_ENCODING
+            }
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Closes all pooled connections
+        """
+        self.transport.close()
+
+    def build_url(self, key, pk=None, action=None):
+        """
+        Returns the full URL for one of the API URLS keys, optionally
+        for a single instance (pk) and an instance action (e.g. 'csv')
+        """
+        url = '%s%s%s' % (self.method, self.host, URLS[key])
+
+        if pk is not None:
+            url = '%s%s/' % (url, pk)
+        if action is not None:
+            url = '%s%s/' % (url, action)
+
+        return url
+
+    def auth_headers(self):
+        if self.token is None:
+            return {}
+        return {'Authorization': "Token %s" % self.token}
+
+    def request_timeout(self):
+        """
+        Returns the (connect, read) timeouts for a request, capped to the
+        current deadline. Raises timeouts.DeadlineExceeded if it passed.
+        """
+        deadline = timeouts.current_deadline()
+        if deadline is None:
+            return self.connect_timeout, self.read_timeout
+
+        return (
+            deadline.cap(self.connect_timeout),
+            deadline.cap(self.read_timeout)
+        )
+
+    def authenticate(self, failed_token=None):
+        """
+        Sets a new token for the client using its credentials function,
+        replacing failed_token, the token the host rejected (or None if
+        there is no token yet). A token from the token_store other than
+        failed_token is used without logging in, new tokens are saved
+        to the token_store.
+
+        Returns the token, None if there are no credentials or the login
+        failed.
+        """
+        if self.credentials is None:
+            return None
+
+        with self._auth_lock:
+            if self.token is not None and self.token != failed_token:
+                # already replaced by another thread
+                return self.token
+
+            username, password = self.credentials()
+
+            token = None
+            if self.token_store is not None:
+                token = self.token_store.get(self.host, username)
+                if token == failed_token:
+                    token = None
+
+            if token is None:
+                token = self.get_token(username, password)
+                if token is not None and self.token_store is not None:
+                    self.token_store.store(self.host, username, token)
+
+            # delete all the user credentials
+            del(username, password)
+
+            if token is not None:
+                self.token = token
+
+        return token
+
+    def request(self, verb, url, headers=None, **kwargs):
+        """
+        Sends a request through the pooled transport, adding the
+        authorization header and the client's timeouts. Returns the
+        requests Response object.
+
+        With credentials, the client logs in before its first request
+        if it has no token, and when a request is rejected with a 401
+        it logs in again and sends the request once more.
+        """
+        if self.token is None and self.credentials is not None:
+            self.authenticate()
+
+        token = self.token
+        response = self.send_request(verb, url, headers, **kwargs)
+
+        if response.status_code == 401 and self.credentials is not None:
+            if self.authenticate(failed_token=token) is not None:
+                response.close()
+
+                # upload files from the start again
+                for file_tuple in (kwargs.get('files') or {}).values():
+                    file_tuple[1].seek(0)
+
+                response = self.send_request(verb, url, headers, **kwargs)
+
+        return response
+
+    def send_request(self, verb, url, headers=None, **kwargs):
+        """
+        Sends a single request, within the rate limit and the limiter's
+        concurrency limit, which is told how the request went
+        """
+        self.wait_for_limits()
+
+        request_headers = self.auth_headers()
+        if headers is not None:
+            request_headers.update(headers)
+
+        start_time = time.time()
+        try:
+            kwargs.setdefault('timeout', self.request_timeout())
+            response = self.transport.request(
+                verb,
+                url,
+                headers=request_headers,
+                **kwargs
+            )
+        except RETRY_EXCEPTIONS:
+            self.release_limit(error=True)
+            raise
+        except Exception:
+            self.release_limit()
+            raise
+
+        # for streamed responses, the time until the headers arrived
+        self.release_limit(
+            latency=time.time() - start_time,
+            status=response.status_code
+        )
+
+        return response
+
+    def wait_for_limits(self):
+        """
+        Waits until a request may be sent under the rate limit and, with
+        a limiter, takes a slot for it. Raises timeouts.DeadlineExceeded
+        if the current deadline passes first.
+        """
+        deadline = timeouts.current_deadline()
+
+        if self.rate_limit is not None:
+            delay = self.rate_limit.reserve()
+            if deadline is not None and delay >= deadline.remaining():
+                raise timeouts.DeadlineExceeded(
+                    "Rate limit delay exceeds the deadline")
+            if delay > 0:
+                time.sleep(delay)
+
+        if self.limiter is not None:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline.remaining()
+            if not self.limiter.acquire(timeout):
+                raise timeouts.DeadlineExceeded(
+                    "Deadline exceeded waiting for the concurrency limit")
+
+    def release_limit(self, latency=None, status=None, error=False):
+        if self.limiter is not None:
+            self.limiter.release(latency, status, error)
+
+    def limit_stats(self):
+        """
+        Returns a dictionary with the limiter's stats (current limit,
+        requests in flight, smoothed and last latency in seconds...)
+        under 'concurrency' and the rate limit's stats under 'rate',
+        None for limits the client doesn't have
+        """
+        return {
+            'concurrency': (
+                None if self.limiter is None else self.limiter.stats()),
+            'rate': (
+                None if self.rate_limit is None else self.rate_limit.stats()),
+        }
+
+    def may_retry(self, verb, attempt, retry_check=None, delay=0,
+                  idempotent=None):
+        """
+        Returns True if a failed request may be retried after the given
+        attempt (counting from 0) and a delay of delay seconds. Requests
+        with a non-idempotent verb, or marked idempotent=False (e.g. GET
+        requests with side effects), are only retried if retry_check is
+        True, or a function returning True when called before the retry.
+        No retries are made past the current deadline.
+        """
+        policy = self.retry_policy
+
+        if attempt >= policy.max_retries:
+            return False
+
+        deadline = timeouts.current_deadline()
+        if deadline is not None and delay >= deadline.remaining():
+            return False
+
+        if idempotent is None:
+            idempotent = policy.idempotent(verb)
+
+        if not idempotent:
+            if callable(retry_check):
+                retry_check = retry_check()
+            if not retry_check:
+                return False
+
+        return policy.allow_retry()
+
+    def retry_request(self, verb, url, retry_check=None, idempotent=None,
+                      **kwargs):
+        """
+        Sends a request like request, retrying failed connections,
+        timeouts and responses with one of the retry_policy's
+        retry_statuses, as allowed by may_retry. Returns the last Response,
+        or raises the last exception.
+        """
+        policy = self.retry_policy
+        policy.request_started()
+
+        attempt = 0
+        while True:
+            try:
+                response = self.request(verb, url, **kwargs)
+            except RETRY_EXCEPTIONS:
+                delay = policy.delay(attempt)
+                if not self.may_retry(
+                        verb, attempt, retry_check, delay, idempotent):
+                    raise
+            else:
+                if response.status_code not in policy.retry_statuses:
+                    return response
+                delay = policy.delay(attempt, response.headers)
+                if not self.may_retry(
+                        verb, attempt, retry_check, delay, idempotent):
+                    return response
+                response.close()
+
+            time.sleep(delay)
+            attempt += 1
+
+            # upload files from the start again
+            for file_tuple in (kwargs.get('files') or {}).values():
+                file_tuple[1].seek(0)
+
+    def response_dict(self, response, ok_status):
+        """
+        Returns a dictionary with the following keys:
+            status: HTTP response status code
+            reason: HTTP response reason
+            data: A dictionary converted from JSON response data if the
+                  status is ok_status, the response text otherwise
+        """
+        if response.status_code == ok_status:
+            try:
+                data = self.json_codec.loads(response.content)
+            except Exception as e:
+                data = response.text
+                print(e)
+        else:
+            data = response.text
+
+        return {
+            'status': response.status_code,
+            'reason': response.reason,
+            'data': data,
+        }
+
+    def json_body(self, data):
+        """
+        Returns the JSON encoded data along with its request headers. The
+        body is gzip compressed if it is at least compress_min_size bytes.
+        """
+        body = self.json_codec.dumps(data)
+        headers = {'Content-Type': 'application/json'}
+
+        uncompressed_size = len(body)
+        if self.compress_min_size is not None and \
+                uncompressed_size >= self.compress_min_size:
+            body = gzip_compress(body)
+            headers['Content-Encoding'] = 'gzip'
+
+        with self._stats_lock:
+            self.request_bytes += len(body)
+            self.request_uncompressed_bytes += uncompressed_size
+
+        return body, headers
+
+    def count_response_bytes(self, encoded_size, decoded_size):
+        with self._stats_lock:
+            self.response_bytes += encoded_size
+            self.response_decoded_bytes += decoded_size
+
+    def compression_stats(self):
+        """
+        Returns a dictionary with the byte counts of the JSON responses
+        (as received and decoded) and JSON request bodies (as sent and
+        uncompressed), along with the bytes saved by compression
+        """
+        with self._stats_lock:
+            return {
+                'response_bytes': self.response_bytes,
+                'response_decoded_bytes': self.response_decoded_bytes,
+                'response_bytes_saved':
+                    self.response_decoded_bytes - self.response_bytes,
+                'request_bytes': self.request_bytes,
+                'request_uncompressed_bytes':
+                    self.request_uncompressed_bytes,
+                'request_bytes_saved':
+                    self.request_uncompressed_bytes - self.request_bytes,
+            }
+
+    def send(self, verb, url, ok_status, raise_errors=False,
+             retry_check=None, **kwargs):
+        """
+        Like retry_request, but returns the status/reason/data dictionary.
+        A missing response is reported in the dictionary unless
+        raise_errors is True.
+        """
+        try:
+            response = self.retry_request(
+                verb,
+                url,
+                retry_check=retry_check,
+                **kwargs
+            )
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(e)
+            return dict(NO_RESPONSE)
+
+        # urllib3 counts the bytes read before decoding
+        self.count_response_bytes(response.raw.tell(), len(response.content))
+
+        return self.response_dict(response, ok_status)
+
+    def get_request(self, url, params=None, idempotent=True):
+        """
+        Returns a dictionary with the following keys:
+            status: HTTP response status code
+            reason: HTTP response reason
+            data: A dictionary converted from JSON response data
+
+        GET requests with side effects on the host must be sent with
+        idempotent=False, so they are never retried automatically: a
+        retry after the host applied the action would fail, reporting
+        an error for an action that succeeded.
+
+        If the client has a response_cache, a previous response for the
+        same url and params is revalidated with If-None-Match /
+        If-Modified-Since, and on a 304 the cached data is returned
+        (with a 200 status).
+        """
+        cache = self.response_cache
+        headers = None
+        if cache is not None:
+            headers = cache.request_headers(url, params)
+
+        response = self.retry_request(
+            'GET',
+            url,
+            params=params,
+            headers=headers,
+            idempotent=idempotent
+        )
+
+        if response.status_code == 304:
+            data = cache.get(url, params)
+            if data is not None:
+                return {
+                    'status': 200,
+                    'reason': 'OK',
+                    'data': data,
+                }
+
+            # dropped from the cache since the request was sent
+            response = self.retry_request(
+                'GET',
+                url,
+                params=params,
+                idempotent=idempotent
+            )
+
+        self.count_response_bytes(response.raw.tell(), len(response.content))
+
+        result = self.response_dict(response, 200)
+
+        if cache is not None and response.status_code == 200 and \
+                isinstance(result['data'], (dict, list)):
+            cache.store(url, params, response.headers, result['data'])
+
+        return result
+
+    def get_object(self, endpoint, pk):
+        """
+        GET the object with the given PK from the endpoint (a URLS key),
+        returning the status/reason/data dictionary. With a
+        metadata_cache, cached objects are returned without a request.
+        """
+        cache = self.metadata_cache
+        if cache is not None:
+            data = cache.get(self.host, endpoint, pk)
+            if data is not None:
+                return {
+                    'status': 200,
+                    'reason': 'OK',
+                    'data': data,
+                }
+
+        result = self.get_request(self.build_url(endpoint, pk))
+
+        if cache is not None and result['status'] == 200 and \
+                isinstance(result['data'], dict):
+            cache.store(self.host, endpoint, pk, result['data'])
+
+        return result
+
+    def cache_objects(self, endpoint, result):
+        """
+        Warms the metadata_cache with the objects in the result of a
+        list endpoint (a URLS key), returns the result. Endpoints in
+        PARTIAL_LIST_ENDPOINTS are skipped, their records being
+        incomplete.
+        """
+        cache = self.metadata_cache
+        if cache is None or endpoint in PARTIAL_LIST_ENDPOINTS or \
+                result['status'] != 200:
+            return result
+
+        try:
+            records, next_url = pagination.page_records(result['data'])
+        except ValueError:
+            return result
+
+        cache.store_list(self.host, endpoint, records)
+
+        return result
+
+    @staticmethod
+    def distinct_pks(pks):
+        """
+        Returns the list of PKs without duplicates and None, in order
+        """
+        seen = set()
+        distinct = []
+        for pk in pks:
+            if pk is None or pk in seen:
+                continue
+            seen.add(pk)
+            distinct.append(pk)
+
+        return distinct
+
+    def cached_objects(self, endpoint, pks):
+        """
+        Returns the objects with the given PKs found in the
+        metadata_cache, keyed by PK
+        """
+        objects = {}
+
+        cache = self.metadata_cache
+        if cache is not None:
+            for pk in pks:
+                data = cache.get(self.host, endpoint, pk)
+                if data is not None:
+                    objects[pk] = data
+
+        return objects
+
+    def match_objects(self, endpoint, pks, records):
+        """
+        Returns the records of a list endpoint (a URLS key) with one of
+        the given PKs, keyed by PK, along with False if there are other
+        records too, i.e. the host ignored the filter on PKs. Records
+        are consumed up to the first one with another PK only, so an
+        unfiltered list isn't read any further.
+        """
+        requested = dict((str(pk), pk) for pk in pks)
+
+        objects = {}
+        filtered = True
+        for record in records:
+            pk = requested.get(str(record.get('id')))
+            if pk is None:
+                filtered = False
+                break
+            objects[pk] = record
+
+        if self.metadata_cache is not None and \
+                endpoint not in PARTIAL_LIST_ENDPOINTS:
+            self.metadata_cache.store_list(
+                self.host, endpoint, list(objects.values()))
+
+        return objects, filtered
+
+    @staticmethod
+    def add_object(objects, pk, result):
+        """
+        Adds the object of a get_object result to objects, skipping
+        objects not found. Raises pagination.ResponseError for other
+        failures.
+        """
+        if result['status'] == 200:
+            objects[pk] = result['data']
+        elif result['status'] != 404:
+            raise pagination.ResponseError(result)
+
+    def list_objects(self, endpoint, pks, in_filter):
+        """
+        GET the objects with the given PKs from the endpoint's list with
+        the in_filter query parameter, see match_objects
+        """
+        records = self.iter_pages(
+            self.build_url(endpoint),
+            {in_filter: ','.join(str(pk) for pk in pks)}
+        )
+
+        # stops fetching pages if match_objects stops early
+        try:
+            return self.match_objects(endpoint, pks, records)
+        finally:
+            records.close()
+
+    def get_objects(self, endpoint, pks, max_workers=8, in_filter=None,
+                    in_filter_size=100):
+        """
+        GET the objects with the given PKs from the endpoint (a URLS key),
+        each distinct PK once and at most max_workers requests at once.
+        Returns a dictionary of the objects keyed by PK, leaving out PKs
+        with no object (404), other failures raise
+        pagination.ResponseError. Objects in the metadata_cache are
+        returned without a request.
+
+        For hosts with a list filter on comma separated PKs for the
+        endpoint, give its name as in_filter (e.g. 'id__in'), to get the
+        objects in_filter_size at a time instead of one by one. If the
+        host turns out to ignore the filter, the remaining objects are
+        requested one by one.
+        """
+        pks = self.distinct_pks(pks)
+        objects = self.cached_objects(endpoint, pks)
+        pending = [pk for pk in pks if pk not in objects]
+
+        list_objects = timeouts.bind(self.list_objects)
+        get_object = timeouts.bind(self.get_object)
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            if in_filter is not None and pending:
+                chunks = [
+                    pending[start:start + in_filter_size]
+                    for start in range(0, len(pending), in_filter_size)
+                ]
+
+                # the first chunk tells whether the host filters the list
+                found, filtered = list_objects(endpoint, chunks[0], in_filter)
+                objects.update(found)
+
+                if filtered:
+                    futures = [
+                        executor.submit(list_objects, endpoint, chunk,
+                                        in_filter)
+                        for chunk in chunks[1:]
+                    ]
+                    for future in futures:
+                        objects.update(future.result()[0])
+
+                pending = [pk for pk in pending if pk not in objects]
+
+            futures = [
+                (pk, executor.submit(get_object, endpoint, pk))
+                for pk in pending
+            ]
+            for pk, future in futures:
+                self.add_object(objects, pk, future.result())
+        finally:
+            executor.shutdown()
+
+        return objects
+
+    def prefetch(self, records, relations, max_workers=8, in_filter=None):
+        """
+        Fetches the objects related to records (e.g. the data of a
+        get_samples response) for the given relations, like 'subject' or
+        'subject_group', and attaches them to the records, see the
+        related module. The relations of a level are fetched at once,
+        each distinct object once, see get_objects for max_workers and
+        in_filter.
+
+        Returns the attached objects, keyed by relation and PK.
+        """
+        fetched = {}
+
+        get_objects = timeouts.bind(self.get_objects)
+
+        executor = ThreadPoolExecutor(max_workers=len(related.RELATIONS))
+        try:
+            for level in related.plan(relations):
+                futures = [
+                    (relation, executor.submit(
+                        get_objects,
+                        related.RELATIONS[relation][2],
+                        related.foreign_keys(records, relation),
+                        max_workers=max_workers,
+                        in_filter=in_filter))
+                    for relation in level
+                ]
+                for relation, future in futures:
+                    fetched[relation] = related.attach(
+                        records, relation, future.result())
+        finally:
+            executor.shutdown()
+
+        return fetched
+
+    def get_page(self, url, params=None):
+        """
+        Returns the records and next page URL of a list endpoint page,
+        see pagination.page_records. Raises pagination.ResponseError if
+        the request fails.
+        """
+        response = self.get_request(url, params)
+        if response['status'] != 200:
+            raise pagination.ResponseError(response)
+
+        return pagination.page_records(response['data'])
+
+    def iter_pages(self, url, params=None, page_size=None,
+                   page_size_param='page_size'):
+        """
+        Generator yielding the records of a list endpoint, following the
+        host's pagination. While the records of one page are consumed,
+        the next page is already fetched in a background thread.
+
+        page_size, if given, is sent as the page_size_param query
+        parameter (use 'limit' for limit/offset pagination).
+        """
+        params = dict(params or {})
+        if page_size is not None:
+            params[page_size_param] = page_size
+
+        get_page = timeouts.bind(self.get_page)
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            next_page = executor.submit(get_page, url, params)
+
+            while next_page is not None:
+                records, next_url = next_page.result()
+
+                next_page = None
+                if next_url:
+                    next_page = executor.submit(get_page, next_url)
+
+                for record in records:
+                    yield record
+        finally:
+            executor.shutdown()
+
+    def list_query(self, list_method, **kwargs):
+        """
+        Returns the URL and query parameters list_method, one of the
+        client's get_* list methods (or its name), sends with the given
+        keyword arguments, through its *_query helper (e.g.
+        samples_query for get_samples)
+        """
+        name = getattr(list_method, '__name__', list_method)
+
+        query = None
+        if name.startswith('get_'):
+            query = getattr(self, '%s_query' % name[len('get_'):], None)
+        if query is None:
+            raise ValueError("%s is not a list method" % name)
+
+        return query(**kwargs)
+
+    def iterate(self, list_method, **kwargs):
+        """
+        Returns an iterator over the records of list_method, one of the
+        client's get_* list methods, for the given keyword arguments (see
+        list_query). Records are fetched lazily one page at a time, see
+        iter_pages for the page_size and page_size_param options:
+
+            for sample in client.iterate(client.get_samples, project_pk=1):
+                ...
+        """
+        page_options = {}
+        for option in ('page_size', 'page_size_param'):
+            if option in kwargs:
+                page_options[option] = kwargs.pop(option)
+
+        url, params = self.list_query(list_method, **kwargs)
+
+        return self.iter_pages(url, params, **page_options)
+
+    def stream_request(self, url, params=None, raw_fields=None):
+        """
+        Generator yielding the elements of a JSON array response as they
+        are received, decoding the body incrementally instead of all at
+        once. See streaming.ArrayDecoder for raw_fields. Raises
+        pagination.ResponseError if the request fails.
+
+        A paginated list response (a page object) is decoded whole,
+        its size being bounded by the page size, and the following
+        pages are fetched through iter_pages.
+        """
+        decoder = streaming.ArrayDecoder(
+            raw_fields=raw_fields,
+            loads=self.json_codec.loads
+        )
+        next_url = None
+
+        response = self.retry_request(
+            'GET',
+            url,
+            params=params,
+            stream=True
+        )
+
+        try:
+            if response.status_code != 200:
+                raise pagination.ResponseError(
+                    self.response_dict(response, 200))
+
+            chunks = self.iter_chunks(response)
+            head = b''
+            for chunk in chunks:
+                head += chunk
+                if streaming.is_object(head) is not None:
+                    break
+
+            if streaming.is_object(head):
+                body = b''.join([head] + list(chunks))
+                records, next_url = pagination.page_records(
+                    self.json_codec.loads(body))
+                for record in records:
+                    yield decoder.convert(record)
+            else:
+                for chunk in itertools.chain([head], chunks):
+                    for element in decoder.feed(chunk):
+                        yield element
+                decoder.close()
+        finally:
+            response.close()
+
+        if next_url:
+            for record in self.iter_pages(next_url):
+                yield decoder.convert(record)
+
+    def stream(self, list_method, raw_fields=None, **kwargs):
+        """
+        Returns an iterator over the records of list_method, one of the
+        client's get_* list methods, for the given keyword arguments (see
+        list_query). The response is decoded while it streams in (see
+        stream_request), so records are available before the whole
+        response arrived and it is never held in memory at once.
+        """
+        url, params = self.list_query(list_method, **kwargs)
+
+        return self.stream_request(url, params, raw_fields=raw_fields)
+
+    def iter_chunks(self, response):
+        """
+        Yields the streamed response body in chunks of chunk_size bytes,
+        raising timeouts.DeadlineExceeded once the current deadline passed
+        """
+        deadline = timeouts.current_deadline()
+
+        for chunk in response.iter_content(self.chunk_size):
+            if deadline is not None:
+                deadline.check()
+            yield chunk
+
+    def download(self, url, file_path, resume=False, sha1=None):
+        """
+        GET url and stream the response body to file_path in chunks of
+        chunk_size bytes, so memory use does not grow with the file size.
+        The body is written to a temporary file that only replaces
+        file_path once the whole body has been received.
+
+        If resume is True, the body is written to <file_path>.part instead
+        and kept if the download fails. A later call with resume=True
+        requests only the remaining bytes (see downloads.PartFileWriter).
+
+        The body is hashed as it streams to disk. If sha1 is given and does
+        not match, the file is not saved and the status is None with the
+        reason 'SHA-1 mismatch'.
+
+        Returns a dictionary with keys:
+            'status': The HTTP response code, 200 for a resumed download
+                      completed with a 206 partial response
+            'reason': The HTTP response reason
+            'data': Empty string on success, response text otherwise
+            'file_path': The path of the downloaded file
+            'bytes': Number of bytes received by this call
+            'sha1': Hex SHA-1 digest of the downloaded file
+        """
+        if resume:
+            writer = PartFileWriter(url, file_path, sha1=sha1)
+        else:
+            writer = TempFileWriter(file_path, sha1=sha1)
+
+        data = ''
+        try:
+            r = self.retry_request(
+                'GET',
+                url,
+                headers=writer.request_headers(),
+                stream=True
+            )
+            if r.status_code == 416 and writer.offset > 0:
+                # the partial file doesn't fit the remote one, start over
+                r.close()
+                writer.discard()
+                r = self.retry_request(
+                    'GET',
+                    url,
+                    headers=writer.request_headers(),
+                    stream=True
+                )
+        except Exception as e:
+            print(e)
+            return {'status': None, 'reason': 'No response', 'data': data}
+
+        status = r.status_code
+        reason = r.reason
+        try:
+            if status in writer.ok_statuses:
+                try:
+                    writer.open(status, r.headers)
+                    for chunk in self.iter_chunks(r):
+                        writer.write(chunk)
+                    writer.commit()
+                except Exception as e:
+                    writer.abort()
+                    print(e)
+                    return self.failed_download_dict(file_path, writer, e)
+
+                # the whole file is there, however it was received
+                status = 200
+                reason = 'OK'
+            else:
+                data = r.text
+        finally:
+            r.close()
+
+        return {
+            'status': status,
+            'reason': reason,
+            'data': data,
+            'file_path': file_path,
+            'bytes': writer.size,
+            'sha1': writer.hash.hexdigest(),
+        }
+
+    def segmented_download(self, url, file_path, sha1=None):
+        """
+        GET url as download_segments byte ranges fetched in parallel and
+        written straight into a preallocated temporary file, which replaces
+        file_path once every segment is complete.
+
+        A first 1 byte Range request finds the file length and ETag. Files
+        too small to split into segments of at least min_segment_size, and
+        servers not supporting Range requests, fall back to download.
+        Each segment must come back as a 206 for the requested range of the
+        same ETag, and the segments must add up to the full length. If sha1
+        is given the finished file is hashed and checked against it.
+
+        Returns the same dictionary as download, with a 200 status when
+        all segments were received. 'sha1' is None if no sha1 was given.
+        """
+        range_headers = {'Accept-Encoding': 'identity'}
+
+        try:
+            probe = self.retry_request(
+                'GET',
+                url,
+                headers=dict(range_headers, Range='bytes=0-0'),
+                stream=True
+            )
+        except Exception as e:
+            print(e)
+            return {'status': None, 'reason': 'No response', 'data': ''}
+
+        try:
+            if probe.status_code not in (200, 206):
+                return {
+                    'status': probe.status_code,
+                    'reason': probe.reason,
+                    'data': probe.text,
+                    'file_path': file_path,
+                    'bytes': 0,
+                }
+            length, ranges = self.plan_segmented_download(
+                probe.status_code, probe.headers)
+        finally:
+            probe.close()
+
+        if len(ranges) < 2:
+            return self.download(url, file_path, sha1=sha1)
+
+        if probe.headers.get('ETag'):
+            # a changed file is sent as a 200, failing the segment
+            range_headers['If-Range'] = probe.headers['ETag']
+
+        writer = SegmentedFileWriter(file_path, length, sha1=sha1)
+
+        def download_segment(byte_range):
+            start, end = byte_range
+            r = self.retry_request(
+                'GET',
+                url,
+                headers=dict(range_headers, Range='bytes=%d-%d' % byte_range),
+                stream=True
+            )
+            try:
+                self.check_segment_response(
+                    r.status_code, r.reason, r.headers, start, end)
+
+                with writer.segment(start, end) as segment:
+                    for chunk in self.iter_chunks(r):
+                        segment.write(chunk)
+            finally:
+                r.close()
+
+        executor = ThreadPoolExecutor(max_workers=len(ranges))
+        try:
+            writer.open()
+            list(executor.map(timeouts.bind(download_segment), ranges))
+            writer.commit()
+        except Exception as e:
+            writer.abort()
+            print(e)
+            return self.failed_download_dict(file_path, writer, e)
+        finally:
+            executor.shutdown()
+
+        return {
+            'status': 200,
+            'reason': 'OK',
+            'data': '',
+            'file_path': file_path,
+            'bytes': writer.size,
+            'sha1': writer.hash.hexdigest() if writer.hash else None,
+        }
+
+    def plan_segmented_download(self, status, headers):
+        """
+        Returns the file length and the list of segment byte ranges from
+        the response to a 1 byte Range request, with an empty list when
+        the download can't or shouldn't be split
+        """
+        match = CONTENT_RANGE_RE.match(headers.get('Content-Range', ''))
+
+        if status != 206 or match is None or match.group(3) == '*':
+            return None, []
+
+        length = int(match.group(3))
+        ranges = plan_segments(
+            length,
+            self.download_segments,
+            self.min_segment_size
+        )
+
+        return length, ranges
+
+    @staticmethod
+    def check_segment_response(status, reason, headers, start, end):
+        """
+        Raises IOError unless the response is a 206 for exactly the
+        requested start-end byte range
+        """
+        match = CONTENT_RANGE_RE.match(headers.get('Content-Range', ''))
+
+        if status != 206 or match is None or \
+                int(match.group(1)) != start or int(match.group(2)) != end:
+            raise IOError(
+                "Segment %d-%d failed (%s: %s)" % (start, end, status, reason))
+
+    def cached_download(self, cache_key, file_path, sha1=None):
+        """
+        Puts the sample cache's file for cache_key at file_path. Returns
+        the download dictionary on a cache hit, None otherwise.
+        """
+        if self.sample_cache is None or cache_key is None:
+            return None
+
+        if not self.sample_cache.copy_to(cache_key, file_path):
+            return None
+
+        return {
+            'status': 200,
+            'reason': 'OK',
+            'data': '',
+            'file_path': file_path,
+            'bytes': 0,
+            'sha1': sha1,
+            'cached': True,
+        }
+
+    def add_to_sample_cache(self, cache_key, result):
+        """
+        Adds a successfully downloaded file to the sample cache
+        """
+        if self.sample_cache is None or cache_key is None:
+            return
+
+        if result['status'] not in (200, 206):
+            return
+
+        try:
+            self.sample_cache.add(cache_key, result['file_path'])
+        except (IOError, OSError) as e:
+            print(e)
+
+    def download_fcs(
+            self,
+            url,
+            file_path,
+            resume=False,
+            sha1=None,
+            cache_key=None):
+        """
+        Download an FCS file from url, as parallel byte ranges if the
+        client's download_segments is more than 1 (unless resume is True).
+
+        If the client has a sample_cache, the file is taken from the cache
+        when it holds cache_key (the result then includes 'cached': True),
+        and a successful download is added to the cache.
+        """
+        result = self.cached_download(cache_key, file_path, sha1)
+        if result is not None:
+            return result
+
+        if self.download_segments > 1 and not resume:
+            result = self.segmented_download(url, file_path, sha1=sha1)
+        else:
+            result = self.download(url, file_path, resume=resume, sha1=sha1)
+
+        self.add_to_sample_cache(cache_key, result)
+
+        return result
+
+    @staticmethod
+    def failed_download_dict(file_path, writer, error):
+        """
+        Returns the download dictionary for a transfer that failed part
+        way through, or whose SHA-1 didn't match
+        """
+        if isinstance(error, ChecksumError):
+            reason = 'SHA-1 mismatch'
+        else:
+            reason = 'Incomplete download'
+
+        return {
+            'status': None,
+            'reason': reason,
+            'data': str(error),
+            'file_path': file_path,
+            'bytes': writer.size,
+        }
+
+    @staticmethod
+    def bulk_download_summary(pk_list, results, seconds):
+        """
+        Returns a dictionary with keys:
+            'results': List of the individual download dictionaries, in
+                       pk_list order, each with an added 'pk' key
+            'bytes': Total number of bytes downloaded
+            'seconds': Wall-clock seconds taken by all the downloads
+            'mbps': Aggregate download rate in megabits per second
+        """
+        total_size = 0
+        for pk, result in zip(pk_list, results):
+            result['pk'] = pk
+            total_size += result.get('bytes', 0)
+
+        if seconds > 0:
+            mbps = ((total_size * 8) / 1024.0 / 1024.0) / seconds
+        else:
+            mbps = 0.0
+
+        return {
+            'results': results,
+            'bytes': total_size,
+            'seconds': seconds,
+            'mbps': mbps,
+        }
+
+    def bulk_download(self, download_function, pk_list, max_workers=4,
+                      deadline=None, **kwargs):
+        """
+        Calls download_function, one of the client's download_* methods,
+        for every PK in pk_list, running at most max_workers downloads
+        at once. Any other keyword arguments are passed on to
+        download_function.
+
+        deadline, in seconds (or a timeouts.Deadline), bounds the time
+        taken by the whole bulk download: every download runs under it,
+        so their requests and streamed bodies stop once it has passed,
+        and downloads not started by then fail with the reason
+        'Deadline exceeded'. By default the current deadline applies.
+
+        Returns the bulk_download_summary dictionary.
+        """
+        if deadline is None:
+            deadline = timeouts.current_deadline()
+        elif not isinstance(deadline, timeouts.Deadline):
+            deadline = timeouts.Deadline(deadline)
+
+        def download_pk(pk):
+            if deadline is not None and deadline.expired:
+                return dict(DEADLINE_EXCEEDED)
+
+            with timeouts.deadline(deadline):
+                return download_function(pk, **kwargs)
+
+        start_time = time.time()
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            results = list(executor.map(download_pk, pk_list))
+        finally:
+            executor.shutdown()
+
+        return self.bulk_download_summary(
+            pk_list,
+            results,
+            time.time() - start_time
+        )
+
+    def batch(self, max_workers=8):
+        """
+        Returns a batch.Batch for queuing calls to this client's methods,
+        run concurrently (at most max_workers at once, keep it within
+        pool_maxsize) when the with block ends:
+
+            with client.batch() as batch:
+                sample = batch.get_sample(sample_pk)
+                subject = batch.get_subject(subject_pk)
+
+            sample.result()['data']
+
+        Queued calls return a concurrent.futures.Future, identical get_*
+        calls are only sent once.
+        """
+        return Batch(self, max_workers=max_workers)
+
+    def post_file(self, url, data, field_name, file_path,
+                  find_existing=None):
+        """
+        POST the form data along with the file at file_path as a multipart
+        upload, returning the status/reason/data dictionary.
+
+        The POST is only retried when find_existing is given: a function
+        called before a retry, returning the status/reason/data dictionary
+        of the object if the failed attempt did create it after all, or
+        None if it did not (and the POST can safely be sent again).
+        """
+        existing = []
+
+        def retry_check():
+            try:
+                result = find_existing()
+            except Exception as e:
+                # can't tell whether the POST went through
+                print(e)
+                return False
+
+            if result is not None:
+                existing.append(result)
+                return False
+
+            return True
+
+        with open(file_path, "rb") as file_obj:
+            files = {
+                field_name: (os.path.basename(file_obj.name), file_obj)
+            }
+
+            result = self.send(
+                'POST',
+                url,
+                201,
+                retry_check=retry_check if find_existing else None,
+                data=data,
+                files=files
+            )
+
+        if existing:
+            return existing[0]
+
+        return result
+
+    @staticmethod
+    def posted_sample_dict(response):
+        """
+        Returns a POST status/reason/data dictionary for the first sample
+        in a get_samples response. Raises IOError if the lookup failed.
+        """
+        if response['status'] != 200:
+            raise IOError(
+                "Sample lookup failed (%s: %s)" % (
+                    response['status'], response['reason']))
+
+        if not response['data']:
+            return None
+
+        return {
+            'status': 201,
+            'reason': 'Created',
+            'data': response['data'][0],
+        }
+
+    def posted_sample(self, file_path):
+        """
+        Returns the POST status/reason/data dictionary of the sample on the
+        host with the same SHA-1 as the file at file_path, None if there
+        is none
+        """
+        sha1 = hash_file(hashlib.sha1(), file_path).hexdigest()
+
+        return self.posted_sample_dict(self.get_samples(sha1=sha1))
+
+    def get_token(self, username, password):
+        """
+        Login to host url using user credentials given.
+
+        Returns the authenticating user's token (string) if successful,
+        returns None if authentication failed.
+        """
+        url = self.build_url('TOKEN')
+
+        token = None
+
+        data = {
+            'username': username,
+            'password': password,
+        }
+
+        # capped to the current deadline like every other request, and
+        # raising timeouts.DeadlineExceeded once it passed
+        timeout = self.request_timeout()
+
+        try:
+            response = self.transport.request(
+                'POST',
+                url,
+                data=data,
+                timeout=timeout
+            )
+        except Exception as e:
+            print(e)
+            return None
+
+        if response.status_code == 200:
+            try:
+                data = response.json()
+                if 'token' in data:
+                    token = data['token']
+                    # delete all the user credentials
+                    del(data, response, username, password)
+                else:
+                    print("Authentication token not in response")
+
+            except Exception as e:
+                print(e)
+                return None
+        else:
+            print("Authentication failed (%s: %s)" % (
+                response.status_code, response.reason))
+
+        return token
+
+    def login(self, username, password):
+        """
+        Same as get_token, but also saves the token on the client for
+        all subsequent requests (and in the token_store)
+        """
+        token = self.get_token(username, password)
+
+        if token is not None:
+            self.token = token
+            if self.token_store is not None:
+                self.token_store.store(self.host, username, token)
+
+        return token
+
+    def projects_query(self, project_name=None):
+        """
+        Returns the URL and query parameters sent by get_projects
+        """
+        url = self.build_url('PROJECTS')
+        filter_params = dict()
+
+        if project_name is not None:
+            filter_params['project_name'] = project_name
+
+        return url, filter_params
+
+    def get_projects(self, project_name=None):
+        url, filter_params = self.projects_query(project_name=project_name)
+
+        return self.cache_objects(
+            'PROJECTS',
+            self.get_request(url, filter_params)
+        )
+
+    def get_project(self, project_pk):
+        """
+        GET a serialized Project instance
+            project_pk    (required)
+
+        Returns a dictionary with keys:
+            'status': The HTTP response code
+            'reason': The HTTP response reason
+            'data': Dictionary representation of object
+        """
+        return self.get_object('PROJECTS', project_pk)
+
+    def get_projects_by_pks(self, project_pks, max_workers=8, in_filter=None):
+        """
+        GET the projects with the given PKs concurrently, returning a
+        dictionary of them keyed by PK, see get_objects
+        """
+        return self.get_objects(
+            'PROJECTS',
+            project_pks,
+            max_workers=max_workers,
+            in_filter=in_filter
+        )
+
+    def specimens_query(self, specimen_name=None):
+        """
+        Returns the URL and query parameters sent by get_specimens
+        """
+        url = self.build_url('SPECIMENS')
+        filter_params = dict()
+
+        if specimen_name is not None:
+            filter_params['specimen_name'] = specimen_name
+
+        return url, filter_params
+
+    def get_specimens(self, specimen_name=None):
+        url, filter_params = self.specimens_query(specimen_name=specimen_name)
+
+        return self.get_request(url, filter_params)
+
+    def subject_groups_query(self, group_name=None, project_pk=None):
+        """
+        Returns the URL and query parameters sent by get_subject_groups
+        """
+        url = self.build_url('SUBJECT_GROUPS')
+        filter_params = dict()
+
+        if group_name is not None:
+            filter_params['group_name'] = group_name
+
+        if project_pk is not None:
+            filter_params['project'] = project_pk
+
+        return url, filter_params
+
+    def get_subject_groups(self, group_name=None, project_pk=None):
+        url, filter_params = self.subject_groups_query(
+            group_name=group_name,
+            project_pk=project_pk
+        )
+
+        return self.get_request(url, filter_params)
+
+    def get_subject_groups_by_pks(
+            self,
+            subject_group_pks,
+            max_workers=8,
+            in_filter=None):
+        """
+        GET the subject groups with the given PKs concurrently, returning a
+        dictionary of them keyed by PK, see get_objects
+        """
+        return self.get_objects(
+            'SUBJECT_GROUPS',
+            subject_group_pks,
+            max_workers=max_workers,
+            in_filter=in_filter
+        )
+
+    def visit_types_query(self, visit_type_name=None, project_pk=None):
+        """
+        Returns the URL and query parameters sent by get_visit_types
+        """
+        url = self.build_url('VISIT_TYPES')
+        filter_params = dict()
+
+        if visit_type_name is not None:
+            filter_params['visit_type_name'] = visit_type_name
+
+        if project_pk is not None:
+            filter_params['project'] = project_pk
+
+        return url, filter_params
+
+    def get_visit_types(self, visit_type_name=None, project_pk=None):
+        url, filter_params = self.visit_types_query(
+            visit_type_name=visit_type_name,
+            project_pk=project_pk
+        )
+
+        return self.cache_objects(
+            'VISIT_TYPES',
+            self.get_request(url, filter_params)
+        )
+
+    def get_visit_type(self, visit_type_pk):
+        """
+        GET a serialized ProjectVisitType instance
+            visit_type_pk    (required)
+
+        Returns a dictionary with keys:
+            'status': The HTTP response code
+            'reason': The HTTP response reason
+            'data': Dictionary representation of object
+        """
+        return self.get_object('VISIT_TYPES', visit_type_pk)
+
+    def get_visit_types_by_pks(
+            self,
+            visit_type_pks,
+            max_workers=8,
+            in_filter=None):
+        """
+        GET the visit types with the given PKs concurrently, returning a
+        dictionary of them keyed by PK, see get_objects
+        """
+        return self.get_objects(
+            'VISIT_TYPES',
+            visit_type_pks,
+            max_workers=max_workers,
+            in_filter=in_filter
+        )
+
+    def sites_query(self, site_name=None, project_pk=None):
+        """
+        Returns the URL and query parameters sent by get_sites
+        """
+        url = self.build_url('SITES')
+        filter_params = dict()
+
+        if site_name is not None:
+            filter_params['site_name'] = site_name
+
+        if project_pk is not None:
+            filter_params['project'] = project_pk
+
+        return url, filter_params
+
+    def get_sites(self, site_name=None, project_pk=None):
+        url, filter_params = self.sites_query(
+            site_name=site_name,
+            project_pk=project_pk
+        )
+
+        return self.cache_objects(
+            'SITES',
+            self.get_request(url, filter_params)
+        )
+
+    def get_site(self, site_pk):
+        """
+        GET a serialized Site instance
+            site_pk    (required)
+
+        Returns a dictionary with keys:
+            'status': The HTTP response code
+            'reason': The HTTP response reason
+            'data': Dictionary representation of object
+        """
+        return self.get_object('SITES', site_pk)
+
+    def get_sites_by_pks(self, site_pks, max_workers=8, in_filter=None):
+        """
+        GET the sites with the given PKs concurrently, returning a
+        dictionary of them keyed by PK, see get_objects
+        """
+        return self.get_objects(
+            'SITES',
+            site_pks,
+            max_workers=max_workers,
+            in_filter=in_filter
+        )
+
+    def subjects_query(
+            self,
+            subject_code=None,
+            project_pk=None,
+            subject_group_pk=None):
+        """
+        Returns the URL and query parameters sent by get_subjects
+        """
+        url = self.build_url('SUBJECTS')
+        filter_params = dict()
+
+        if subject_code is not None:
+            filter_params['subject_code'] = subject_code
+
+        if project_pk is not None:
+            filter_params['project'] = project_pk
+
+        if subject_group_pk is not None:
+            filter_params['subject_group'] = subject_group_pk
+
+        return url, filter_params
+
+    def get_subjects(
+            self,
+            subject_code=None,
+            project_pk=None,
+            subject_group_pk=None):
+        url, filter_params = self.subjects_query(
+            subject_code=subject_code,
+            project_pk=project_pk,
+            subject_group_pk=subject_group_pk
+        )
+
+        return self.cache_objects(
+            'SUBJECTS',
+            self.get_request(url, filter_params)
+        )
+
+    def iter_subjects(self, **kwargs):
+        """
+        Iterates over the subjects matching the get_subjects filters,
+        see iterate
+        """
+        return self.iterate(self.get_subjects, **kwargs)
+
+    def get_subject(self, subject_pk):
+        """
+        GET a serialized Subject instance
+            subject_pk    (required)
+
+        Returns a dictionary with keys:
+            'status': The HTTP response code
+            'reason': The HTTP response reason
+            'data': Dictionary representation of object
+        """
+        return self.get_object('SUBJECTS', subject_pk)
+
+    def get_subjects_by_pks(self, subject_pks, max_workers=8, in_filter=None):
+        """
+        GET the subjects with the given PKs concurrently, returning a
+        dictionary of them keyed by PK, see get_objects
+        """
+        return self.get_objects(
+            'SUBJECTS',
+            subject_pks,
+            max_workers=max_workers,
+            in_filter=in_filter
+        )
+
+    def project_panels_query(
+            self,
+            panel_name=None,
+            staining=None,
+            project_pk=None):
+        """
+        Returns the URL and query parameters sent by get_project_panels
+        """
+        url = self.build_url('PROJECT_PANELS')
+        filter_params = dict()
+
+        if panel_name is not None:
+            filter_params['panel_name'] = panel_name
+
+        if staining is not None:
+            filter_params['staining'] = staining
+
+        if project_pk is not None:
+            filter_params['project'] = project_pk
+
+        return url, filter_params
+
+    def get_project_panels(
+            self,
+            panel_name=None,
+            staining=None,
+            project_pk=None):
+        url, filter_params = self.project_panels_query(
+            panel_name=panel_name,
+            staining=staining,
+            project_pk=project_pk
+        )
+
+        return self.get_request(url, filter_params)
+
+    def get_project_panel(self, project_panel_pk):
+        """
+        GET a serialized ProjectPanel instance
+            project_panel_pk    (required)
+
+        Returns a dictionary with keys:
+            'status': The HTTP response code
+            'reason': The HTTP response reason
+            'data': Dictionary representation of object
+        """
+        return self.get_request(
+            self.build_url('PROJECT_PANELS', project_panel_pk))
+
+    def get_project_panels_by_pks(
+            self,
+            project_panel_pks,
+            max_workers=8,
+            in_filter=None):
+        """
+        GET the project panels with the given PKs concurrently, returning a
+        dictionary of them keyed by PK, see get_objects
+        """
+        return self.get_objects(
+            'PROJECT_PANELS',
+            project_panel_pks,
+            max_workers=max_workers,
+            in_filter=in_filter
+        )
+
+    def site_panels_query(
+            self,
+            project_panel_pk=None,
+            site_pk=None,
+            project_pk=None,
+            panel_type=None):
+        """
+        Returns the URL and query parameters sent by get_site_panels
+        """
+        url = self.build_url('SITE_PANELS')
+        filter_params = dict()
+
+        if site_pk is not None:
+            filter_params['site'] = site_pk
+
+        if project_panel_pk is not None:
+            filter_params['panel_template'] = project_panel_pk
+
+        if project_pk is not None:
+            filter_params['project'] = project_pk
+
+        if panel_type is not None:
+            filter_params['panel_type'] = panel_type
+
+        return url, filter_params
+
+    def get_site_panels(
+            self,
+            project_panel_pk=None,
+            site_pk=None,
+            project_pk=None,
+            panel_type=None):
+        url, filter_params = self.site_panels_query(
+            project_panel_pk=project_panel_pk,
+            site_pk=site_pk,
+            project_pk=project_pk,
+            panel_type=panel_type
+        )
+
+        return self.cache_objects(
+            'SITE_PANELS',
+            self.get_request(url, filter_params)
+        )
+
+    def get_site_panel(self, site_panel_pk):
+        """
+        GET a serialized SitePanel instance
+            site_panel_pk    (required)
+
+        Returns a dictionary with keys:
+            'status': The HTTP response code
+            'reason': The HTTP response reason
+            'data': Dictionary representation of object
+        """
+        return self.get_object('SITE_PANELS', site_panel_pk)
+
+    def get_site_panels_by_pks(
+            self,
+            site_panel_pks,
+            max_workers=8,
+            in_filter=None):
+        """
+        GET the site panels with the given PKs concurrently, returning a
+        dictionary of them keyed by PK, see get_objects
+        """
+        return self.get_objects(
+            'SITE_PANELS',
+            site_panel_pks,
+            max_workers=max_workers,
+            in_filter=in_filter
+        )
+
+    def is_site_panel_match(self, site_panel_pk, parameter_dict):
+        """
+        GET a serialized ProjectPanel instance
+            site_panel_pk    (required)
+
+        Returns True/False whether dictionary matches the site panel.
+        To check many files against a site panel, get its matcher once
+        with get_site_panel_matcher instead.
+        """
+
+        # TODO: verify the parameter_dict
+
+        response = self.get_site_panel(site_panel_pk)
+
+        return self.site_panel_response_match(response, parameter_dict)
+
+    @staticmethod
+    def site_panel_response_match(response, parameter_dict):
+        """
+        Returns True/False whether dictionary matches the site panel
+        in a get_site_panel response
+        """
+        if not isinstance(response.get('data'), dict):
+            return False
+
+        return panels.SitePanelMatcher(response['data']).is_match(
+            parameter_dict)
+
+    @staticmethod
+    def site_panels_from_response(response, single=False):
+        """
+        Returns the serialized site panel(s) of a get_site_panel (single)
+        or get_site_panels response, raises pagination.ResponseError if
+        the request failed
+        """
+        if response['status'] != 200:
+            raise pagination.ResponseError(response)
+
+        if single:
+            return response['data']
+
+        site_panels, next_url = pagination.page_records(response['data'])
+        return site_panels
+
+    def get_site_panel_matcher(self, site_panel_pk):
+        """
+        Returns a panels.SitePanelMatcher for the site panel, fetched
+        once to match any number of parameter dictionaries in memory.
+        Raises pagination.ResponseError if the site panel can't be
+        retrieved.
+        """
+        response = self.get_site_panel(site_panel_pk)
+
+        return panels.SitePanelMatcher(
+            self.site_panels_from_response(response, single=True))
+
+    def get_project_panel_matcher(
+            self,
+            project_pk=None,
+            project_panel_pk=None,
+            site_pk=None,
+            panel_type=None):
+        """
+        Returns a panels.PanelMatcher for all the site panels matching
+        the get_site_panels filters, e.g. a project's, to match files
+        against every candidate site panel in one pass. Raises
+        pagination.ResponseError if the site panels can't be retrieved.
+        """
+        response = self.get_site_panels(
+            project_panel_pk=project_panel_pk,
+            site_pk=site_pk,
+            project_pk=project_pk,
+            panel_type=panel_type
+        )
+
+        site_panels = []
+        for site_panel in self.site_panels_from_response(response):
+            if 'parameters' not in site_panel:
+                # not part of the list representation, fetch in full
+                site_panel = self.site_panels_from_response(
+                    self.get_site_panel(site_panel['id']), single=True)
+            site_panels.append(site_panel)
+
+        return panels.PanelMatcher(site_panels)
+
+    def compensations_query(
+            self,
+            name=None,
+            site_panel_pk=None,
+            site_pk=None,
+            project_pk=None,
+            acquisition_date=None):
+        """
+        Returns the URL and query parameters sent by get_compensations
+        """
+        url = self.build_url('COMPENSATIONS')
+        filter_params = dict()
+
+        if name is not None:
+            filter_params['name'] = name
+
+        if site_panel_pk is not None:
+            filter_params['site_panel'] = site_panel_pk
+
+        if site_pk is not None:
+            filter_params['site'] = site_pk
+
+        if project_pk is not None:
+            filter_params['project'] = project_pk
+
+        if acquisition_date is not None:
+            filter_params['acquisition_date'] = acquisition_date
+
+        return url, filter_params
+
+    def get_compensations(
+            self,
+            name=None,
+            site_panel_pk=None,
+            site_pk=None,
+            project_pk=None,
+            acquisition_date=None):
+        url, filter_params = self.compensations_query(
+            name=name,
+            site_panel_pk=site_panel_pk,
+            site_pk=site_pk,
+            project_pk=project_pk,
+            acquisition_date=acquisition_date
+        )
+
+        return self.cache_objects(
+            'COMPENSATIONS',
+            self.get_request(url, filter_params)
+        )
+
+    def get_compensation(self, compensation_pk):
+        """
+        GET a serialized Compensation instance
+            compensation_pk    (required)
+
+        Returns a dictionary with keys:
+            'status': The HTTP response code
+            'reason': The HTTP response reason
+            'data': Dictionary representation of object
+        """
+        return self.get_object('COMPENSATIONS', compensation_pk)
+
+    def stimulations_query(self, project_pk=None, stimulation_name=None):
+        """
+        Returns the URL and query parameters sent by get_stimulations
+        """
+        url = self.build_url('STIMULATIONS')
+        filter_params = dict()
+
+        if project_pk is not None:
+            filter_params['project'] = project_pk
+
+        if stimulation_name is not None:
+            filter_params['stimulation_name'] = stimulation_name
+
+        return url, filter_params
+
+    def get_stimulations(self, project_pk=None, stimulation_name=None):
+        url, filter_params = self.stimulations_query(
+            project_pk=project_pk,
+            stimulation_name=stimulation_name
+        )
+
+        return self.cache_objects(
+            'STIMULATIONS',
+            self.get_request(url, filter_params)
+        )
+
+    def get_stimulation(self, stimulation_pk):
+        """
+        GET a serialized Stimulation instance
+            stimulation_pk    (required)
+
+        Returns a dictionary with keys:
+            'status': The HTTP response code
+            'reason': The HTTP response reason
+            'data': Dictionary representation of object
+        """
+        return self.get_object('STIMULATIONS', stimulation_pk)
+
+    def get_stimulations_by_pks(
+            self,
+            stimulation_pks,
+            max_workers=8,
+            in_filter=None):
+        """
+        GET the stimulations with the given PKs concurrently, returning a
+        dictionary of them keyed by PK, see get_objects
+        """
+        return self.get_objects(
+            'STIMULATIONS',
+            stimulation_pks,
+            max_workers=max_workers,
+            in_filter=in_filter
+        )
+
+    def samples_query(
+            self,
+            subject_pk=None,
+            site_pk=None,
+            project_pk=None,
+            visit_pk=None,
+            stimulation_pk=None,
+            specimen_pk=None,
+            site_panel_pk=None,
+            project_panel_pk=None,
+            original_filename=None,
+            subject_code=None,
+            acquisition_date=None,
+            sha1=None):
+        """
+        Returns the URL and query parameters sent by get_samples
+        """
+        url = self.build_url('SAMPLES')
+        filter_params = dict()
+
+        if subject_pk is not None:
+            filter_params['subject'] = subject_pk
+
+        if site_pk is not None:
+            filter_params['site'] = site_pk
+
+        if project_pk is not None:
+            filter_params['project'] = project_pk
+
+        if visit_pk is not None:
+            filter_params['visit'] = visit_pk
+
+        if stimulation_pk is not None:
+            filter_params['stimulation'] = stimulation_pk
+
+        if specimen_pk is not None:
+            filter_params['specimen'] = specimen_pk
+
+        if site_panel_pk is not None:
+            filter_params['site_panel'] = site_panel_pk
+
+        if project_panel_pk is not None:
+            filter_params['panel'] = project_panel_pk
+
+        if original_filename is not None:
+            filter_params['original_filename'] = original_filename
+
+        if subject_code is not None:
+            filter_params['subject_code'] = subject_code
+
+        if acquisition_date is not None:
+            filter_params['acquisition_date'] = acquisition_date
+
+        if sha1 is not None:
+            filter_params['sha1'] = sha1
+
+        return url, filter_params
+
+    def get_samples(
+            self,
+            subject_pk=None,
+            site_pk=None,
+            project_pk=None,
+            visit_pk=None,
+            stimulation_pk=None,
+            specimen_pk=None,
+            site_panel_pk=None,
+            project_panel_pk=None,
+            original_filename=None,
+            subject_code=None,
+            acquisition_date=None,
+            sha1=None):
+        url, filter_params = self.samples_query(
+            subject_pk=subject_pk,
+            site_pk=site_pk,
+            project_pk=project_pk,
+            visit_pk=visit_pk,
+            stimulation_pk=stimulation_pk,
+            specimen_pk=specimen_pk,
+            site_panel_pk=site_panel_pk,
+            project_panel_pk=project_panel_pk,
+            original_filename=original_filename,
+            subject_code=subject_code,
+            acquisition_date=acquisition_date,
+            sha1=sha1
+        )
+
+        return self.get_request(url, filter_params)
+
+    def iter_samples(self, **kwargs):
+        """
+        Iterates over the samples matching the get_samples filters,
+        see iterate
+        """
+        return self.iterate(self.get_samples, **kwargs)
+
+    def get_sample(self, sample_pk):
+        """
+        GET a serialized Sample instance
+            sample_pk    (required)
+
+        Returns a dictionary with keys:
+            'status': The HTTP response code
+            'reason': The HTTP response reason
+            'data': Dictionary representation of object
+        """
+        return self.get_request(self.build_url('SAMPLES', sample_pk))
+
+    def get_samples_by_pks(self, sample_pks, max_workers=8, in_filter=None):
+        """
+        GET the samples with the given PKs concurrently, returning a
+        dictionary of them keyed by PK, see get_objects
+        """
+        return self.get_objects(
+            'SAMPLES',
+            sample_pks,
+            max_workers=max_workers,
+            in_filter=in_filter
+        )
+
+    def download_sample(
+            self,
+            sample_pk,
+            filename=None,
+            directory=None,
+            resume=False,
+            sha1=None,
+            verify=False):
+        """
+        Download sample as FCS
+
+        Options:
+            'resume': keep a partial file if the download fails, and
+                      continue from it on the next call with resume=True
+            'sha1': expected SHA-1 of the file, checked as it downloads
+            'verify': if True and sha1 isn't given, look up the sample's
+                      SHA-1 first (one extra metadata request)
+
+        If the client's download_segments is more than 1, the file is
+        fetched as parallel byte ranges (see segmented_download) unless
+        resume is True.
+
+        If the client has a sample_cache, the sample's SHA-1 is looked up
+        (unless given) and a cached copy of the file is used when there is
+        one, so a cache hit costs one metadata request and no transfer.
+
+        On a SHA-1 mismatch the file is not saved, and the status is None
+        with the reason 'SHA-1 mismatch'. The returned dictionary includes
+        the file's 'sha1'.
+        """
+        if sha1 is None and (verify or self.sample_cache is not None):
+            response = self.get_sample(sample_pk)
+            if response['status'] != 200:
+                return response
+            sha1 = response['data']['sha1']
+
+        url = self.build_url('SAMPLES', sample_pk, 'fcs_original')
+
+        if filename is None:
+            filename = str(sample_pk) + '.fcs'
+        if directory is None:
+            directory = os.getcwd()
+
+        return self.download_fcs(
+            url,
+            "%s/%s" % (directory, filename),
+            resume=resume,
+            sha1=sha1,
+            cache_key=sha1
+        )
+
+    def download_samples(
+            self,
+            sample_pk_list,
+            directory=None,
+            clean=False,
+            max_workers=4,
+            resume=False,
+            verify=False,
+            deadline=None):
+        """
+        Download multiple samples as FCS files concurrently, named
+        <PK>.fcs (or <PK>_clean.fcs if clean is True). See download_sample
+        for the resume and verify options, verify only applies to the
+        original (not clean) FCS files. deadline limits the seconds taken
+        by all the downloads, see bulk_download.
+
+        Returns a dictionary with keys:
+            'results': List of the individual download_sample dictionaries
+            'bytes': Total number of bytes downloaded
+            'seconds': Wall-clock seconds taken by all the downloads
+            'mbps': Aggregate download rate in megabits per second
+        """
+        options = {
+            'directory': directory,
+            'resume': resume,
+        }
+
+        if clean:
+            download_function = self.download_clean_sample
+        else:
+            download_function = self.download_sample
+            options['verify'] = verify
+
+        return self.bulk_download(
+            download_function,
+            sample_pk_list,
+            max_workers=max_workers,
+            deadline=deadline,
+            **options
+        )
+
+    def download_clean_sample(
+            self,
+            sample_pk,
+            filename=None,
+            directory=None,
+            resume=False):
+        """
+        Download clean sample as FCS
+
+        Options:
+            'resume': keep a partial file if the download fails, and
+                      continue from it on the next call with resume=True
+
+        If the client's download_segments is more than 1, the file is
+        fetched as parallel byte ranges (see segmented_download) unless
+        resume is True.
+
+        If the client has a sample_cache, the clean file is cached under
+        the sample's SHA-1 (looked up first) with a '_clean' suffix.
+        """
+        cache_key = None
+        if self.sample_cache is not None:
+            response = self.get_sample(sample_pk)
+            if response['status'] != 200:
+                return response
+            cache_key = response['data']['sha1'] + '_clean'
+
+        url = self.build_url('SAMPLES', sample_pk, 'fcs_clean')
+
+        if filename is None:
+            filename = str(sample_pk) + '_clean.fcs'
+        if directory is None:
+            directory = os.getcwd()
+
+        return self.download_fcs(
+            url,
+            "%s/%s" % (directory, filename),
+            resume=resume,
+            cache_key=cache_key
+        )
+
+    def post_sample(
+            self,
+            file_path,
+            subject_pk,
+            visit_type_pk,
+            specimen_pk,
+            pretreatment,
+            storage,
+            stimulation_pk,
+            site_panel_pk,
+            acquisition_date,
+            compensation_pk=None):
+        """
+        POST a FCS sample, associating the file with the following:
+            subject_pk       (required)
+            visit_type_pk    (required)
+            specimen_pk      (required)
+            pretreatment     (required)
+            storage          (required)
+            stimulation_pk   (required)
+            site_panel_pk    (required)
+            acquisition_date (required)
+            compensation_pk  (optional)
+
+        Returns a dictionary with keys:
+            'status': The HTTP response code
+            'reason': The HTTP response reason
+            'data': Dictionary string representation of object successfully
+                    posted, empty string if unsuccessful
+        """
+        url = self.build_url('CREATE_SAMPLES')
+
+        # Subject, visit, specimen, stimulation, and site_panel are required
+        data = {
+            'subject': subject_pk,
+            'visit': visit_type_pk,
+            'specimen': specimen_pk,
+            'pretreatment': pretreatment,
+            'storage': storage,
+            'stimulation': stimulation_pk,
+            'site_panel': site_panel_pk,
+            'acquisition_date': acquisition_date
+        }
+
+        # add the compensation field if present
+        if compensation_pk:
+            data['compensation'] = compensation_pk
+
+        # a failed upload is only retried once it is clear the host does
+        # not have the file, i.e. no sample has the same SHA-1
+        return self.post_file(
+            url,
+            data,
+            'sample_file',
+            file_path,
+            find_existing=lambda: self.posted_sample(file_path)
+        )
+
+    def sample_metadata_query(self, sample_pk=None, key=None):
+        """
+        Returns the URL and query parameters sent by get_sample_metadata
+        """
+        url = self.build_url('SAMPLE_METADATA')
+        filter_params = dict()
+
+        if sample_pk is not None:
+            filter_params['sample'] = sample_pk
+
+        if key is not None:
+            filter_params['key'] = key
+
+        return url, filter_params
+
+    def get_sample_metadata(self, sample_pk=None, key=None):
+        url, filter_params = self.sample_metadata_query(
+            sample_pk=sample_pk,
+            key=key
+        )
+
+        return self.get_request(url, filter_params)
+
+    def get_sample_collection(self, sample_collection_pk):
+        """
+        GET a serialized Sample Collection instance
+            sample_collection_pk    (required)
+
+        Returns a dictionary with keys:
+            'status': The HTTP response code
+            'reason': The HTTP response reason
+            'data': Dictionary representation of object
+        """
+        return self.get_request(
+            self.build_url('SAMPLE_COLLECTION', sample_collection_pk))
+
+    def download_compensation(
+            self,
+            compensation_pk,
+            data_format='npy',
+            filename=None,
+            directory=None):
+        """
+        Download sample data as CSV or Numpy (npy)
+
+        Options:
+            'data_format': 'npy' (default) or 'csv'
+            'filename': filename to use for downloaded file
+                        (default is the comp_<PK>.<format>, eg comp_42.npy)
+        """
+        if data_format not in ('npy', 'csv'):
+            print(
+                "Data format %s not supported, use 'npy' or 'csv'" %
+                data_format)
+            return
+
+        url = self.build_url('COMPENSATIONS', compensation_pk, data_format)
+
+        if filename is None:
+            filename = 'comp_' + str(compensation_pk) + '.' + data_format
+        if directory is None:
+            directory = os.getcwd()
+
+        return self.download(url, "%s/%s" % (directory, filename))
+
+    def download_compensations(
+            self,
+            compensation_pk_list,
+            data_format='npy',
+            directory=None,
+            max_workers=4,
+            deadline=None):
+        """
+        Download multiple compensations concurrently as CSV or Numpy (npy),
+        named comp_<PK>.<format>. deadline limits the seconds taken by all
+        the downloads, see bulk_download.
+
+        Returns a dictionary with keys:
+            'results': List of the individual download_compensation
+                       dictionaries
+            'bytes': Total number of bytes downloaded
+            'seconds': Wall-clock seconds taken by all the downloads
+            'mbps': Aggregate download rate in megabits per second
+        """
+        if data_format not in ('npy', 'csv'):
+            print(
+                "Data format %s not supported, use 'npy' or 'csv'" %
+                data_format)
+            return
+
+        return self.bulk_download(
+            self.download_compensation,
+            compensation_pk_list,
+            max_workers=max_workers,
+            deadline=deadline,
+            data_format=data_format,
+            directory=directory
+        )
+
+    def post_compensation(
+            self,
+            name,
+            panel_template_pk,
+            acquisition_date,
+            matrix_text):
+        """
+        POST a compensation matrix. The matrix text can be comma or tab
+        delimited.
+            name              (required)
+            panel_template_pk (required)
+            acquisition_date  (required)
+            matrix_text       (required)
+
+        Returns a dictionary with keys:
+            'status': The HTTP response code
+            'reason': The HTTP response reason
+            'data': Dictionary string representation of object successfully
+                    posted, empty string if unsuccessful
+        """
+        url = self.build_url('CREATE_COMPENSATION')
+
+        data = {
+            'name': name,
+            'panel_template': panel_template_pk,
+            'acquisition_date': acquisition_date,
+            'matrix_text': matrix_text
+        }
+
+        return self.send('POST', url, 201, data=data)
+
+    ###################################
+    # START PROCESS MANAGER FUNCTIONS #
+    #    Note: Most of these require  #
+    #    the user to be a superuser   #
+    #    or a Worker                  #
+    ###################################
+    def processes_query(self, process_name=None):
+        """
+        Returns the URL and query parameters sent by get_processes
+        """
+        url = self.build_url('PROCESSES')
+        filter_params = dict()
+
+        if process_name is not None:
+            filter_params['process_name'] = process_name
+
+        return url, filter_params
+
+    def get_processes(self, process_name=None):
+        url, filter_params = self.processes_query(process_name=process_name)
+
+        return self.get_request(url, filter_params)
+
+    def workers_query(self, worker_name=None):
+        """
+        Returns the URL and query parameters sent by get_workers
+        """
+        url = self.build_url('WORKERS')
+        filter_params = dict()
+
+        if worker_name is not None:
+            filter_params['worker_name'] = worker_name
+
+        return url, filter_params
+
+    def get_workers(self, worker_name=None):
+        url, filter_params = self.workers_query(worker_name=worker_name)
+
+        return self.get_request(url, filter_params)
+
+    def process_requests_query(
+            self,
+            process_pk=None,
+            worker_pk=None,
+            request_user_pk=None):
+        """
+        Returns the URL and query parameters sent by get_process_requests
+        """
+        url = self.build_url('PROCESS_REQUESTS')
+        filter_params = dict()
+
+        if process_pk is not None:
+            filter_params['process'] = process_pk
+
+        if worker_pk is not None:
+            filter_params['worker'] = worker_pk
+
+        if request_user_pk is not None:
+            filter_params['request_user'] = request_user_pk
+
+        return url, filter_params
+
+    def get_process_requests(
+            self,
+            process_pk=None,
+            worker_pk=None,
+            request_user_pk=None):
+        url, filter_params = self.process_requests_query(
+            process_pk=process_pk,
+            worker_pk=worker_pk,
+            request_user_pk=request_user_pk
+        )
+
+        return self.get_request(url, filter_params)
+
+    def iter_process_requests(self, **kwargs):
+        """
+        Iterates over the process requests matching the
+        get_process_requests filters, see iterate
+        """
+        return self.iterate(self.get_process_requests, **kwargs)
+
+    def assigned_process_requests_query(self):
+        """
+        Returns the URL and query parameters sent by
+        get_assigned_process_requests
+        """
+        url = self.build_url('ASSIGNED_PROCESS_REQUESTS')
+        filter_params = dict()
+
+        return url, filter_params
+
+    def get_assigned_process_requests(self):
+        """
+        Returns process requests that are assigned to the requesting worker
+        i.e. the requesting user must be a Worker in the ReFlow server
+        Also, only non-Completed requests will be returned
+        """
+        url, filter_params = self.assigned_process_requests_query()
+
+        return self.get_request(url, filter_params)
+
+    def viable_process_requests_query(
+            self,
+            process_pk=None,
+            worker_pk=None,
+            request_user_pk=None):
+        """
+        Returns the URL and query parameters sent by
+        get_viable_process_requests
+        """
+        url = self.build_url('VIABLE_PROCESS_REQUESTS')
+        filter_params = dict()
+
+        if process_pk is not None:
+            filter_params['process'] = process_pk
+
+        if worker_pk is not None:
+            filter_params['worker'] = worker_pk
+
+        if request_user_pk is not None:
+            filter_params['request_user'] = request_user_pk
+
+        return url, filter_params
+
+    def get_viable_process_requests(
+            self,
+            process_pk=None,
+            worker_pk=None,
+            request_user_pk=None):
+        """
+        Returns process requests that are compatible with the requesting user
+        i.e. the requesting user must be a Worker registered with the Process
+        Also, only unassigned 'Pending' requests will be returned
+        """
+        url, filter_params = self.viable_process_requests_query(
+            process_pk=process_pk,
+            worker_pk=worker_pk,
+            request_user_pk=request_user_pk
+        )
+
+        return self.get_request(url, filter_params)
+
+    def get_process_request(self, process_request_pk):
+        """
+        GET a serialized ProcessRequest instance
+            process_request_pk    (required)
+
+        Returns a dictionary with keys:
+            'status': The HTTP response code
+            'reason': The HTTP response reason
+            'data': Dictionary representation of object
+        """
+        return self.get_request(
+            self.build_url('PROCESS_REQUESTS', process_request_pk))
+
+    def request_pr_assignment(self, process_request_pk):
+        """
+        Requesting user must be a Worker registered with the Process and
+        and the ProcessRequest must have 'Pending' status
+        """
+        url = self.build_url(
+            'PROCESS_REQUESTS',
+            process_request_pk,
+            'request_assignment')
+
+        return self.send(
+            'PATCH',
+            url,
+            201,
+            data={
+                'process_request': process_request_pk
+            }
+        )
+
+    def report_pr_error(self, process_request_pk, error_msg_string):
+        """
+        Requesting user must be a Worker assigned to the ProcessRequest and
+        and the ProcessRequest must have 'Worker' status
+        """
+        url = self.build_url(
+            'PROCESS_REQUESTS',
+            process_request_pk,
+            'report_error')
+
+        return self.send(
+            'PATCH',
+            url,
+            201,
+            raise_errors=True,
+            retry_check=True,  # setting the same message again is harmless
+            data={
+                'status_message': error_msg_string
+            }
+        )
+
+    def verify_pr_assignment(self, process_request_pk):
+        """
+        Result will include 'assignment': True of request.user (Worker) is
+        assigned to the specified ProcessRequest
+        """
+        url = self.build_url(
+            'PROCESS_REQUESTS',
+            process_request_pk,
+            'verify_assignment')
+        filter_params = dict()
+
+        if process_request_pk is not None:
+            filter_params['process_request'] = process_request_pk
+
+        return self.get_request(url, filter_params)
+
+    def revoke_pr_assignment(self, process_request_pk):
+        """
+        Requests un-assignment from a ProcessRequest on the ReFlow server
+        """
+        url = self.build_url(
+            'PROCESS_REQUESTS',
+            process_request_pk,
+            'revoke_assignment')
+        filter_params = dict()
+
+        if process_request_pk is not None:
+            filter_params['process_request'] = process_request_pk
+
+        # not retried, the host may have applied it already
+        return self.get_request(url, filter_params, idempotent=False)
+
+    def purge_pr_results(self, process_request_pk):
+        """
+        Requests that previous ProcessRequest results be deleted. Only works
+        for uncompleted PRs, and only for the assigned Worker.
+        """
+        url = self.build_url(
+            'PROCESS_REQUESTS',
+            process_request_pk,
+            'purge_results')
+        filter_params = dict()
+
+        if process_request_pk is not None:
+            filter_params['process_request'] = process_request_pk
+
+        # not retried, the host may have applied it already
+        return self.get_request(url, filter_params, idempotent=False)
+
+    def report_pr_progress(self, process_request_pk, percent_complete):
+        """
+        Requesting user must be a Worker assigned to the ProcessRequest and
+        and the ProcessRequest must have 'Worker' status. Percent complete
+        should be an integer, and will be reported back as such to the
+        ReFlow server.
+        """
+        url = '%s%s' % (self.build_url('PROCESS_REQUESTS'), process_request_pk)
+
+        return self.send(
+            'PATCH',
+            url,
+            201,
+            raise_errors=True,
+            retry_check=True,  # setting the same progress again is harmless
+            data={
+                'percent_complete': percent_complete
+            }
+        )
+
+    def complete_pr_assignment(self, process_request_pk):
+        """
+        Report that the ProcessRequest has been completed
+        """
+        url = self.build_url(
+            'PROCESS_REQUESTS',
+            process_request_pk,
+            'complete_assignment')
+        filter_params = dict()
+
+        if process_request_pk is not None:
+            filter_params['process_request'] = process_request_pk
+
+        # not retried, the host may have applied it already
+        return self.get_request(url, filter_params, idempotent=False)
+
+    def verify_worker(self):
+        """
+        Result will include 'worker': True if request.user is a Worker on host
+        """
+        url = self.build_url('VERIFY_WORKER')
+        filter_params = dict()
+
+        return self.get_request(url, filter_params)
+
+    def post_cluster(self, process_request_id, cluster_index):
+        """
+        POST a Cluster instance.
+            process_request_id (required)
+            cluster_index      (required)
+
+        Returns a dictionary with keys:
+            'status': The HTTP response code
+            'reason': The HTTP response reason
+            'data': Dictionary string representation of object successfully
+                    posted, empty string if unsuccessful
+        """
+        url = self.build_url('CLUSTERS')
+
+        # process_request and index are required
+        data = {
+            'process_request': process_request_id,
+            'index': cluster_index
+        }
+
+        return self.send('POST', url, 201, data=data)
+
+    def post_sample_cluster(
+            self,
+            cluster_id,
+            sample_id,
+            param_dict,
+            events,
+            event_percentage,
+            components):
+        """
+        POST a SampleCluster instance.
+            cluster_id     (required)
+            param_dict     (required)
+            event_indices  (required)
+
+        Returns a dictionary with keys:
+            'status': The HTTP response code
+            'reason': The HTTP response reason
+            'data': Dictionary string representation of object successfully
+                    posted, empty string if unsuccessful
+        """
+        url = self.build_url('SAMPLE_CLUSTERS')
+
+        data = {
+            'cluster_id': cluster_id,
+            'sample_id': sample_id,
+            'parameters': param_dict,
+            'events': events,
+            'event_percentage': event_percentage,
+            'components': components
+        }
+
+        # convert to JSON b/c of nested objects (param_dict), the event
+        # indices can make for a large body worth compressing
+        data, headers = self.json_body(data)
+
+        return self.send(
+            'POST',
+            url,
+            201,
+            raise_errors=True,
+            headers=headers,
+            data=data
+        )
+
+    def sample_clusters_query(self, process_request_pk=None):
+        """
+        Returns the URL and query parameters sent by get_sample_clusters
+        """
+        url = self.build_url('SAMPLE_CLUSTERS')
+        filter_params = dict()
+
+        if process_request_pk is not None:
+            filter_params['process_request'] = process_request_pk
+
+        return url, filter_params
+
+    def get_sample_clusters(self, process_request_pk=None):
+        url, filter_params = self.sample_clusters_query(
+            process_request_pk=process_request_pk
+        )
+
+        return self.get_request(url, filter_params)
+
+    def iter_sample_clusters(self, **kwargs):
+        """
+        Iterates over the sample clusters matching the get_sample_clusters
+        filters, see iterate
+        """
+        return self.iterate(self.get_sample_clusters, **kwargs)
+
+    def stream_sample_clusters(self, raw_fields=None, **kwargs):
+        """
+        Streams the sample clusters matching the get_sample_clusters
+        filters, see stream. Pass the heavy event_indices field as a raw
+        field to skip decoding it, or convert it straight to NumPy:
+
+            client.stream_sample_clusters(
+                process_request_pk=pr_pk,
+                raw_fields={'event_indices': streaming.numpy_array}
+            )
+        """
+        return self.stream(
+            self.get_sample_clusters,
+            raw_fields=raw_fields,
+            **kwargs
+        )
+
+    def sample_cluster_components_query(
+            self,
+            process_request_pk=None,
+            sample_pk=None):
+        """
+        Returns the URL and query parameters sent by
+        get_sample_cluster_components
+        """
+        url = self.build_url('SAMPLE_CLUSTER_COMPONENTS')
+        filter_params = dict()
+
+        if process_request_pk is not None:
+            filter_params['process_request'] = process_request_pk
+        if sample_pk is not None:
+            filter_params['sample'] = sample_pk
+
+        return url, filter_params
+
+    def get_sample_cluster_components(
+            self,
+            process_request_pk=None,
+            sample_pk=None):
+        url, filter_params = self.sample_cluster_components_query(
+            process_request_pk=process_request_pk,
+            sample_pk=sample_pk
+        )
+
+        return self.get_request(url, filter_params)
+
+    def download_sample_cluster_events(
+            self,
+            sample_cluster_pk,
+            filename=None,
+            directory=None):
+        """
+        Download sample cluster events as CSV
+
+        Options:
+            'filename': filename to use for downloaded file
+                        (default is sample_cluster_<PK>.csv)
+        """
+        url = self.build_url('SAMPLE_CLUSTERS', sample_cluster_pk, 'csv')
+
+        if filename is None:
+            filename = 'sample_cluster_' + str(sample_cluster_pk) + '.csv'
+        if directory is None:
+            directory = os.getcwd()
+
+        return self.download(url, "%s/%s" % (directory, filename))
+
+    def download_sample_clusters_events(
+            self,
+            sample_cluster_pk_list,
+            directory=None,
+            max_workers=4,
+            deadline=None):
+        """
+        Download the events of multiple sample clusters concurrently as CSV,
+        named sample_cluster_<PK>.csv. deadline limits the seconds taken by
+        all the downloads, see bulk_download.
+
+        Returns a dictionary with keys:
+            'results': List of the individual download_sample_cluster_events
+                       dictionaries
+            'bytes': Total number of bytes downloaded
+            'seconds': Wall-clock seconds taken by all the downloads
+            'mbps': Aggregate download rate in megabits per second
+        """
+        return self.bulk_download(
+            self.download_sample_cluster_events,
+            sample_cluster_pk_list,
+            max_workers=max_workers,
+            deadline=deadline,
+            directory=directory
+        )
@@ -0,0 +1,411 @@
+"""
+File writers used by the client download methods.
+
+A writer receives the streamed response body of a download and is
+responsible for where the bytes go until the download is complete:
+
+    TempFileWriter: writes to a temporary file that replaces the target
+                    file once the whole body has been received
+    PartFileWriter: writes to a <target>.part file with a small JSON
+                    journal, so an interrupted download can be resumed
+                    later with an HTTP Range request
+    SegmentedFileWriter: writes byte range segments fetched in parallel
+                         into one preallocated temporary file
+
+Writers hash the body as it is written and, when given the expected
+SHA-1, raise ChecksumError from commit instead of putting a corrupt file
+in place.
+"""
+import hashlib
+import json
+import os
+import re
+import uuid
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class ChecksumError(IOError):
+    """
+    Raised when a downloaded file does not match its expected SHA-1
+    """
+    pass
+
+
+def check_sha1(expected_sha1, actual_sha1):
+    if expected_sha1 is not None and expected_sha1.lower() != actual_sha1:
+        raise ChecksumError(
+            "SHA-1 mismatch, expected %s, received %s" % (
+                expected_sha1, actual_sha1))
+
+
+def hash_file(hash_obj, file_path, length=None):
+    """
+    Updates hash_obj with the contents of file_path, or only with its
+    first length bytes
+    """
+    with open(file_path, 'rb') as data_file:
+        remaining = length
+        while remaining is None or remaining > 0:
+            block_size = HASH_BLOCK_SIZE
+            if remaining is not None:
+                block_size = min(block_size, remaining)
+                remaining -= block_size
+
+            block = data_file.read(block_size)
+            if not block:
+                break
+            hash_obj.update(block)
+
+    return hash_obj
+
+
+def open_temp_file(file_path):
+    """
+    Opens a new temporary file for writing in the same directory as
+    file_path, so it can later be renamed over file_path atomically.
+    Returns the open file object and its path.
+    """
+    directory, filename = os.path.split(os.path.abspath(file_path))
+    temp_path = os.path.join(
+        directory,
+        '.%s.%s.tmp' % (filename, uuid.uuid4().hex[:12])
+    )
+
+    # unlike tempfile.mkstemp, let the umask decide the file permissions
+    fd = os.open(
+        temp_path,
+        os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0),
+        0o666
+    )
+
+    return os.fdopen(fd, 'wb'), temp_path
+
+
+def commit_temp_file(temp_path, file_path):
+    """
+    Atomically replaces file_path with the finished temporary file
+    """
+    if hasattr(os, 'replace'):
+        os.replace(temp_path, file_path)
+    else:
+        # Python 2, rename does not overwrite existing files on Windows
+        if os.name == 'nt' and os.path.exists(file_path):
+            os.remove(file_path)
+        os.rename(temp_path, file_path)
+
+
+def remove_temp_file(temp_path):
+    try:
+        os.remove(temp_path)
+    except OSError:
+        pass
+
+
+class TempFileWriter(object):
+    """
+    Writes a download to a temporary file next to file_path, which
+    replaces file_path on commit and is removed on abort
+    """
+    ok_statuses = (200,)
+
+    def __init__(self, file_path, sha1=None):
+        self.file_path = file_path
+        self.expected_sha1 = sha1
+        self.offset = 0
+        self.size = 0
+        self.hash = hashlib.sha1()
+
+        self._file = None
+        self._temp_path = None
+
+    def request_headers(self):
+        return {}
+
+    def open(self, status, headers):
+        self._file, self._temp_path = open_temp_file(self.file_path)
+
+    def write(self, chunk):
+        self._file.write(chunk)
+        self.hash.update(chunk)
+        self.size += len(chunk)
+
+    def commit(self):
+        self._file.close()
+        check_sha1(self.expected_sha1, self.hash.hexdigest())
+        commit_temp_file(self._temp_path, self.file_path)
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+        if self._temp_path is not None:
+            remove_temp_file(self._temp_path)
+
+    def discard(self):
+        self.abort()
+
+
+class PartFileWriter(object):
+    """
+    Writes a download of url to <file_path>.part, along with a JSON journal
+    in <file_path>.part.json recording the expected length and the
+    response validators (ETag / Last-Modified).
+
+    If a previous download of the same url was interrupted, the writer
+    picks up where the .part file ends: request_headers returns a Range
+    header for the remaining bytes, guarded by If-Range so a changed file
+    is sent in full. A server ignoring the Range header replies with 200
+    and the .part file is simply started over.
+
+    On abort the .part file and journal are kept for the next attempt,
+    on commit the .part file is renamed to file_path. When resuming, the
+    bytes already in the .part file are hashed once before new bytes
+    arrive.
+    """
+    ok_statuses = (200, 206)
+
+    def __init__(self, url, file_path, sha1=None):
+        self.url = url
+        self.file_path = file_path
+        self.expected_sha1 = sha1
+        self.hash = hashlib.sha1()
+        self.part_path = file_path + '.part'
+        self.journal_path = file_path + '.part.json'
+
+        self.offset = 0
+        self.size = 0
+        self.journal = {}
+
+        self._file = None
+
+        self._load_journal()
+
+    def _load_journal(self):
+        try:
+            with open(self.journal_path) as journal_file:
+                journal = json.load(journal_file)
+            offset = os.path.getsize(self.part_path)
+        except (IOError, OSError, ValueError):
+            return
+
+        if journal.get('url') != self.url:
+            return
+
+        self.journal = journal
+        self.offset = offset
+
+    def _save_journal(self):
+        with open(self.journal_path, 'w') as journal_file:
+            json.dump(self.journal, journal_file)
+
+    def request_headers(self):
+        # byte offsets only make sense for the un-encoded body
+        headers = {'Accept-Encoding': 'identity'}
+
+        if self.offset > 0:
+            headers['Range'] = 'bytes=%d-' % self.offset
+
+            validator = self.journal.get('etag') or \
+                self.journal.get('last_modified')
+            if validator:
+                headers['If-Range'] = validator
+
+        return headers
+
+    def open(self, status, headers):
+        length = None
+
+        if status == 206:
+            match = CONTENT_RANGE_RE.match(headers.get('Content-Range', ''))
+            if match is None or int(match.group(1)) != self.offset:
+                raise IOError(
+                    "Unexpected Content-Range: %s" %
+                    headers.get('Content-Range'))
+            if match.group(3) != '*':
+                length = int(match.group(3))
+            mode = 'ab'
+        else:
+            # server sent the full body, start over
+            self.offset = 0
+            if 'Content-Length' in headers:
+                length = int(headers['Content-Length'])
+            mode = 'wb'
+
+        if self.offset > 0:
+            hash_file(self.hash, self.part_path, self.offset)
+
+        self.journal = {
+            'url': self.url,
+            'length': length,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+        }
+        self._save_journal()
+
+        self._file = open(self.part_path, mode)
+
+    def write(self, chunk):
+        self._file.write(chunk)
+        self.hash.update(chunk)
+        self.size += len(chunk)
+
+    def commit(self):
+        self._file.close()
+
+        length = self.journal.get('length')
+        total_size = self.offset + self.size
+
+        if length is not None and total_size != length:
+            if total_size > length:
+                self.discard()
+            raise IOError(
+                "Expected %d bytes, received %d" % (length, total_size))
+
+        try:
+            check_sha1(self.expected_sha1, self.hash.hexdigest())
+        except ChecksumError:
+            # resuming a corrupt .part file would never succeed
+            self.discard()
+            raise
+
+        commit_temp_file(self.part_path, self.file_path)
+        remove_temp_file(self.journal_path)
+
+    def abort(self):
+        # keep the .part file and journal to resume from later
+        if self._file is not None:
+            self._file.close()
+
+    def discard(self):
+        """
+        Removes the .part file and journal, the next download starts over
+        """
+        self.abort()
+        remove_temp_file(self.part_path)
+        remove_temp_file(self.journal_path)
+        self.offset = 0
+        self.journal = {}
+
+
+def plan_segments(length, segments, min_segment_size):
+    """
+    Splits length bytes into at most the given number of contiguous
+    segments, none smaller than min_segment_size (except when length
+    itself is smaller). Returns a list of inclusive (start, end) byte
+    ranges suitable for Range headers.
+    """
+    count = min(segments, length // max(min_segment_size, 1))
+    count = max(count, 1)
+    segment_size = max(-(-length // count), 1)  # ceiling division
+
+    ranges = []
+    for start in range(0, length, segment_size):
+        ranges.append((start, min(start + segment_size, length) - 1))
+
+    return ranges
+
+
+class SegmentedFileWriter(object):
+    """
+    Writes the byte range segments of a single download, fetched in
+    parallel, into a temporary file preallocated to the full length.
+    Every segment gets its own file handle positioned at its start
+    offset, so segments can be written concurrently from separate
+    threads. On commit every segment must be complete before the
+    temporary file replaces file_path.
+
+    Since segments arrive out of order the SHA-1 can't be computed
+    inline, when an expected SHA-1 is given the finished file is hashed
+    on commit instead.
+    """
+
+    def __init__(self, file_path, length, sha1=None):
+        self.file_path = file_path
+        self.length = length
+        self.expected_sha1 = sha1
+        self.hash = None
+        self.segments = []
+
+        self._temp_path = None
+
+    @property
+    def size(self):
+        return sum(segment.size for segment in self.segments)
+
+    def open(self):
+        data_file, self._temp_path = open_temp_file(self.file_path)
+        with data_file:
+            if hasattr(os, 'posix_fallocate') and self.length > 0:
+                os.posix_fallocate(data_file.fileno(), 0, self.length)
+            data_file.truncate(self.length)
+
+    def segment(self, start, end):
+        segment = SegmentWriter(self._temp_path, start, end)
+        self.segments.append(segment)
+
+        return segment
+
+    def commit(self):
+        for segment in self.segments:
+            if not segment.complete:
+                raise IOError(
+                    "Segment %d-%d incomplete, received %d of %d bytes" % (
+                        segment.start,
+                        segment.end,
+                        segment.size,
+                        segment.end - segment.start + 1))
+
+        covered = sum(s.end - s.start + 1 for s in self.segments)
+        if covered != self.length:
+            raise IOError(
+                "Segments cover %d of %d bytes" % (covered, self.length))
+
+        if self.expected_sha1 is not None:
+            self.hash = hash_file(hashlib.sha1(), self._temp_path)
+            check_sha1(self.expected_sha1, self.hash.hexdigest())
+
+        commit_temp_file(self._temp_path, self.file_path)
+
+    def abort(self):
+        for segment in self.segments:
+            segment.close()
+        if self._temp_path is not None:
+            remove_temp_file(self._temp_path)
+
+
+class SegmentWriter(object):
+    """
+    Writes one inclusive start-end byte range into a preallocated file
+    """
+
+    def __init__(self, path, start, end):
+        self.start = start
+        self.end = end
+        self.size = 0
+
+        self._file = open(path, 'r+b')
+        self._file.seek(start)
+
+    @property
+    def complete(self):
+        return self.size == self.end - self.start + 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, chunk):
+        if self.size + len(chunk) > self.end - self.start + 1:
+            raise IOError(
+                "Segment %d-%d received too many bytes" % (
+                    self.start, self.end))
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
@@ -0,0 +1,111 @@
+"""
+JSON codecs used by the client to decode responses and encode request
+bodies.
+
+The standard library json module is always available. orjson and ujson
+are considerably faster and are used when installed, orjson first:
+
+    ReFlowClient(host, json_codec='ujson')
+
+A codec decodes from bytes or text and encodes to UTF-8 bytes.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class StandardCodec(object):
+    """
+    Standard library json module
+    """
+    name = 'json'
+
+    @staticmethod
+    def loads(data):
+        if isinstance(data, (bytes, bytearray)):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+    @staticmethod
+    def dumps(obj):
+        return json.dumps(obj).encode('utf-8')
+
+
+class OrjsonCodec(object):
+    """
+    orjson, also encodes NumPy arrays (e.g. event indices) directly.
+    Like json, non-string dictionary keys are encoded as strings.
+    """
+    name = 'orjson'
+
+    @staticmethod
+    def loads(data):
+        return orjson.loads(data)
+
+    @staticmethod
+    def dumps(obj):
+        return orjson.dumps(
+            obj,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+
+
+class UjsonCodec(object):
+    """
+    ujson
+    """
+    name = 'ujson'
+
+    @staticmethod
+    def loads(data):
+        return ujson.loads(data)
+
+    @staticmethod
+    def dumps(obj):
+        return ujson.dumps(obj).encode('utf-8')
+
+
+# in order of preference
+CODECS = [
+    (OrjsonCodec, orjson),
+    (UjsonCodec, ujson),
+    (StandardCodec, json),
+]
+
+
+def available_codecs():
+    """
+    Returns the names of the installed codecs, fastest first
+    """
+    return [codec.name for codec, module in CODECS if module is not None]
+
+
+def get_codec(codec=None):
+    """
+    Returns the codec with the given name, or the fastest one installed
+    if codec is None. Codec objects (anything with loads and dumps) are
+    returned as is.
+    """
+    if codec is not None and not isinstance(codec, str):
+        return codec
+
+    for codec_class, module in CODECS:
+        if codec is None:
+            if module is not None:
+                return codec_class()
+        elif codec == codec_class.name:
+            if module is None:
+                raise ValueError("JSON codec %s is not installed" % codec)
+            return codec_class()
+
+    raise ValueError(
+        "Unknown JSON codec %s, use one of %s" % (
+            codec, ', '.join(c.name for c, m in CODECS)))
@@ -0,0 +1,287 @@
+"""
+Client side limits on the load put on the host.
+
+AdaptiveLimiter bounds the number of requests in flight, finding the
+right bound as it goes with AIMD (additive increase, multiplicative
+decrease): while responses come back healthy the limit grows by one
+request per round of limit responses, and it is halved on overload
+responses (429, 503), failed connections or sustained high latency.
+Single slow responses don't count: latency only signals overload when
+a percentile of the recent latencies stays well above the long run
+baseline (and above an absolute floor) for several responses in a
+row, so healthy traffic of mixed fast and slow requests keeps growing
+the limit.
+
+TokenBucket caps the request rate to a fixed number of requests per
+second, allowing short bursts.
+
+Both are thread safe and meant to be shared by every thread using a
+client, or even by several clients talking to the same host:
+
+    client = ReFlowClient(
+        host,
+        limiter=AdaptiveLimiter(max_limit=16),
+        rate_limit=20
+    )
+    ...
+    client.limit_stats()
+"""
+from collections import deque
+import threading
+import time
+
+from reflowrestclient.timeouts import clock
+
+OVERLOAD_STATUSES = frozenset([429, 503])
+
+
+class AdaptiveLimiter(object):
+    """
+    AIMD limit on the number of requests in flight, see the module
+    documentation.
+
+    Options:
+        'initial_limit': limit to start out with
+        'min_limit': the limit never drops below this
+        'max_limit': the limit never grows above this, keep it within
+                     the client's pool_maxsize
+        'backoff_ratio': the limit is multiplied by this on overload
+        'latency_tolerance': the window percentile is elevated when it
+                             is over this many times the baseline
+        'smoothing': weight of a new latency in the baseline (the
+                     smoothed latency), kept low so the baseline
+                     reflects the long run
+        'latency_window': number of recent latencies the percentile is
+                          taken over, no latency overload is detected
+                          before the window is full
+        'latency_percentile': percentile (0 to 1) of the window compared
+                              to the baseline
+        'latency_floor': seconds the window percentile must exceed too,
+                         so small absolute increases never count
+        'slow_samples': number of responses in a row with an elevated
+                        window percentile counted as overload
+        'overload_statuses': response statuses counted as overload
+    """
+
+    def __init__(
+            self,
+            initial_limit=4,
+            min_limit=1,
+            max_limit=64,
+            backoff_ratio=0.5,
+            latency_tolerance=2.0,
+            smoothing=0.02,
+            latency_window=20,
+            latency_percentile=0.5,
+            latency_floor=0.05,
+            slow_samples=3,
+            overload_statuses=OVERLOAD_STATUSES):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.latency_percentile = latency_percentile
+        self.latency_floor = latency_floor
+        self.slow_samples = slow_samples
+        self.overload_statuses = overload_statuses
+
+        self.limit = float(initial_limit)
+        self.in_flight = 0
+
+        # smoothed (baseline) and last observed latency, in seconds
+        self.latency = None
+        self.last_latency = None
+        self.latencies = deque(maxlen=latency_window)
+        self.elevated = 0
+
+        self.requests = 0
+        self.overloads = 0
+        self.decreases = 0
+
+        self._last_decrease = None
+        self._condition = threading.Condition()
+
+    def current_limit(self):
+        return max(int(self.limit), self.min_limit)
+
+    def try_acquire(self):
+        """
+        Takes a slot for a request if one is free, returns True if it did
+        """
+        with self._condition:
+            if self.in_flight >= self.current_limit():
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self, timeout=None):
+        """
+        Waits for a free slot and takes it, at most timeout seconds
+        (None waits for as long as it takes). Returns False if it timed
+        out.
+        """
+        end = None
+        if timeout is not None:
+            end = clock() + timeout
+
+        with self._condition:
+            while self.in_flight >= self.current_limit():
+                if end is None:
+                    self._condition.wait()
+                    continue
+
+                remaining = end - clock()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+
+            self.in_flight += 1
+            return True
+
+    def release(self, latency=None, status=None, error=False):
+        """
+        Frees the slot taken for a request, adjusting the limit to how it
+        went: its latency in seconds, the response status, or error if
+        the request failed without a response
+        """
+        with self._condition:
+            in_use = self.in_flight >= self.current_limit()
+            self.in_flight -= 1
+            self.requests += 1
+
+            overloaded = error or status in self.overload_statuses
+            if latency is not None:
+                overloaded = self._observe(latency) or overloaded
+
+            if overloaded:
+                self.overloads += 1
+                self._decrease()
+            elif in_use:
+                # only grow a limit that is actually reached
+                self.limit = min(
+                    self.limit + 1.0 / self.current_limit(),
+                    self.max_limit
+                )
+
+            self._condition.notify_all()
+
+    def window_latency(self):
+        """
+        Returns the latency_percentile of the latency window, None until
+        the window is full
+        """
+        if len(self.latencies) < self.latencies.maxlen:
+            return None
+
+        latencies = sorted(self.latencies)
+        return latencies[int(self.latency_percentile * (len(latencies) - 1))]
+
+    def _observe(self, latency):
+        # returns True when latency has been elevated for long enough
+        self.last_latency = latency
+        self.latencies.append(latency)
+
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+
+        window_latency = self.window_latency()
+        if window_latency is None or \
+                window_latency <= self.latency_floor or \
+                window_latency <= self.latency * self.latency_tolerance:
+            self.elevated = 0
+            return False
+
+        self.elevated += 1
+        if self.elevated < self.slow_samples:
+            return False
+
+        self.elevated = 0
+        return True
+
+    def _decrease(self):
+        # the requests already in flight when the limit was cut report
+        # the same overload, cut at most once per round trip
+        now = clock()
+        if self._last_decrease is not None and \
+                now - self._last_decrease < (self.latency or 0):
+            return
+
+        self.limit = max(self.limit * self.backoff_ratio, self.min_limit)
+        self._last_decrease = now
+        self.decreases += 1
+
+    def stats(self):
+        with self._condition:
+            return {
+                'limit': self.current_limit(),
+                'in_flight': self.in_flight,
+                'latency': self.latency,
+                'last_latency': self.last_latency,
+                'window_latency': self.window_latency(),
+                'requests': self.requests,
+                'overloads': self.overloads,
+                'decreases': self.decreases,
+            }
+
+
+class TokenBucket(object):
+    """
+    Caps the rate of requests to rate per second, allowing bursts of up
+    to burst requests (by default one second's worth)
+    """
+
+    def __init__(self, rate, burst=None):
+        if burst is None:
+            burst = max(rate, 1)
+
+        self.rate = float(rate)
+        self.burst = burst
+
+        self.tokens = float(burst)
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Takes a token for a request, returns the number of seconds to
+        wait before sending it
+        """
+        with self._lock:
+            now = clock()
+            self.tokens = min(
+                self.tokens + (now - self._updated) * self.rate,
+                self.burst
+            )
+            self._updated = now
+
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+
+            delay = -self.tokens / self.rate
+            self.waits += 1
+            self.wait_seconds += delay
+            return delay
+
+    def acquire(self):
+        """
+        Waits until the next request may be sent
+        """
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'waits': self.waits,
+                'wait_seconds': self.wait_seconds,
+            }
@@ -0,0 +1,383 @@
+"""
+Local SQLite mirror of a host's repository metadata.
+
+SQLiteMirror keeps the projects, subjects, sites, site panels, visit
+types, stimulations and samples of a host in an SQLite database, so
+ad-hoc queries and joins over them run at local disk speed, even
+offline, instead of making dozens of requests:
+
+    mirror = SQLiteMirror('reflow.sqlite', client)
+    mirror.sync()
+
+    rows = mirror.query(
+        'SELECT samples.id, subjects.subject_code FROM samples '
+        'JOIN subjects ON subjects.id = samples.subject '
+        'WHERE samples.site_panel = ?',
+        (site_panel_pk,)
+    )
+
+Every entity has a table (see TABLES) with the record's id, its JSON
+(data) and an indexed column per foreign key or lookup field. sync
+fetches all the tables concurrently. Refreshing sends the validators
+(ETag / Last-Modified) of the previous sync, so unchanged lists only
+cost a 304 response, and only records that changed are written.
+staleness reports how long ago each table was last synced.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import json
+import sqlite3
+import threading
+import time
+
+from reflowrestclient import pagination, timeouts
+
+# table name: (client list method, indexed record fields)
+TABLES = OrderedDict([
+    ('projects', ('get_projects', ('project_name',))),
+    ('subjects', (
+        'get_subjects',
+        ('project', 'subject_group', 'subject_code'))),
+    ('sites', ('get_sites', ('project', 'site_name'))),
+    ('site_panels', (
+        'get_site_panels',
+        ('project_panel', 'site', 'panel_type'))),
+    ('visit_types', ('get_visit_types', ('project', 'visit_type_name'))),
+    ('stimulations', (
+        'get_stimulations',
+        ('project', 'stimulation_name'))),
+    ('samples', (
+        'get_samples',
+        ('project', 'subject', 'site', 'site_panel', 'visit',
+         'stimulation', 'specimen', 'original_filename', 'sha1',
+         'acquisition_date'))),
+])
+
+# bumped whenever TABLES changes, older mirrors are rebuilt
+SCHEMA_VERSION = 1
+
+
+def column_value(value):
+    """
+    Returns the value stored in an indexed column for a record field,
+    the PK of nested objects and None for lists
+    """
+    if isinstance(value, dict):
+        return value.get('id')
+    if isinstance(value, (list, tuple)):
+        return None
+    return value
+
+
+class SQLiteMirror(object):
+    """
+    Mirror of a host's metadata in the SQLite database at path, synced
+    through client (a ReFlowClient). Without a client, the mirror can
+    only be read.
+
+    Options:
+        'max_workers': number of tables fetched at once by sync, by
+                       default all of them
+    """
+
+    def __init__(self, path, client=None, max_workers=None):
+        self.path = path
+        self.client = client
+        self.max_workers = max_workers
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        self.create_tables()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+    def create_tables(self):
+        with self._lock, self.connection:
+            version = self.connection.execute(
+                'PRAGMA user_version').fetchone()[0]
+            if version != SCHEMA_VERSION:
+                for name in TABLES:
+                    self.connection.execute('DROP TABLE IF EXISTS %s' % name)
+                self.connection.execute('DROP TABLE IF EXISTS sync_state')
+                self.connection.execute(
+                    'PRAGMA user_version = %d' % SCHEMA_VERSION)
+
+            for name, (list_method, fields) in TABLES.items():
+                self.connection.execute(
+                    'CREATE TABLE IF NOT EXISTS %s '
+                    '(id INTEGER PRIMARY KEY, data TEXT NOT NULL, %s)' % (
+                        name, ', '.join(fields)))
+                for field in fields:
+                    self.connection.execute(
+                        'CREATE INDEX IF NOT EXISTS %s_%s ON %s (%s)' % (
+                            name, field, name, field))
+
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS sync_state ('
+                'name TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, '
+                'synced_at REAL NOT NULL, records INTEGER NOT NULL)')
+
+    @staticmethod
+    def check_table(name):
+        if name not in TABLES:
+            raise ValueError(
+                "Unknown table %s, use one of %s" % (
+                    name, ', '.join(TABLES)))
+
+    def sync(self, tables=None):
+        """
+        Fetches the given tables (by default all of them) concurrently
+        and updates the mirror, each table in its own transaction.
+        Returns a dictionary keyed by table name with the number of
+        records 'inserted', 'updated' and 'deleted', and 'modified',
+        False if the host reported the table unchanged since the last
+        sync. Raises pagination.ResponseError if a list can't be
+        retrieved (tables synced before that keep their update).
+        """
+        if self.client is None:
+            raise ValueError("A mirror without a client can't be synced")
+
+        if tables is None:
+            tables = list(TABLES)
+        for name in tables:
+            self.check_table(name)
+
+        states = self.sync_state()
+        fetch = timeouts.bind(self.fetch)
+
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_workers or len(tables))
+        try:
+            futures = [
+                (name, executor.submit(fetch, name, states.get(name)))
+                for name in tables
+            ]
+
+            summary = {}
+            for name, future in futures:
+                records, etag, last_modified = future.result()
+                summary[name] = self.update(
+                    name,
+                    records,
+                    etag,
+                    last_modified
+                )
+        finally:
+            executor.shutdown()
+
+        return summary
+
+    def fetch(self, name, state=None):
+        """
+        Returns the records of the named table's list along with the
+        response's ETag and Last-Modified, with the validators of the
+        previous sync state. The records are None if the list is
+        unchanged since then.
+        """
+        client = self.client
+        url, params = client.list_query(TABLES[name][0])
+
+        headers = {}
+        if state is not None:
+            if state['etag'] is not None:
+                headers['If-None-Match'] = state['etag']
+            if state['last_modified'] is not None:
+                headers['If-Modified-Since'] = state['last_modified']
+
+        response = client.retry_request(
+            'GET',
+            url,
+            params=params,
+            headers=headers
+        )
+        try:
+            if response.status_code == 304:
+                return None, state['etag'], state['last_modified']
+
+            client.count_response_bytes(
+                response.raw.tell(), len(response.content))
+            result = client.response_dict(response, 200)
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+        finally:
+            response.close()
+
+        if result['status'] != 200:
+            raise pagination.ResponseError(result)
+
+        records, next_url = pagination.page_records(result['data'])
+        if next_url:
+            records = records + list(client.iter_pages(next_url))
+
+            # the validators only cover the first page
+            etag = None
+            last_modified = None
+
+        return records, etag, last_modified
+
+    def update(self, name, records, etag=None, last_modified=None):
+        """
+        Makes the named table hold records (if not None), writing only
+        the records that changed, and saves the sync state. Returns the
+        summary described in sync.
+        """
+        self.check_table(name)
+        fields = TABLES[name][1]
+
+        summary = {
+            'modified': records is not None,
+            'inserted': 0,
+            'updated': 0,
+            'deleted': 0,
+        }
+
+        with self._lock, self.connection:
+            if records is None:
+                self.connection.execute(
+                    'UPDATE sync_state SET synced_at = ? WHERE name = ?',
+                    (time.time(), name))
+                return summary
+
+            stored = dict(
+                self.connection.execute('SELECT id, data FROM %s' % name))
+
+            rows = []
+            for record in records:
+                pk = record.get('id')
+                if pk is None:
+                    continue
+
+                data = json.dumps(record, sort_keys=True)
+                old_data = stored.pop(pk, None)
+                if old_data == data:
+                    continue
+
+                if old_data is None:
+                    summary['inserted'] += 1
+                else:
+                    summary['updated'] += 1
+
+                rows.append(
+                    (pk, data) +
+                    tuple(column_value(record.get(f)) for f in fields)
+                )
+
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO %s (id, data, %s) VALUES (%s)' % (
+                    name,
+                    ', '.join(fields),
+                    ', '.join('?' * (len(fields) + 2))),
+                rows)
+
+            # whatever is left was deleted on the host
+            self.connection.executemany(
+                'DELETE FROM %s WHERE id = ?' % name,
+                [(pk,) for pk in stored])
+            summary['deleted'] = len(stored)
+
+            self.connection.execute(
+                'INSERT OR REPLACE INTO sync_state '
+                '(name, etag, last_modified, synced_at, records) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (name, etag, last_modified, time.time(),
+                 len(records)))
+
+        return summary
+
+    def sync_state(self):
+        """
+        Returns the state of the synced tables keyed by table name, a
+        dictionary with the 'etag' and 'last_modified' of the last
+        fetched list, the time it was last 'synced_at' (seconds since
+        the epoch) and its number of 'records'
+        """
+        with self._lock:
+            rows = self.connection.execute(
+                'SELECT name, etag, last_modified, synced_at, records '
+                'FROM sync_state').fetchall()
+
+        return dict(
+            (name, {
+                'etag': etag,
+                'last_modified': last_modified,
+                'synced_at': synced_at,
+                'records': records,
+            })
+            for name, etag, last_modified, synced_at, records in rows
+        )
+
+    def staleness(self):
+        """
+        Returns the number of seconds since each table was last synced,
+        keyed by table name, None for tables never synced
+        """
+        states = self.sync_state()
+        now = time.time()
+
+        return dict(
+            (name, now - states[name]['synced_at'] if name in states
+             else None)
+            for name in TABLES
+        )
+
+    def query(self, sql, parameters=()):
+        """
+        Runs an SQL query on the mirror, returning the rows as
+        dictionaries keyed by column name
+        """
+        with self._lock:
+            cursor = self.connection.execute(sql, parameters)
+            columns = [column[0] for column in cursor.description or ()]
+            rows = cursor.fetchall()
+
+        return [dict(zip(columns, row)) for row in rows]
+
+    def records(self, name, **filters):
+        """
+        Returns the records of the named table with the given values
+        of indexed fields, e.g. records('samples', subject=subject_pk)
+        """
+        self.check_table(name)
+        fields = TABLES[name][1]
+
+        sql = 'SELECT data FROM %s' % name
+        conditions = []
+        parameters = []
+        for field, value in sorted(filters.items()):
+            if field != 'id' and field not in fields:
+                raise ValueError(
+                    "%s is not an indexed field of %s" % (field, name))
+
+            if value is None:
+                conditions.append('%s IS NULL' % field)
+            else:
+                conditions.append('%s = ?' % field)
+                parameters.append(value)
+
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY id'
+
+        with self._lock:
+            rows = self.connection.execute(sql, parameters).fetchall()
+
+        return [json.loads(data) for data, in rows]
+
+    def get(self, name, pk):
+        """
+        Returns the record of the named table with the given PK, or None
+        """
+        records = self.records(name, id=pk)
+        if not records:
+            return None
+
+        return records[0]
@@ -0,0 +1,40 @@
+"""
+Support for iterating over list endpoints one page at a time.
+
+ReFlow list endpoints return either a plain JSON list or, with Django REST
+framework pagination enabled on the host, a page dictionary:
+
+    {"count": 1023, "next": "<url>", "previous": null, "results": [...]}
+
+Pages are followed through their "next" URL, so page number and
+limit/offset pagination work the same.
+"""
+
+
+class ResponseError(IOError):
+    """
+    Raised when a page of a list endpoint can't be retrieved, the
+    status/reason/data dictionary of the failed request is available
+    as the response attribute
+    """
+
+    def __init__(self, response):
+        super(ResponseError, self).__init__(
+            "Request failed (%s: %s)" % (
+                response['status'], response['reason']))
+        self.response = response
+
+
+def page_records(data):
+    """
+    Returns the list of records in a list endpoint response along with
+    the URL of the next page, None for the last (or only) page
+    """
+    if isinstance(data, dict) and 'results' in data:
+        return data['results'], data.get('next')
+
+    if isinstance(data, list):
+        return data, None
+
+    raise ValueError("Not a list response: %r" % (data,))
+
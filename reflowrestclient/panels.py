@@ -0,0 +1,232 @@
+"""
+Matching FCS files' channels against site panels.
+
+A site panel lists the parameters (channels) files acquired with it
+must have, each with its FCS number, PnN text (fcs_text) and PnS text
+(fcs_opt_text). A file's channels are given as a parameter dictionary
+keyed by channel number:
+
+    {1: {'n': 'FSC-A', 's': ''}, 7: {'n': 'Blue B-A', 's': 'CD4 FITC'}}
+
+SitePanelMatcher indexes one site panel's parameters so any number of
+files can be checked against it without further requests, and
+PanelMatcher checks files against every candidate site panel (e.g. all
+of a project's) in one pass:
+
+    matcher = client.get_project_panel_matcher(project_pk)
+    for parameter_dict in files:
+        site_panels = matcher.matching_site_panels(parameter_dict)
+
+parameter_dict builds a file's parameter dictionary from its FCS TEXT
+keywords, file_parameter_dict also caches it by file path and mtime.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+
+def parameter_dict(metadata):
+    """
+    Returns the parameter dictionary of an FCS file from its TEXT
+    segment keywords (e.g. flowio.FlowData(...).text), collecting the
+    PnN / PnS keywords (in any case) of every channel in one pass
+    """
+    param_dict = {}
+
+    for key, value in metadata.items():
+        # P<n>N or P<n>S, parsed directly rather than with a regex
+        if len(key) < 3 or key[0] not in 'pP':
+            continue
+
+        n_or_s = key[-1]
+        if n_or_s not in 'nNsS':
+            continue
+
+        channel = key[1:-1]
+        if not channel.isdigit():
+            continue
+
+        channel_dict = param_dict.get(int(channel))
+        if channel_dict is None:
+            channel_dict = param_dict[int(channel)] = {}
+        channel_dict[n_or_s.lower()] = value
+
+    return param_dict
+
+
+class ParameterDictCache(object):
+    """
+    Parameter dictionaries of FCS files, cached by file path and
+    recomputed when the file's mtime or size changes. Holds at most
+    max_entries files, dropping the least recently used first.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, file_path, metadata):
+        """
+        Returns the parameter dictionary of the FCS file at file_path,
+        metadata being its TEXT keywords, or a function returning them
+        (only called when the file isn't cached)
+        """
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        version = (stat.st_mtime, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.pop(file_path, None)
+            if entry is not None and entry[0] == version:
+                # re-insert as the most recently used
+                self._entries[file_path] = entry
+                return entry[1]
+
+        if callable(metadata):
+            metadata = metadata()
+        param_dict = parameter_dict(metadata)
+
+        with self._lock:
+            self._entries.pop(file_path, None)
+            self._entries[file_path] = (version, param_dict)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return param_dict
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_parameter_dict_cache = ParameterDictCache()
+
+
+def file_parameter_dict(file_path, metadata):
+    """
+    Returns the parameter dictionary of the FCS file at file_path from
+    its TEXT keywords (metadata, or a function returning them), cached
+    by file path and mtime, see ParameterDictCache
+    """
+    return _parameter_dict_cache.get(file_path, metadata)
+
+
+class SitePanelMatcher(object):
+    """
+    A site panel's parameters indexed by FCS number, site_panel being the
+    serialized site panel (the data of a get_site_panel response)
+    """
+
+    def __init__(self, site_panel):
+        self.site_panel = site_panel
+        self.pk = site_panel.get('id')
+
+        self.parameters = dict()
+        for param in site_panel.get('parameters') or []:
+            if 'fcs_number' in param:
+                self.parameters[param['fcs_number']] = param
+
+    @staticmethod
+    def is_parameter_match(param, candidate):
+        """
+        Returns True/False whether a file's channel (candidate, a
+        dictionary with the 'n' and optional 's' texts) matches the site
+        panel parameter param. A channel without PnS text only matches a
+        parameter without one.
+        """
+        if 'n' not in candidate or candidate['n'] != param['fcs_text']:
+            return False
+
+        if 's' in candidate:
+            return candidate['s'] == param['fcs_opt_text']
+
+        return param['fcs_opt_text'] == ''
+
+    def report(self, parameter_dict):
+        """
+        Returns the per-channel report of matching parameter_dict against
+        the site panel, a dictionary with keys:
+            'site_panel': PK of the site panel
+            'is_match': True if every site panel parameter matches
+            'matches': the matching channels of parameter_dict, keyed by
+                       channel number
+            'non_matches': the channels of parameter_dict not matching the
+                           site panel parameter with their number
+            'missing': [fcs_text, fcs_opt_text] of the site panel
+                       parameters with no channel in parameter_dict
+        """
+        matches = dict()
+        non_matches = dict()
+        missing = dict()
+
+        for fcs_number, param in self.parameters.items():
+            if fcs_number not in parameter_dict:
+                missing[fcs_number] = [
+                    param['fcs_text'],
+                    param['fcs_opt_text']
+                ]
+                continue
+
+            candidate = parameter_dict[fcs_number]
+            if self.is_parameter_match(param, candidate):
+                matches[fcs_number] = candidate
+            else:
+                non_matches[fcs_number] = candidate
+
+        return {
+            'site_panel': self.pk,
+            'is_match': bool(self.parameters) and
+            len(matches) == len(self.parameters),
+            'matches': matches,
+            'non_matches': non_matches,
+            'missing': missing,
+        }
+
+    def is_match(self, parameter_dict):
+        """
+        Returns True/False whether parameter_dict matches the site panel
+        """
+        if not self.parameters:
+            return False
+
+        for fcs_number, param in self.parameters.items():
+            candidate = parameter_dict.get(fcs_number)
+            if candidate is None or \
+                    not self.is_parameter_match(param, candidate):
+                return False
+
+        return True
+
+
+class PanelMatcher(object):
+    """
+    Matches parameter dictionaries against several site panels at once,
+    site_panels being a list of serialized site panels (e.g. the data of
+    a get_site_panels response)
+    """
+
+    def __init__(self, site_panels):
+        self.matchers = [
+            SitePanelMatcher(site_panel) for site_panel in site_panels
+        ]
+
+    def matching_site_panels(self, parameter_dict):
+        """
+        Returns the list of site panels matching parameter_dict
+        """
+        return [
+            matcher.site_panel for matcher in self.matchers
+            if matcher.is_match(parameter_dict)
+        ]
+
+    def reports(self, parameter_dict):
+        """
+        Returns the SitePanelMatcher.report of parameter_dict for every
+        site panel, keyed by site panel PK
+        """
+        return dict(
+            (matcher.pk, matcher.report(parameter_dict))
+            for matcher in self.matchers
+        )
@@ -0,0 +1,128 @@
+"""
+Following the foreign keys of records to their related objects.
+
+Records like samples refer to their subject, site panel, etc. by PK.
+ReFlowClient.prefetch collects the distinct PKs of each requested
+relation, fetches every set of related objects in one concurrent round
+(see ReFlowClient.get_objects) and attaches them to the records under
+'<relation>_object':
+
+    samples = client.get_samples(project_pk=project_pk)['data']
+    client.prefetch(samples, ['subject', 'subject_group', 'site_panel'])
+
+    subject = samples[0]['subject_object']
+    subject['subject_group_object']['group_name']
+
+Some relations belong to related objects, like the subject group of a
+sample's subject. They are attached to those objects and fetched after
+their parent relation (which is fetched too, if not requested).
+"""
+
+# relation: (parent relation, None for relations of the records
+#            themselves, foreign key field, URLS key of the objects)
+RELATIONS = {
+    'project': (None, 'project', 'PROJECTS'),
+    'subject': (None, 'subject', 'SUBJECTS'),
+    'site': (None, 'site', 'SITES'),
+    'site_panel': (None, 'site_panel', 'SITE_PANELS'),
+    'visit': (None, 'visit', 'VISIT_TYPES'),
+    'stimulation': (None, 'stimulation', 'STIMULATIONS'),
+    'specimen': (None, 'specimen', 'SPECIMENS'),
+    'subject_group': ('subject', 'subject_group', 'SUBJECT_GROUPS'),
+    'project_panel': ('site_panel', 'project_panel', 'PROJECT_PANELS'),
+}
+
+
+def attached_key(relation):
+    return '%s_object' % relation
+
+
+def check_relation(relation):
+    if relation not in RELATIONS:
+        raise ValueError(
+            "Unknown relation %s, use one of %s" % (
+                relation, ', '.join(sorted(RELATIONS))))
+
+
+def depth(relation):
+    parent = RELATIONS[relation][0]
+    if parent is None:
+        return 0
+    return depth(parent) + 1
+
+
+def plan(relations):
+    """
+    Returns the relations to fetch (along with their parents) in levels,
+    a list of lists of relations, every relation in a level after its
+    parent's
+    """
+    needed = set()
+    for relation in relations:
+        while relation is not None:
+            check_relation(relation)
+            needed.add(relation)
+            relation = RELATIONS[relation][0]
+
+    levels = {}
+    for relation in sorted(needed):
+        levels.setdefault(depth(relation), []).append(relation)
+
+    return [levels[level] for level in sorted(levels)]
+
+
+def foreign_key(record, field):
+    """
+    Returns the PK a record refers to with field, the PK of nested
+    objects
+    """
+    value = record.get(field)
+    if isinstance(value, dict):
+        return value.get('id')
+    return value
+
+
+def source_records(records, relation):
+    """
+    Returns the records holding the relation's foreign key: the records
+    themselves or the objects attached to them for the parent relation
+    """
+    parent = RELATIONS[relation][0]
+    if parent is None:
+        return records
+
+    key = attached_key(parent)
+    return [
+        record[key] for record in source_records(records, parent)
+        if record.get(key) is not None
+    ]
+
+
+def foreign_keys(records, relation):
+    """
+    Returns the PKs the records refer to for the relation, duplicates
+    and None included
+    """
+    field = RELATIONS[relation][1]
+
+    return [
+        foreign_key(record, field)
+        for record in source_records(records, relation)
+    ]
+
+
+def attach(records, relation, objects):
+    """
+    Attaches the related objects (keyed by PK) to the records, None for
+    records with no related object. Objects are copied first, so objects
+    shared with a cache are never modified. Returns the attached
+    objects keyed by PK.
+    """
+    objects = dict((pk, dict(data)) for pk, data in objects.items())
+
+    key = attached_key(relation)
+    field = RELATIONS[relation][1]
+    for record in source_records(records, relation):
+        record[key] = objects.get(foreign_key(record, field))
+
+    return objects
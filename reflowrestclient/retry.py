@@ -0,0 +1,139 @@
+"""
+Retry policy shared by the client request methods.
+
+Failed connections, timeouts and transient error responses (429, 502,
+503, 504) are retried with exponential backoff and full jitter, or after
+the delay given by a Retry-After header. Only requests that are safe to
+repeat are retried: idempotent HTTP methods, and POST / PATCH requests
+the caller marks as safe, possibly after checking the previous attempt
+had no effect.
+
+A RetryBudget caps retries to a fraction of all requests, so a host that
+is down is not hammered with max_retries times the normal load.
+"""
+from email.utils import parsedate_tz, mktime_tz
+import random
+import threading
+import time
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+RETRY_STATUSES = frozenset([429, 502, 503, 504])
+
+
+class RetryBudget(object):
+    """
+    Token bucket limiting retries to a fraction of requests. Every request
+    deposits ratio tokens, every retry withdraws a whole token, and the
+    bucket holds at most max_tokens (it starts out full).
+    """
+
+    def __init__(self, ratio=0.2, max_tokens=10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = float(max_tokens)
+
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.tokens + self.ratio, self.max_tokens)
+
+    def withdraw(self):
+        """
+        Returns True if a retry is within the budget
+        """
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class RetryPolicy(object):
+    """
+    When, and after how long, to retry a request.
+
+    Options:
+        'max_retries': max number of retries per request, 0 disables
+                       retries
+        'backoff_factor': the delay before retry n (counting from 0) is
+                          drawn at random between 0 and
+                          backoff_factor * 2 ** n seconds
+        'max_backoff': upper limit in seconds of any delay, including
+                       those requested with Retry-After
+        'retry_statuses': response status codes to retry
+        'budget': a RetryBudget, shared by all requests using the policy,
+                  None for no budget
+    """
+
+    def __init__(
+            self,
+            max_retries=3,
+            backoff_factor=0.5,
+            max_backoff=30,
+            retry_statuses=RETRY_STATUSES,
+            budget=None):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.retry_statuses = frozenset(retry_statuses)
+
+        if budget is None:
+            budget = RetryBudget()
+        self.budget = budget
+
+        self.retries = 0
+
+    @staticmethod
+    def idempotent(verb):
+        return verb.upper() in IDEMPOTENT_METHODS
+
+    def request_started(self):
+        if self.budget is not None:
+            self.budget.deposit()
+
+    def allow_retry(self):
+        """
+        Takes a retry from the budget, returns False if it is exhausted
+        """
+        if self.budget is not None and not self.budget.withdraw():
+            return False
+
+        self.retries += 1
+        return True
+
+    @staticmethod
+    def retry_after(headers):
+        """
+        Returns the delay in seconds requested by a Retry-After header
+        (in seconds or as an HTTP date), None if there is none
+        """
+        if headers is None:
+            return None
+
+        value = headers.get('Retry-After')
+        if not value:
+            return None
+
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+
+        date = parsedate_tz(value)
+        if date is None:
+            return None
+
+        return max(mktime_tz(date) - time.time(), 0)
+
+    def delay(self, attempt, headers=None):
+        """
+        Returns the number of seconds to wait before retrying after the
+        given attempt (counting from 0), honoring any Retry-After header
+        in the response headers
+        """
+        delay = self.retry_after(headers)
+        if delay is None:
+            delay = random.uniform(0, self.backoff_factor * 2 ** attempt)
+
+        return min(delay, self.max_backoff)
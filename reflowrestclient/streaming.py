@@ -0,0 +1,296 @@
+"""
+Incremental decoding of JSON array responses.
+
+ArrayDecoder is fed a response body chunk by chunk as it arrives and
+returns every element of the top-level JSON array as soon as it is
+complete, so a huge list response never has to be held in memory as a
+whole, neither as text nor as Python objects:
+
+    decoder = ArrayDecoder(raw_fields={'event_indices': numpy_array})
+    for chunk in response.iter_content(64 * 1024):
+        for sample_cluster in decoder.feed(chunk):
+            ...
+    decoder.close()
+
+Chosen fields of object elements (raw_fields) are not decoded as JSON.
+Their value is kept as the raw JSON bytes, or passed to a function like
+numpy_array, which is far cheaper than building a Python list of
+millions of ints.
+
+Hosts with Django REST framework pagination answer with a page object
+instead (see pagination). Pages are bounded by the page size, so they
+are decoded whole (see is_object) and convert applies raw_fields to
+their records, which then look the same as streamed elements.
+"""
+import json
+import re
+
+# characters to stop at when scanning outside of strings, below depth 2
+# (element objects and their fields) commas and colons matter too
+_STRUCTURE_RE = re.compile(br'["\[\]{},:]')
+_NESTED_RE = re.compile(br'["\[\]{}]')
+_STRING_RE = re.compile(br'["\\]')
+
+_WHITESPACE = b' \t\n\r'
+
+
+def numpy_array(raw, dtype='int64'):
+    """
+    Converts the raw JSON bytes of a flat array of numbers to a NumPy
+    array, without creating a Python object per number. Requires NumPy.
+    """
+    import numpy
+
+    raw = raw.strip()
+    if raw == b'null':
+        return None
+    if not (raw.startswith(b'[') and raw.endswith(b']')):
+        raise ValueError("Not a JSON array: %r" % raw[:20])
+
+    values = raw[1:-1].strip()
+    if not values:
+        return numpy.array([], dtype=dtype)
+
+    return numpy.fromstring(values.decode('ascii'), dtype=dtype, sep=',')
+
+
+def is_object(head):
+    """
+    Returns whether the JSON document starting with the bytes head is
+    an object (e.g. a page of a paginated list) rather than an array,
+    None while head holds nothing but whitespace
+    """
+    head = head.lstrip(_WHITESPACE)
+    if not head:
+        return None
+
+    return head[:1] == b'{'
+
+
+class ArrayDecoder(object):
+    """
+    Incremental decoder for a JSON document that is an array, see the
+    module documentation.
+
+    Options:
+        'raw_fields': field names of object elements to keep undecoded,
+                      either a list (values are kept as raw bytes) or a
+                      dictionary mapping the names to a function called
+                      with the raw bytes, e.g. numpy_array
+        'loads': function decoding the JSON text of one element
+    """
+
+    def __init__(self, raw_fields=None, loads=json.loads):
+        if raw_fields is None:
+            raw_fields = {}
+        elif not isinstance(raw_fields, dict):
+            raw_fields = dict((name, None) for name in raw_fields)
+
+        self.raw_fields = raw_fields
+        self.loads = loads
+        self.count = 0
+
+        self._buffer = bytearray()
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._done = False
+
+        self._element_start = None
+        self._element_is_object = False
+        self._string_start = None
+        self._last_string = None
+        self._raw_field = None
+        self._raw_start = None
+        self._raw_spans = []
+
+    def feed(self, data):
+        """
+        Adds the next chunk of the body, returns the list of array
+        elements completed by it
+        """
+        self._buffer.extend(data)
+        elements = []
+
+        buffer = self._buffer
+        pos = self._pos
+
+        while True:
+            if self._in_string:
+                match = _STRING_RE.search(buffer, pos)
+                if match is None:
+                    pos = len(buffer)
+                    break
+
+                pos = match.start()
+                if buffer[pos:pos + 1] == b'\\':
+                    if pos + 1 >= len(buffer):
+                        break  # wait for the escaped character
+                    pos += 2
+                    continue
+
+                self._in_string = False
+                if self._depth == 2 and self._element_is_object:
+                    self._last_string = bytes(
+                        buffer[self._string_start:pos + 1])
+                pos += 1
+                continue
+
+            if self._depth == 0:
+                pos = self._skip_whitespace(buffer, pos)
+                if pos >= len(buffer):
+                    break
+                if self._done or buffer[pos:pos + 1] != b'[':
+                    raise ValueError(
+                        "Expected a single JSON array, found %r at %d" % (
+                            bytes(buffer[pos:pos + 20]), pos))
+                self._depth = 1
+                pos += 1
+                self._element_start = pos
+                continue
+
+            if self._depth <= 2:
+                match = _STRUCTURE_RE.search(buffer, pos)
+            else:
+                match = _NESTED_RE.search(buffer, pos)
+
+            if match is None:
+                pos = len(buffer)
+                break
+
+            pos = match.start()
+            char = buffer[pos:pos + 1]
+
+            if char == b'"':
+                self._in_string = True
+                self._string_start = pos
+            elif char in b'[{':
+                if self._depth == 1:
+                    self._element_is_object = char == b'{'
+                self._depth += 1
+            elif char in b']}':
+                if self._depth == 2:
+                    self._end_raw_field(pos)
+                self._depth -= 1
+                if self._depth == 0:
+                    self._end_element(buffer, pos, elements)
+                    self._done = True
+            elif char == b',':
+                if self._depth == 1:
+                    self._end_element(buffer, pos, elements)
+                    self._element_start = pos + 1
+                elif self._element_is_object:
+                    self._end_raw_field(pos)
+            elif char == b':':
+                if self._element_is_object and \
+                        self._last_string is not None:
+                    name = self.loads(self._last_string.decode('utf-8'))
+                    if name in self.raw_fields:
+                        self._raw_field = name
+                        self._raw_start = pos + 1
+                    self._last_string = None
+
+            pos += 1
+
+        self._pos = pos
+        self._discard_consumed()
+
+        return elements
+
+    def convert(self, element):
+        """
+        Applies raw_fields to an element decoded as a whole, like a
+        record of a paginated list page, so it looks the same as the
+        elements returned by feed
+        """
+        if not self.raw_fields or not isinstance(element, dict):
+            return element
+
+        for name, convert in self.raw_fields.items():
+            if name not in element:
+                continue
+
+            raw = json.dumps(element[name]).encode('utf-8')
+            element[name] = raw if convert is None else convert(raw)
+
+        return element
+
+    def close(self):
+        """
+        Checks the whole array was received
+        """
+        if not self._done:
+            raise ValueError("Incomplete JSON array")
+
+    @staticmethod
+    def _skip_whitespace(buffer, pos):
+        while pos < len(buffer) and buffer[pos:pos + 1] in _WHITESPACE:
+            pos += 1
+        return pos
+
+    def _end_raw_field(self, pos):
+        if self._raw_field is None:
+            return
+
+        self._raw_spans.append(
+            (self._raw_field, self._raw_start, pos))
+        self._raw_field = None
+        self._raw_start = None
+
+    def _end_element(self, buffer, pos, elements):
+        start = self._element_start
+
+        if not self._raw_spans:
+            text = bytes(buffer[start:pos])
+            if text.strip():
+                elements.append(self.loads(text.decode('utf-8')))
+                self.count += 1
+            self._element_is_object = False
+            return
+
+        # decode the element with null in place of the raw fields
+        parts = []
+        raw_values = []
+        previous_end = start
+        for name, raw_start, raw_end in self._raw_spans:
+            parts.append(bytes(buffer[previous_end:raw_start]))
+            parts.append(b'null')
+            raw_values.append((name, bytes(buffer[raw_start:raw_end])))
+            previous_end = raw_end
+        parts.append(bytes(buffer[previous_end:pos]))
+
+        element = self.loads(b''.join(parts).decode('utf-8'))
+        for name, raw in raw_values:
+            convert = self.raw_fields[name]
+            element[name] = raw.strip() if convert is None else convert(raw)
+
+        elements.append(element)
+        self.count += 1
+
+        self._raw_spans = []
+        self._element_is_object = False
+
+    def _discard_consumed(self):
+        """
+        Drops the bytes of completed elements from the buffer
+        """
+        if self._element_start is None or self._done:
+            consumed = self._pos
+        else:
+            consumed = self._element_start
+
+        if consumed == 0:
+            return
+
+        del self._buffer[:consumed]
+        self._pos -= consumed
+        if self._element_start is not None:
+            self._element_start = max(self._element_start - consumed, 0)
+        if self._string_start is not None:
+            self._string_start -= consumed
+        if self._raw_start is not None:
+            self._raw_start -= consumed
+        self._raw_spans = [
+            (name, raw_start - consumed, raw_end - consumed)
+            for name, raw_start, raw_end in self._raw_spans
+        ]
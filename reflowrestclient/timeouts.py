@@ -0,0 +1,147 @@
+"""
+Per-operation deadlines.
+
+A deadline bounds the total time an operation may take, across all the
+requests it makes, their retries and any streamed download bodies:
+
+    with timeouts.deadline(60):
+        client.get_samples()
+        client.download_sample(42)
+
+The client caps the connect and read timeouts of every request to the
+time left before the current deadline, doesn't retry past it, and stops
+streaming downloads once it has passed, raising DeadlineExceeded.
+
+The current deadline follows the code running it: it is local to the
+thread, and asyncio tasks inherit it from the code creating them. Worker
+threads don't, use bind to carry it over.
+"""
+from contextlib import contextmanager
+import threading
+import time
+
+try:
+    import contextvars
+except ImportError:
+    # Python < 3.7
+    contextvars = None
+
+if hasattr(time, 'monotonic'):
+    clock = time.monotonic
+else:
+    clock = time.time
+
+
+class DeadlineExceeded(IOError):
+    """
+    Raised when an operation runs past its deadline
+    """
+    pass
+
+
+class Deadline(object):
+    """
+    Point in time an operation has to be finished by
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = clock() + seconds
+
+    def remaining(self):
+        return max(self.expires - clock(), 0)
+
+    @property
+    def expired(self):
+        return clock() >= self.expires
+
+    def check(self):
+        if self.expired:
+            raise DeadlineExceeded(
+                "Deadline of %s seconds exceeded" % self.seconds)
+
+    def cap(self, timeout):
+        """
+        Returns timeout (in seconds, or None for no timeout) limited to
+        the remaining time, raises DeadlineExceeded if there is none left
+        """
+        self.check()
+
+        if timeout is None:
+            return self.remaining()
+        return min(timeout, self.remaining())
+
+
+if contextvars is not None:
+    _current_deadline = contextvars.ContextVar(
+        'reflowrestclient_deadline',
+        default=None
+    )
+
+    def current_deadline():
+        """
+        Returns the Deadline in effect, None if there is none
+        """
+        return _current_deadline.get()
+
+    def _set_deadline(value):
+        return _current_deadline.set(value)
+
+    def _reset_deadline(token):
+        _current_deadline.reset(token)
+else:
+    _local = threading.local()
+
+    def current_deadline():
+        """
+        Returns the Deadline in effect, None if there is none
+        """
+        return getattr(_local, 'deadline', None)
+
+    def _set_deadline(value):
+        token = current_deadline()
+        _local.deadline = value
+        return token
+
+    def _reset_deadline(token):
+        _local.deadline = token
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Context manager running the enclosed code with a deadline, given in
+    seconds or as a Deadline. A deadline can't extend the one already in
+    effect, the earlier of the two applies. None leaves the current
+    deadline in place.
+    """
+    if seconds is None or isinstance(seconds, Deadline):
+        new_deadline = seconds
+    else:
+        new_deadline = Deadline(seconds)
+
+    outer_deadline = current_deadline()
+    if new_deadline is None or (
+            outer_deadline is not None and
+            outer_deadline.expires <= new_deadline.expires):
+        new_deadline = outer_deadline
+
+    token = _set_deadline(new_deadline)
+    try:
+        yield new_deadline
+    finally:
+        _reset_deadline(token)
+
+
+def bind(function):
+    """
+    Returns function wrapped to run under the caller's current deadline,
+    for functions run in worker threads
+    """
+    caller_deadline = current_deadline()
+
+    def bound_function(*args, **kwargs):
+        with deadline(caller_deadline):
+            return function(*args, **kwargs)
+
+    return bound_function
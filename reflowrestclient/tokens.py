@@ -0,0 +1,136 @@
+"""
+Persistent store of authentication tokens, so short lived processes
+(e.g. cron jobs) re-use a token instead of logging in on every run:
+
+    client = ReFlowClient(
+        host,
+        token_store=TokenStore(),
+        credentials=lambda: (username, password)
+    )
+    client.get_samples()  # logs in only if no token is stored yet
+
+The tokens are kept in a JSON file only readable by its owner, keyed by
+host and username.
+"""
+from contextlib import contextmanager
+import json
+import os
+import stat
+import threading
+import uuid
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, changes are made without an inter-process lock
+    fcntl = None
+
+from reflowrestclient.downloads import commit_temp_file, remove_temp_file
+
+DEFAULT_PATH = os.path.join('~', '.reflowrestclient', 'tokens.json')
+
+
+class TokenStore(object):
+    """
+    Tokens saved in a file at path (by default
+    ~/.reflowrestclient/tokens.json). The file is created with owner
+    only permissions (0600) in a directory only the owner can list
+    (0700), and replaced atomically on every change, so several
+    processes can share it. Changes are made holding an exclusive lock
+    on <path>.lock, so processes storing tokens at the same time don't
+    lose each other's.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = DEFAULT_PATH
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.lock_path = self.path + '.lock'
+
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(host, username):
+        return '%s %s' % (host, username)
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as token_file:
+                tokens = json.load(token_file)
+        except (IOError, OSError, ValueError):
+            return {}
+
+        if not isinstance(tokens, dict):
+            return {}
+
+        return tokens
+
+    def _make_directory(self):
+        directory = os.path.dirname(self.path)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory, stat.S_IRWXU)
+            except OSError:
+                # created by another process in the meantime
+                if not os.path.isdir(directory):
+                    raise
+
+    @contextmanager
+    def _locked(self):
+        # the read-modify-write of a change, across threads and processes
+        with self._lock:
+            self._make_directory()
+            fd = os.open(
+                self.lock_path,
+                os.O_WRONLY | os.O_CREAT,
+                stat.S_IRUSR | stat.S_IWUSR
+            )
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                # closing the file releases the lock
+                os.close(fd)
+
+    def _write(self, tokens):
+        directory, filename = os.path.split(self.path)
+        self._make_directory()
+
+        temp_path = os.path.join(
+            directory,
+            '.%s.%s.tmp' % (filename, uuid.uuid4().hex[:12])
+        )
+
+        # created 0600, so the tokens are never readable by others
+        fd = os.open(
+            temp_path,
+            os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+            stat.S_IRUSR | stat.S_IWUSR
+        )
+        try:
+            with os.fdopen(fd, 'w') as token_file:
+                json.dump(tokens, token_file, indent=2, sort_keys=True)
+            commit_temp_file(temp_path, self.path)
+        except Exception:
+            remove_temp_file(temp_path)
+            raise
+
+    def get(self, host, username):
+        """
+        Returns the stored token for username on host, or None
+        """
+        with self._lock:
+            return self._read().get(self.key(host, username))
+
+    def store(self, host, username, token):
+        with self._locked():
+            tokens = self._read()
+            tokens[self.key(host, username)] = token
+            self._write(tokens)
+
+    def remove(self, host, username):
+        with self._locked():
+            tokens = self._read()
+            if tokens.pop(self.key(host, username), None) is not None:
+                self._write(tokens)
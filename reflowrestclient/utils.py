@@ -1,43 +1,59 @@
 from __future__ import print_function
 
-import requests
-import os
-import json
-
-METHOD = {
-    'https': 'https://',
-    'http': 'http://'
-}
-
-URLS = {
-    'TOKEN':               '/api/token-auth/',
-    'PROJECTS':            '/api/repository/projects/',
-    'SPECIMENS':           '/api/repository/specimens/',
-    'SUBJECT_GROUPS':      '/api/repository/subject_groups/',
-    'SITES':               '/api/repository/sites/',
-    'SUBJECTS':            '/api/repository/subjects/',
-    'PROJECT_PANELS':      '/api/repository/panel_templates/',
-    'SITE_PANELS':         '/api/repository/site_panels/',
-    'COMPENSATIONS':       '/api/repository/compensations/',
-    'CREATE_COMPENSATION': '/api/repository/compensations/add/',
-    'STIMULATIONS':        '/api/repository/stimulations/',
-    'SAMPLES':             '/api/repository/samples/',
-    'CREATE_SAMPLES':      '/api/repository/samples/add/',
-    'SAMPLE_METADATA':     '/api/repository/samplemetadata/',
-    'VISIT_TYPES':         '/api/repository/visit_types/',
-    'SAMPLE_COLLECTION':   '/api/repository/sample_collections/',
-
-    # Process related API URLs
-    'PROCESSES':                 '/api/repository/processes/',
-    'WORKERS':                   '/api/repository/workers/',
-    'VERIFY_WORKER':             '/api/repository/verify_worker/',
-    'PROCESS_REQUESTS':          '/api/repository/process_requests/',
-    'VIABLE_PROCESS_REQUESTS':   '/api/repository/viable_process_requests/',
-    'ASSIGNED_PROCESS_REQUESTS': '/api/repository/assigned_process_requests/',
-    'CLUSTERS':                  '/api/repository/clusters/',
-    'SAMPLE_CLUSTERS':           '/api/repository/sample_clusters/',
-    'SAMPLE_CLUSTER_COMPONENTS': '/api/repository/sample_cluster_components/',
-}
+import threading
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
+
+from reflowrestclient.client import ReFlowClient, METHOD, URLS
+from reflowrestclient.mirror import SQLiteMirror
+
+# Options passed to every shared ReFlowClient created by get_client,
+# e.g. pool_maxsize or keep_alive. Use configure_clients to change them.
+CLIENT_OPTIONS = {}
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(host, token=None, method=METHOD['https']):
+    """
+    Returns the shared ReFlowClient for the given host, token and method,
+    creating it on first use. Every function in this module goes through
+    these shared clients, so repeated calls re-use pooled connections.
+    """
+    key = (method, host, token)
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = ReFlowClient(
+                host,
+                token=token,
+                method=method,
+                **CLIENT_OPTIONS
+            )
+            _clients[key] = client
+
+    return client
+
+
+def configure_clients(**options):
+    """
+    Set the ReFlowClient options used for the shared clients, for example:
+
+        configure_clients(pool_maxsize=32, keep_alive=True)
+
+    Any existing shared clients are closed and will be re-created with the
+    new options on their next use.
+    """
+    with _clients_lock:
+        CLIENT_OPTIONS.update(options)
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
 
 
 def get_request(token, url, params=None):
@@ -47,80 +63,104 @@ def get_request(token, url, params=None):
         reason: HTTP response reason
         data: A dictionary converted from JSON response data
     """
+    split_url = urlsplit(url)
+    client = get_client(
+        split_url.netloc,
+        token,
+        method='%s://' % split_url.scheme
+    )
+
+    return client.get_request(url, params)
+
+
+def batch(host, token, max_workers=8, method=METHOD['https']):
+    """
+    Returns a batch of the shared client's calls, run concurrently when
+    the with block ends. Calls in the batch return futures:
+
+        with utils.batch(host, token) as b:
+            samples = [b.get_sample(pk) for pk in sample_pks]
+
+        samples[0].result()['data']
+    """
+    return get_client(host, token, method).batch(max_workers=max_workers)
+
+
+def prefetch(
+        host,
+        token,
+        records,
+        relations,
+        max_workers=8,
+        in_filter=None,
+        method=METHOD['https']):
+    """
+    Fetches the objects related to records (e.g. the data of a
+    get_samples response) for the given relations and attaches them as
+    '<relation>_object', each distinct object fetched once:
 
-    headers = {
-        'User-Agent': 'python',
-        'Authorization': "Token %s" % token,
-    }
+        utils.prefetch(host, token, samples, ['subject', 'subject_group'])
+        samples[0]['subject_object']['subject_group_object']
 
-    response = requests.get(url, headers=headers, params=params, verify=False)
+    Returns the attached objects keyed by relation and PK, see the
+    related module for the available relations.
+    """
+    return get_client(host, token, method).prefetch(
+        records,
+        relations,
+        max_workers=max_workers,
+        in_filter=in_filter
+    )
 
-    if response.status_code == 200:
-        try:
-            data = response.json()
-        except Exception as e:
-            data = response.text()
-            print(e)
-    else:
-        data = response.text
 
-    return {
-        'status': response.status_code,
-        'reason': response.reason,
-        'data': data,
-    }
+def sqlite_mirror(host, token, path, max_workers=None,
+                  method=METHOD['https']):
+    """
+    Returns a mirror.SQLiteMirror of the host's metadata in the SQLite
+    database at path, synced through the shared client:
+
+        mirror = utils.sqlite_mirror(host, token, 'reflow.sqlite')
+        mirror.sync()
+        mirror.records('samples', site_panel=site_panel_pk)
+    """
+    return SQLiteMirror(
+        path,
+        get_client(host, token, method),
+        max_workers=max_workers
+    )
 
 
-def get_token(host, username, password, method=METHOD['https']):
+def get_token(
+        host,
+        username,
+        password,
+        method=METHOD['https'],
+        token_store=None):
     """
-    Login to host url using user credentials given.
+    Login to host url using user credentials given. With a
+    tokens.TokenStore as token_store, a token stored for the user is
+    returned without logging in, and new tokens are stored.
 
     Returns the authenticating user's token (string) if successful,
     returns None if authentication failed.
     """
-    url = '%s%s%s' % (method, host, URLS['TOKEN'])
-
-    token = None
-
-    data = {
-        'username': username,
-        'password': password,
-    }
-
-    try:
-        response = requests.post(url, data=data, verify=False)
-    except Exception as e:
-        print(e)
-        return None
-
-    if response.status_code == 200:
-        try:
-            data = response.json()
-            if 'token' in data:
-                token = data['token']
-                # delete all the user credentials
-                del(data, response, username, password)
-            else:
-                print("Authentication token not in response")
-
-        except Exception as e:
-            print(e)
-            return None
-    else:
-        print("Authentication failed (%s: %s)" % (
-            response.status_code, response.reason))
+    if token_store is not None:
+        token = token_store.get(host, username)
+        if token is not None:
+            return token
 
-    return token
+    token = get_client(host, method=method).get_token(username, password)
 
+    if token is not None and token_store is not None:
+        token_store.store(host, username, token)
 
-def get_projects(host, token, project_name=None, method=METHOD['https']):
-    url = '%s%s%s' % (method, host, URLS['PROJECTS'])
-    filter_params = dict()
+    return token
 
-    if project_name is not None:
-        filter_params['project_name'] = project_name
 
-    return get_request(token, url, filter_params)
+def get_projects(host, token, project_name=None, method=METHOD['https']):
+    return get_client(host, token, method).get_projects(
+        project_name=project_name
+    )
 
 
 def get_project(host, token, project_pk, method=METHOD['https']):
@@ -133,18 +173,33 @@ def get_project(host, token, project_pk, method=METHOD['https']):
         'reason': The HTTP response reason
         'data': Dictionary representation of object
     """
-    url = '%s%s%s%s/' % (method, host, URLS['PROJECTS'], project_pk)
-    return get_request(token, url)
+    return get_client(host, token, method).get_project(project_pk)
 
 
-def get_specimens(host, token, specimen_name=None, method=METHOD['https']):
-    url = '%s%s%s' % (method, host, URLS['SPECIMENS'])
-    filter_params = dict()
+def get_projects_by_pks(
+        host,
+        token,
+        project_pks,
+        max_workers=8,
+        in_filter=None,
+        method=METHOD['https']):
+    """
+    GET the projects with the given PKs concurrently, each distinct PK
+    once, returning a dictionary of them keyed by PK. in_filter is the
+    name of the host's list filter on comma separated PKs, if any (see
+    ReFlowClient.get_objects).
+    """
+    return get_client(host, token, method).get_projects_by_pks(
+        project_pks,
+        max_workers=max_workers,
+        in_filter=in_filter
+    )
 
-    if specimen_name is not None:
-        filter_params['specimen_name'] = specimen_name
 
-    return get_request(token, url, filter_params)
+def get_specimens(host, token, specimen_name=None, method=METHOD['https']):
+    return get_client(host, token, method).get_specimens(
+        specimen_name=specimen_name
+    )
 
 
 def get_subject_groups(
@@ -153,16 +208,30 @@ def get_subject_groups(
         group_name=None,
         project_pk=None,
         method=METHOD['https']):
-    url = '%s%s%s' % (method, host, URLS['SUBJECT_GROUPS'])
-    filter_params = dict()
-
-    if group_name is not None:
-        filter_params['group_name'] = group_name
+    return get_client(host, token, method).get_subject_groups(
+        group_name=group_name,
+        project_pk=project_pk
+    )
 
-    if project_pk is not None:
-        filter_params['project'] = project_pk
 
-    return get_request(token, url, filter_params)
+def get_subject_groups_by_pks(
+        host,
+        token,
+        subject_group_pks,
+        max_workers=8,
+        in_filter=None,
+        method=METHOD['https']):
+    """
+    GET the subject groups with the given PKs concurrently, each distinct PK
+    once, returning a dictionary of them keyed by PK. in_filter is the
+    name of the host's list filter on comma separated PKs, if any (see
+    ReFlowClient.get_objects).
+    """
+    return get_client(host, token, method).get_subject_groups_by_pks(
+        subject_group_pks,
+        max_workers=max_workers,
+        in_filter=in_filter
+    )
 
 
 def get_visit_types(
@@ -171,16 +240,10 @@ def get_visit_types(
         visit_type_name=None,
         project_pk=None,
         method=METHOD['https']):
-    url = '%s%s%s' % (method, host, URLS['VISIT_TYPES'])
-    filter_params = dict()
-
-    if visit_type_name is not None:
-        filter_params['visit_type_name'] = visit_type_name
-
-    if project_pk is not None:
-        filter_params['project'] = project_pk
-
-    return get_request(token, url, filter_params)
+    return get_client(host, token, method).get_visit_types(
+        visit_type_name=visit_type_name,
+        project_pk=project_pk
+    )
 
 
 def get_visit_type(host, token, visit_type_pk, method=METHOD['https']):
@@ -193,8 +256,27 @@ def get_visit_type(host, token, visit_type_pk, method=METHOD['https']):
         'reason': The HTTP response reason
         'data': Dictionary representation of object
     """
-    url = '%s%s%s%s/' % (method, host, URLS['VISIT_TYPES'], visit_type_pk)
-    return get_request(token, url)
+    return get_client(host, token, method).get_visit_type(visit_type_pk)
+
+
+def get_visit_types_by_pks(
+        host,
+        token,
+        visit_type_pks,
+        max_workers=8,
+        in_filter=None,
+        method=METHOD['https']):
+    """
+    GET the visit types with the given PKs concurrently, each distinct PK
+    once, returning a dictionary of them keyed by PK. in_filter is the
+    name of the host's list filter on comma separated PKs, if any (see
+    ReFlowClient.get_objects).
+    """
+    return get_client(host, token, method).get_visit_types_by_pks(
+        visit_type_pks,
+        max_workers=max_workers,
+        in_filter=in_filter
+    )
 
 
 def get_sites(
@@ -203,16 +285,10 @@ def get_sites(
         site_name=None,
         project_pk=None,
         method=METHOD['https']):
-    url = '%s%s%s' % (method, host, URLS['SITES'])
-    filter_params = dict()
-
-    if site_name is not None:
-        filter_params['site_name'] = site_name
-
-    if project_pk is not None:
-        filter_params['project'] = project_pk
-
-    return get_request(token, url, filter_params)
+    return get_client(host, token, method).get_sites(
+        site_name=site_name,
+        project_pk=project_pk
+    )
 
 
 def get_site(host, token, site_pk, method=METHOD['https']):
@@ -225,8 +301,27 @@ def get_site(host, token, site_pk, method=METHOD['https']):
         'reason': The HTTP response reason
         'data': Dictionary representation of object
     """
-    url = '%s%s%s%s/' % (method, host, URLS['SITES'], site_pk)
-    return get_request(token, url)
+    return get_client(host, token, method).get_site(site_pk)
+
+
+def get_sites_by_pks(
+        host,
+        token,
+        site_pks,
+        max_workers=8,
+        in_filter=None,
+        method=METHOD['https']):
+    """
+    GET the sites with the given PKs concurrently, each distinct PK
+    once, returning a dictionary of them keyed by PK. in_filter is the
+    name of the host's list filter on comma separated PKs, if any (see
+    ReFlowClient.get_objects).
+    """
+    return get_client(host, token, method).get_sites_by_pks(
+        site_pks,
+        max_workers=max_workers,
+        in_filter=in_filter
+    )
 
 
 def get_subjects(
@@ -236,19 +331,19 @@ def get_subjects(
         project_pk=None,
         subject_group_pk=None,
         method=METHOD['https']):
-    url = '%s%s%s' % (method, host, URLS['SUBJECTS'])
-    filter_params = dict()
-
-    if subject_code is not None:
-        filter_params['subject_code'] = subject_code
-
-    if project_pk is not None:
-        filter_params['project'] = project_pk
+    return get_client(host, token, method).get_subjects(
+        subject_code=subject_code,
+        project_pk=project_pk,
+        subject_group_pk=subject_group_pk
+    )
 
-    if subject_group_pk is not None:
-        filter_params['subject_group'] = subject_group_pk
 
-    return get_request(token, url, filter_params)
+def iter_subjects(host, token, method=METHOD['https'], **kwargs):
+    """
+    Iterates over the subjects matching the get_subjects filters, fetched
+    lazily one page at a time (page_size sets the number per page)
+    """
+    return get_client(host, token, method).iter_subjects(**kwargs)
 
 
 def get_subject(host, token, subject_pk, method=METHOD['https']):
@@ -261,8 +356,27 @@ def get_subject(host, token, subject_pk, method=METHOD['https']):
         'reason': The HTTP response reason
         'data': Dictionary representation of object
     """
-    url = '%s%s%s%s/' % (method, host, URLS['SUBJECTS'], subject_pk)
-    return get_request(token, url)
+    return get_client(host, token, method).get_subject(subject_pk)
+
+
+def get_subjects_by_pks(
+        host,
+        token,
+        subject_pks,
+        max_workers=8,
+        in_filter=None,
+        method=METHOD['https']):
+    """
+    GET the subjects with the given PKs concurrently, each distinct PK
+    once, returning a dictionary of them keyed by PK. in_filter is the
+    name of the host's list filter on comma separated PKs, if any (see
+    ReFlowClient.get_objects).
+    """
+    return get_client(host, token, method).get_subjects_by_pks(
+        subject_pks,
+        max_workers=max_workers,
+        in_filter=in_filter
+    )
 
 
 def get_project_panels(
@@ -272,19 +386,11 @@ def get_project_panels(
         staining=None,
         project_pk=None,
         method=METHOD['https']):
-    url = '%s%s%s' % (method, host, URLS['PROJECT_PANELS'])
-    filter_params = dict()
-
-    if panel_name is not None:
-        filter_params['panel_name'] = panel_name
-
-    if staining is not None:
-        filter_params['staining'] = staining
-
-    if project_pk is not None:
-        filter_params['project'] = project_pk
-
-    return get_request(token, url, filter_params)
+    return get_client(host, token, method).get_project_panels(
+        panel_name=panel_name,
+        staining=staining,
+        project_pk=project_pk
+    )
 
 
 def get_project_panel(host, token, project_panel_pk, method=METHOD['https']):
@@ -297,8 +403,27 @@ def get_project_panel(host, token, project_panel_pk, method=METHOD['https']):
         'reason': The HTTP response reason
         'data': Dictionary representation of object
     """
-    url = '%s%s%s%s/' % (method, host, URLS['PROJECT_PANELS'], project_panel_pk)
-    return get_request(token, url)
+    return get_client(host, token, method).get_project_panel(project_panel_pk)
+
+
+def get_project_panels_by_pks(
+        host,
+        token,
+        project_panel_pks,
+        max_workers=8,
+        in_filter=None,
+        method=METHOD['https']):
+    """
+    GET the project panels with the given PKs concurrently, each distinct PK
+    once, returning a dictionary of them keyed by PK. in_filter is the
+    name of the host's list filter on comma separated PKs, if any (see
+    ReFlowClient.get_objects).
+    """
+    return get_client(host, token, method).get_project_panels_by_pks(
+        project_panel_pks,
+        max_workers=max_workers,
+        in_filter=in_filter
+    )
 
 
 def get_site_panels(
@@ -309,22 +434,12 @@ def get_site_panels(
         project_pk=None,
         panel_type=None,
         method=METHOD['https']):
-    url = '%s%s%s' % (method, host, URLS['SITE_PANELS'])
-    filter_params = dict()
-
-    if site_pk is not None:
-        filter_params['site'] = site_pk
-
-    if project_panel_pk is not None:
-        filter_params['panel_template'] = project_panel_pk
-
-    if project_pk is not None:
-        filter_params['project'] = project_pk
-
-    if panel_type is not None:
-        filter_params['panel_type'] = panel_type
-
-    return get_request(token, url, filter_params)
+    return get_client(host, token, method).get_site_panels(
+        project_panel_pk=project_panel_pk,
+        site_pk=site_pk,
+        project_pk=project_pk,
+        panel_type=panel_type
+    )
 
 
 def get_site_panel(host, token, site_panel_pk, method=METHOD['https']):
@@ -337,8 +452,27 @@ def get_site_panel(host, token, site_panel_pk, method=METHOD['https']):
         'reason': The HTTP response reason
         'data': Dictionary representation of object
     """
-    url = '%s%s%s%s/' % (method, host, URLS['SITE_PANELS'], site_panel_pk)
-    return get_request(token, url)
+    return get_client(host, token, method).get_site_panel(site_panel_pk)
+
+
+def get_site_panels_by_pks(
+        host,
+        token,
+        site_panel_pks,
+        max_workers=8,
+        in_filter=None,
+        method=METHOD['https']):
+    """
+    GET the site panels with the given PKs concurrently, each distinct PK
+    once, returning a dictionary of them keyed by PK. in_filter is the
+    name of the host's list filter on comma separated PKs, if any (see
+    ReFlowClient.get_objects).
+    """
+    return get_client(host, token, method).get_site_panels_by_pks(
+        site_panel_pks,
+        max_workers=max_workers,
+        in_filter=in_filter
+    )
 
 
 def is_site_panel_match(
@@ -353,53 +487,47 @@ def is_site_panel_match(
 
     Returns True/False whether dictionary matches the site panel
     """
+    return get_client(host, token, method).is_site_panel_match(
+        site_panel_pk,
+        parameter_dict
+    )
+
 
-    # TODO: verify the parameter_dict
-
-    response = get_site_panel(host, token, site_panel_pk, method=method)
-
-    site_parameters = None
-
-    if 'data' in response:
-        if 'parameters' in response['data']:
-            site_parameters = response['data']['parameters']
-
-    matches = dict()
-    non_matches = dict()
-    missing = dict()
-
-    if site_parameters:
-        for param in site_parameters:
-            if 'fcs_number' in param:
-                if param['fcs_number'] in parameter_dict:
-                    candidate = parameter_dict[param['fcs_number']]
-                    if 'n' not in candidate:
-                        non_matches[param['fcs_number']] = candidate
-                        continue
-                    if candidate['n'] != param['fcs_text']:
-                        non_matches[param['fcs_number']] = candidate
-                        continue
-                    if 's' not in candidate and param['fcs_opt_text'] != '':
-                        non_matches[param['fcs_number']] = candidate
-                        continue
-                    elif 's' in candidate:
-                        if candidate['s'] != param['fcs_opt_text']:
-                            non_matches[param['fcs_number']] = candidate
-                            continue
-                    # if we get here, everything matched
-                    matches[param['fcs_number']] = candidate
-                else:
-                    missing[param['fcs_number']] = [
-                        param['fcs_text'],
-                        param['fcs_opt_text']
-                    ]
-
-    if (len(matches) == len(site_parameters)) and \
-            len(non_matches) == 0 and \
-            len(missing) == 0:
-        return True
-
-    return False
+def get_site_panel_matcher(
+        host,
+        token,
+        site_panel_pk,
+        method=METHOD['https']):
+    """
+    GET a site panel once and return a panels.SitePanelMatcher, matching
+    any number of parameter dictionaries against it in memory:
+        matcher.is_match(parameter_dict)    True/False
+        matcher.report(parameter_dict)      per-channel report
+    """
+    return get_client(host, token, method).get_site_panel_matcher(
+        site_panel_pk)
+
+
+def get_project_panel_matcher(
+        host,
+        token,
+        project_pk=None,
+        project_panel_pk=None,
+        site_pk=None,
+        panel_type=None,
+        method=METHOD['https']):
+    """
+    GET the site panels matching the filters (e.g. a project's) once and
+    return a panels.PanelMatcher for them:
+        matcher.matching_site_panels(parameter_dict)
+        matcher.reports(parameter_dict)
+    """
+    return get_client(host, token, method).get_project_panel_matcher(
+        project_pk=project_pk,
+        project_panel_pk=project_panel_pk,
+        site_pk=site_pk,
+        panel_type=panel_type
+    )
 
 
 def get_compensations(
@@ -411,25 +539,13 @@ def get_compensations(
         project_pk=None,
         acquisition_date=None,
         method=METHOD['https']):
-    url = '%s%s%s' % (method, host, URLS['COMPENSATIONS'])
-    filter_params = dict()
-
-    if name is not None:
-        filter_params['name'] = name
-
-    if site_panel_pk is not None:
-        filter_params['site_panel'] = site_panel_pk
-
-    if site_pk is not None:
-        filter_params['site'] = site_pk
-
-    if project_pk is not None:
-        filter_params['project'] = project_pk
-
-    if acquisition_date is not None:
-        filter_params['acquisition_date'] = acquisition_date
-
-    return get_request(token, url, filter_params)
+    return get_client(host, token, method).get_compensations(
+        name=name,
+        site_panel_pk=site_panel_pk,
+        site_pk=site_pk,
+        project_pk=project_pk,
+        acquisition_date=acquisition_date
+    )
 
 
 def get_compensation(host, token, compensation_pk, method=METHOD['https']):
@@ -442,8 +558,7 @@ def get_compensation(host, token, compensation_pk, method=METHOD['https']):
         'reason': The HTTP response reason
         'data': Dictionary representation of object
     """
-    url = '%s%s%s%s/' % (method, host, URLS['COMPENSATIONS'], compensation_pk)
-    return get_request(token, url)
+    return get_client(host, token, method).get_compensation(compensation_pk)
 
 
 def get_stimulations(
@@ -452,16 +567,10 @@ def get_stimulations(
         project_pk=None,
         stimulation_name=None,
         method=METHOD['https']):
-    url = '%s%s%s' % (method, host, URLS['STIMULATIONS'])
-    filter_params = dict()
-
-    if project_pk is not None:
-        filter_params['project'] = project_pk
-
-    if stimulation_name is not None:
-        filter_params['stimulation_name'] = stimulation_name
-
-    return get_request(token, url, filter_params)
+    return get_client(host, token, method).get_stimulations(
+        project_pk=project_pk,
+        stimulation_name=stimulation_name
+    )
 
 
 def get_stimulation(host, token, stimulation_pk, method=METHOD['https']):
@@ -474,8 +583,27 @@ def get_stimulation(host, token, stimulation_pk, method=METHOD['https']):
         'reason': The HTTP response reason
         'data': Dictionary representation of object
     """
-    url = '%s%s%s%s/' % (method, host, URLS['STIMULATIONS'], stimulation_pk)
-    return get_request(token, url)
+    return get_client(host, token, method).get_stimulation(stimulation_pk)
+
+
+def get_stimulations_by_pks(
+        host,
+        token,
+        stimulation_pks,
+        max_workers=8,
+        in_filter=None,
+        method=METHOD['https']):
+    """
+    GET the stimulations with the given PKs concurrently, each distinct PK
+    once, returning a dictionary of them keyed by PK. in_filter is the
+    name of the host's list filter on comma separated PKs, if any (see
+    ReFlowClient.get_objects).
+    """
+    return get_client(host, token, method).get_stimulations_by_pks(
+        stimulation_pks,
+        max_workers=max_workers,
+        in_filter=in_filter
+    )
 
 
 def get_samples(
@@ -494,46 +622,28 @@ def get_samples(
         acquisition_date=None,
         sha1=None,
         method=METHOD['https']):
-    url = '%s%s%s' % (method, host, URLS['SAMPLES'])
-    filter_params = dict()
-
-    if subject_pk is not None:
-        filter_params['subject'] = subject_pk
-
-    if site_pk is not None:
-        filter_params['site'] = site_pk
-
-    if project_pk is not None:
-        filter_params['project'] = project_pk
-
-    if visit_pk is not None:
-        filter_params['visit'] = visit_pk
-
-    if stimulation_pk is not None:
-        filter_params['stimulation'] = stimulation_pk
-
-    if specimen_pk is not None:
-        filter_params['specimen'] = specimen_pk
-
-    if site_panel_pk is not None:
-        filter_params['site_panel'] = site_panel_pk
-
-    if project_panel_pk is not None:
-        filter_params['panel'] = project_panel_pk
-
-    if original_filename is not None:
-        filter_params['original_filename'] = original_filename
-
-    if subject_code is not None:
-        filter_params['subject_code'] = subject_code
-
-    if acquisition_date is not None:
-        filter_params['acquisition_date'] = acquisition_date
+    return get_client(host, token, method).get_samples(
+        subject_pk=subject_pk,
+        site_pk=site_pk,
+        project_pk=project_pk,
+        visit_pk=visit_pk,
+        stimulation_pk=stimulation_pk,
+        specimen_pk=specimen_pk,
+        site_panel_pk=site_panel_pk,
+        project_panel_pk=project_panel_pk,
+        original_filename=original_filename,
+        subject_code=subject_code,
+        acquisition_date=acquisition_date,
+        sha1=sha1
+    )
 
-    if sha1 is not None:
-        filter_params['sha1'] = sha1
 
-    return get_request(token, url, filter_params)
+def iter_samples(host, token, method=METHOD['https'], **kwargs):
+    """
+    Iterates over the samples matching the get_samples filters, fetched
+    lazily one page at a time (page_size sets the number per page)
+    """
+    return get_client(host, token, method).iter_samples(**kwargs)
 
 
 def get_sample(host, token, sample_pk, method=METHOD['https']):
@@ -546,8 +656,27 @@ def get_sample(host, token, sample_pk, method=METHOD['https']):
         'reason': The HTTP response reason
         'data': Dictionary representation of object
     """
-    url = '%s%s%s%s/' % (method, host, URLS['SAMPLES'], sample_pk)
-    return get_request(token, url)
+    return get_client(host, token, method).get_sample(sample_pk)
+
+
+def get_samples_by_pks(
+        host,
+        token,
+        sample_pks,
+        max_workers=8,
+        in_filter=None,
+        method=METHOD['https']):
+    """
+    GET the samples with the given PKs concurrently, each distinct PK
+    once, returning a dictionary of them keyed by PK. in_filter is the
+    name of the host's list filter on comma separated PKs, if any (see
+    ReFlowClient.get_objects).
+    """
+    return get_client(host, token, method).get_samples_by_pks(
+        sample_pks,
+        max_workers=max_workers,
+        in_filter=in_filter
+    )
 
 
 def download_sample(
@@ -556,39 +685,67 @@ def download_sample(
         sample_pk,
         filename=None,
         directory=None,
-        method=METHOD['https']):
+        method=METHOD['https'],
+        resume=False,
+        sha1=None,
+        verify=False):
     """
     Download sample as FCS
+
+    Options:
+        'resume': keep a partial file if the download fails, and
+                  continue from it on the next call with resume=True
+        'sha1': expected SHA-1 of the file, checked as it downloads
+        'verify': if True and sha1 isn't given, look up the sample's
+                  SHA-1 first (one extra metadata request)
+
+    On a SHA-1 mismatch the file is not saved, and the status is None
+    with the reason 'SHA-1 mismatch'. The returned dictionary includes
+    the file's 'sha1'.
+    """
+    return get_client(host, token, method).download_sample(
+        sample_pk,
+        filename=filename,
+        directory=directory,
+        resume=resume,
+        sha1=sha1,
+        verify=verify
+    )
+
+
+def download_samples(
+        host,
+        token,
+        sample_pk_list,
+        directory=None,
+        clean=False,
+        max_workers=4,
+        resume=False,
+        verify=False,
+        deadline=None,
+        method=METHOD['https']):
     """
-    url = "%s%s/api/repository/samples/%d/fcs_original/" % (method, host, sample_pk)
-
-    if filename is None:
-        filename = str(sample_pk) + '.fcs'
-    if directory is None:
-        directory = os.getcwd()
-
-    headers = {'Authorization': "Token %s" % token}
-    data = ''
-    try:
-        r = requests.get(url, headers=headers, verify=False)
-    except Exception as e:
-        print(e)
-        return {'status': None, 'reason': 'No response', 'data': data}
-
-    if r.status_code == 200:
-        try:
-            with open("%s/%s" % (directory, filename), "wb") as data_file:
-                data_file.write(r.content)
-        except Exception as e:
-            print(e)
-    else:
-        data = r.text
-
-    return {
-        'status': r.status_code,
-        'reason': r.reason,
-        'data': data,
-    }
+    Download multiple samples as FCS files concurrently, named
+    <PK>.fcs (or <PK>_clean.fcs if clean is True). See download_sample
+    for the resume and verify options, verify only applies to the
+    original (not clean) FCS files. deadline limits the seconds taken
+    by all the downloads.
+
+    Returns a dictionary with keys:
+        'results': List of the individual download_sample dictionaries
+        'bytes': Total number of bytes downloaded
+        'seconds': Wall-clock seconds taken by all the downloads
+        'mbps': Aggregate download rate in megabits per second
+    """
+    return get_client(host, token, method).download_samples(
+        sample_pk_list,
+        directory=directory,
+        clean=clean,
+        max_workers=max_workers,
+        resume=resume,
+        verify=verify,
+        deadline=deadline
+    )
 
 
 def download_clean_sample(
@@ -597,44 +754,22 @@ def download_clean_sample(
         sample_pk,
         filename=None,
         directory=None,
-        method=METHOD['https']):
+        method=METHOD['https'],
+        resume=False):
     """
     Download clean sample as FCS
+
+    Options:
+        'resume': keep a partial file if the download fails, and
+                  continue from it on the next call with resume=True
     """
-    url = "%s%s/api/repository/samples/%d/fcs_clean/" % (
-        method,
-        host,
-        sample_pk
+    return get_client(host, token, method).download_clean_sample(
+        sample_pk,
+        filename=filename,
+        directory=directory,
+        resume=resume
     )
 
-    if filename is None:
-        filename = str(sample_pk) + '_clean.fcs'
-    if directory is None:
-        directory = os.getcwd()
-
-    headers = {'Authorization': "Token %s" % token}
-    data = ''
-    try:
-        r = requests.get(url, headers=headers, verify=False)
-    except Exception as e:
-        print(e)
-        return {'status': None, 'reason': 'No response', 'data': data}
-
-    if r.status_code == 200:
-        try:
-            with open("%s/%s" % (directory, filename), "wb") as data_file:
-                data_file.write(r.content)
-        except Exception as e:
-            print(e)
-    else:
-        data = r.text
-
-    return {
-        'status': r.status_code,
-        'reason': r.reason,
-        'data': data,
-    }
-
 
 def post_sample(
         host,
@@ -668,61 +803,18 @@ def post_sample(
         'data': Dictionary string representation of object successfully posted,
                 empty string if unsuccessful
     """
-
-    url = '%s%s%s' % (method, host, URLS['CREATE_SAMPLES'])
-    headers = {'Authorization': "Token %s" % token}
-
-    # Subject, visit, specimen, stimulation, and site_panel are required
-    data = {
-        'subject': subject_pk,
-        'visit': visit_type_pk,
-        'specimen': specimen_pk,
-        'pretreatment': pretreatment,
-        'storage': storage,
-        'stimulation': stimulation_pk,
-        'site_panel': site_panel_pk,
-        'acquisition_date': acquisition_date
-    }
-
-    # add the compensation field if present
-    if compensation_pk:
-        data['compensation'] = compensation_pk
-
-    file_obj = open(file_path, "rb")
-
-    # get FCS file
-    files = {
-        'sample_file': (os.path.basename(file_obj.name), file_obj)
-    }
-
-    try:
-        response = requests.post(
-            url,
-            headers=headers,
-            data=data,
-            files=files,
-            verify=False)
-    except Exception as e:
-        file_obj.close()
-        print(e)
-        return {'status': None, 'reason': 'No response', 'data': ''}
-
-    file_obj.close()
-
-    if response.status_code == 201:
-        try:
-            data = response.json()
-        except Exception as e:
-            data = response.text()
-            print(e)
-    else:
-        data = response.text
-
-    return {
-        'status': response.status_code,
-        'reason': response.reason,
-        'data': data,
-    }
+    return get_client(host, token, method).post_sample(
+        file_path,
+        subject_pk,
+        visit_type_pk,
+        specimen_pk,
+        pretreatment,
+        storage,
+        stimulation_pk,
+        site_panel_pk,
+        acquisition_date,
+        compensation_pk=compensation_pk
+    )
 
 
 def get_sample_metadata(
@@ -731,16 +823,10 @@ def get_sample_metadata(
         sample_pk=None,
         key=None,
         method=METHOD['https']):
-    url = '%s%s%s' % (method, host, URLS['SAMPLE_METADATA'])
-    filter_params = dict()
-
-    if sample_pk is not None:
-        filter_params['sample'] = sample_pk
-
-    if key is not None:
-        filter_params['key'] = key
-
-    return get_request(token, url, filter_params)
+    return get_client(host, token, method).get_sample_metadata(
+        sample_pk=sample_pk,
+        key=key
+    )
 
 
 def get_sample_collection(
@@ -757,13 +843,9 @@ def get_sample_collection(
         'reason': The HTTP response reason
         'data': Dictionary representation of object
     """
-    url = '%s%s%s%s/' % (
-        method,
-        host,
-        URLS['SAMPLE_COLLECTION'],
+    return get_client(host, token, method).get_sample_collection(
         sample_collection_pk
     )
-    return get_request(token, url)
 
 
 def download_compensation(
@@ -782,43 +864,41 @@ def download_compensation(
         'filename': filename to use for downloaded file
                     (default is the comp_<PK>.<format>, eg comp_42.npy)
     """
-    if data_format == 'npy':
-        url = "%s%s/api/repository/compensations/%d/npy/" % (
-            method, host, compensation_pk)
-    elif data_format == 'csv':
-        url = "%s%s/api/repository/compensations/%d/csv/" % (
-            method, host, compensation_pk)
-    else:
-        print("Data format %s not supported, use 'npy' or 'csv'" % data_format)
-        return
-
-    if filename is None:
-        filename = 'comp_' + str(compensation_pk) + '.' + data_format
-    if directory is None:
-        directory = os.getcwd()
-
-    headers = {'Authorization': "Token %s" % token}
-    data = ''
-    try:
-        r = requests.get(url, headers=headers, verify=False)
-    except Exception as e:
-        print(e)
-        return {'status': None, 'reason': 'No response', 'data': data}
-
-    if r.status_code == 200:
-        try:
-            with open("%s/%s" % (directory, filename), "wb") as data_file:
-                data_file.write(r.content)
-        except Exception as e:
-            print(e)
-    else:
-        data = r.text
-
-    return {
-        'status': r.status_code,
-        'reason': r.reason,
-        'data': data,
-    }
+    return get_client(host, token, method).download_compensation(
+        compensation_pk,
+        data_format=data_format,
+        filename=filename,
+        directory=directory
+    )
+
+
+def download_compensations(
+        host,
+        token,
+        compensation_pk_list,
+        data_format='npy',
+        directory=None,
+        max_workers=4,
+        deadline=None,
+        method=METHOD['https']):
+    """
+    Download multiple compensations concurrently as CSV or Numpy (npy),
+    named comp_<PK>.<format>. deadline limits the seconds taken by all the
+    downloads.
+
+    Returns a dictionary with keys:
+        'results': List of the individual download_compensation dictionaries
+        'bytes': Total number of bytes downloaded
+        'seconds': Wall-clock seconds taken by all the downloads
+        'mbps': Aggregate download rate in megabits per second
+    """
+    return get_client(host, token, method).download_compensations(
+        compensation_pk_list,
+        data_format=data_format,
+        directory=directory,
+        max_workers=max_workers,
+        deadline=deadline
+    )
 
 
 def post_compensation(
@@ -842,42 +922,12 @@ def post_compensation(
         'data': Dictionary string representation of object successfully posted,
                 empty string if unsuccessful
     """
-
-    url = '%s%s%s' % (method, host, URLS['CREATE_COMPENSATION'])
-    headers = {'Authorization': "Token %s" % token}
-
-    # Subject, visit, specimen, stimulation, and site_panel are required
-    data = {
-        'name': name,
-        'panel_template': panel_template_pk,
-        'acquisition_date': acquisition_date,
-        'matrix_text': matrix_text
-    }
-
-    try:
-        response = requests.post(
-            url,
-            headers=headers,
-            data=data,
-            verify=False)
-    except Exception as e:
-        print(e)
-        return {'status': None, 'reason': 'No response', 'data': ''}
-
-    if response.status_code == 201:
-        try:
-            data = response.json()
-        except Exception as e:
-            data = response.text()
-            print(e)
-    else:
-        data = response.text
-
-    return {
-        'status': response.status_code,
-        'reason': response.reason,
-        'data': data,
-    }
+    return get_client(host, token, method).post_compensation(
+        name,
+        panel_template_pk,
+        acquisition_date,
+        matrix_text
+    )
 
 
 ###################################
@@ -887,23 +937,13 @@ def post_compensation(
 #    or a Worker                  #
 ###################################
 def get_processes(host, token, process_name=None, method=METHOD['https']):
-    url = '%s%s%s' % (method, host, URLS['PROCESSES'])
-    filter_params = dict()
-
-    if process_name is not None:
-        filter_params['process_name'] = process_name
-
-    return get_request(token, url, filter_params)
+    return get_client(host, token, method).get_processes(
+        process_name=process_name
+    )
 
 
 def get_workers(host, token, worker_name=None, method=METHOD['https']):
-    url = '%s%s%s' % (method, host, URLS['WORKERS'])
-    filter_params = dict()
-
-    if worker_name is not None:
-        filter_params['worker_name'] = worker_name
-
-    return get_request(token, url, filter_params)
+    return get_client(host, token, method).get_workers(worker_name=worker_name)
 
 
 def get_process_requests(
@@ -913,19 +953,20 @@ def get_process_requests(
         worker_pk=None,
         request_user_pk=None,
         method=METHOD['https']):
-    url = '%s%s%s' % (method, host, URLS['PROCESS_REQUESTS'])
-    filter_params = dict()
-
-    if process_pk is not None:
-        filter_params['process'] = process_pk
-
-    if worker_pk is not None:
-        filter_params['worker'] = worker_pk
+    return get_client(host, token, method).get_process_requests(
+        process_pk=process_pk,
+        worker_pk=worker_pk,
+        request_user_pk=request_user_pk
+    )
 
-    if request_user_pk is not None:
-        filter_params['request_user'] = request_user_pk
 
-    return get_request(token, url, filter_params)
+def iter_process_requests(host, token, method=METHOD['https'], **kwargs):
+    """
+    Iterates over the process requests matching the get_process_requests
+    filters, fetched lazily one page at a time (page_size sets the number
+    per page)
+    """
+    return get_client(host, token, method).iter_process_requests(**kwargs)
 
 
 def get_assigned_process_requests(
@@ -937,10 +978,7 @@ def get_assigned_process_requests(
     i.e. the requesting user must be a Worker in the ReFlow server
     Also, only non-Completed requests will be returned
     """
-    url = '%s%s%s' % (method, host, URLS['ASSIGNED_PROCESS_REQUESTS'])
-    filter_params = dict()
-
-    return get_request(token, url, filter_params)
+    return get_client(host, token, method).get_assigned_process_requests()
 
 
 def get_viable_process_requests(
@@ -955,19 +993,11 @@ def get_viable_process_requests(
     i.e. the requesting user must be a Worker registered with the Process
     Also, only unassigned 'Pending' requests will be returned
     """
-    url = '%s%s%s' % (method, host, URLS['VIABLE_PROCESS_REQUESTS'])
-    filter_params = dict()
-
-    if process_pk is not None:
-        filter_params['process'] = process_pk
-
-    if worker_pk is not None:
-        filter_params['worker'] = worker_pk
-
-    if request_user_pk is not None:
-        filter_params['request_user'] = request_user_pk
-
-    return get_request(token, url, filter_params)
+    return get_client(host, token, method).get_viable_process_requests(
+        process_pk=process_pk,
+        worker_pk=worker_pk,
+        request_user_pk=request_user_pk
+    )
 
 
 def get_process_request(
@@ -984,12 +1014,9 @@ def get_process_request(
         'reason': The HTTP response reason
         'data': Dictionary representation of object
     """
-    url = '%s%s%s%s/' % (
-        method,
-        host,
-        URLS['PROCESS_REQUESTS'],
-        process_request_pk)
-    return get_request(token, url)
+    return get_client(host, token, method).get_process_request(
+        process_request_pk
+    )
 
 
 def request_pr_assignment(
@@ -1001,41 +1028,9 @@ def request_pr_assignment(
     Requesting user must be a Worker registered with the Process and
     and the ProcessRequest must have 'Pending' status
     """
-    url = '%s%s%s%s/%s/' % (
-        method,
-        host,
-        URLS['PROCESS_REQUESTS'],
-        process_request_pk,
-        'request_assignment')
-    headers = {'Authorization': "Token %s" % token}
-
-    try:
-        r = requests.patch(
-            url,
-            data={
-                'process_request':
-                process_request_pk
-            },
-            headers=headers,
-            verify=False)
-    except Exception as e:
-        print(e)
-        return {'status': None, 'reason': 'No response', 'data': ''}
-
-    if r.status_code == 201:
-        try:
-            data = r.json()
-        except Exception as e:
-            data = r.text()
-            print(e)
-    else:
-        data = r.text
-
-    return {
-        'status': r.status_code,
-        'reason': r.reason,
-        'data': data,
-    }
+    return get_client(host, token, method).request_pr_assignment(
+        process_request_pk
+    )
 
 
 def report_pr_error(
@@ -1048,34 +1043,11 @@ def report_pr_error(
     Requesting user must be a Worker assigned to the ProcessRequest and
     and the ProcessRequest must have 'Worker' status
     """
-    url = '%s%s%s%s/%s/' % (
-        method,
-        host,
-        URLS['PROCESS_REQUESTS'],
+    return get_client(host, token, method).report_pr_error(
         process_request_pk,
-        'report_error')
-    headers = {'Authorization': "Token %s" % token}
-
-    r = requests.patch(
-        url,
-        data={
-            'status_message': error_msg_string
-        },
-        headers=headers,
-        verify=False
+        error_msg_string
     )
 
-    if r.status_code == 201:
-        data = r.json()
-    else:
-        data = r.text
-
-    return {
-        'status': r.status_code,
-        'reason': r.reason,
-        'data': data,
-    }
-
 
 def verify_pr_assignment(
         host,
@@ -1086,18 +1058,9 @@ def verify_pr_assignment(
     Result will include 'assignment': True of request.user (Worker) is assigned
     to the specified ProcessRequest
     """
-    url = '%s%s%s%s/%s/' % (
-        method,
-        host,
-        URLS['PROCESS_REQUESTS'],
-        process_request_pk,
-        'verify_assignment')
-    filter_params = dict()
-
-    if process_request_pk is not None:
-        filter_params['process_request'] = process_request_pk
-
-    return get_request(token, url, filter_params)
+    return get_client(host, token, method).verify_pr_assignment(
+        process_request_pk
+    )
 
 
 def revoke_pr_assignment(
@@ -1108,18 +1071,9 @@ def revoke_pr_assignment(
     """
     Requests un-assignment from a ProcessRequest on the ReFlow server
     """
-    url = '%s%s%s%s/%s/' % (
-        method,
-        host,
-        URLS['PROCESS_REQUESTS'],
-        process_request_pk,
-        'revoke_assignment')
-    filter_params = dict()
-
-    if process_request_pk is not None:
-        filter_params['process_request'] = process_request_pk
-
-    return get_request(token, url, filter_params)
+    return get_client(host, token, method).revoke_pr_assignment(
+        process_request_pk
+    )
 
 
 def purge_pr_results(
@@ -1131,18 +1085,7 @@ def purge_pr_results(
     Requests that previous ProcessRequest results be deleted. Only works
     for uncompleted PRs, and only for the assigned Worker.
     """
-    url = '%s%s%s%s/%s/' % (
-        method,
-        host,
-        URLS['PROCESS_REQUESTS'],
-        process_request_pk,
-        'purge_results')
-    filter_params = dict()
-
-    if process_request_pk is not None:
-        filter_params['process_request'] = process_request_pk
-
-    return get_request(token, url, filter_params)
+    return get_client(host, token, method).purge_pr_results(process_request_pk)
 
 
 def report_pr_progress(
@@ -1156,33 +1099,11 @@ def report_pr_progress(
     and the ProcessRequest must have 'Worker' status. Percent complete should
     be an integer, and will be reported back as such to the ReFlow server.
     """
-    url = '%s%s%s%s' % (
-        method,
-        host,
-        URLS['PROCESS_REQUESTS'],
-        process_request_pk)
-    headers = {'Authorization': "Token %s" % token}
-
-    r = requests.patch(
-        url,
-        data={
-            'percent_complete': percent_complete
-        },
-        headers=headers,
-        verify=False
+    return get_client(host, token, method).report_pr_progress(
+        process_request_pk,
+        percent_complete
     )
 
-    if r.status_code == 201:
-        data = r.json()
-    else:
-        data = r.text
-
-    return {
-        'status': r.status_code,
-        'reason': r.reason,
-        'data': data,
-    }
-
 
 def complete_pr_assignment(
         host,
@@ -1192,28 +1113,16 @@ def complete_pr_assignment(
     """
     Report that the ProcessRequest has been completed
     """
-    url = '%s%s%s%s/%s/' % (
-        method,
-        host,
-        URLS['PROCESS_REQUESTS'],
-        process_request_pk,
-        'complete_assignment')
-    filter_params = dict()
-
-    if process_request_pk is not None:
-        filter_params['process_request'] = process_request_pk
-
-    return get_request(token, url, filter_params)
+    return get_client(host, token, method).complete_pr_assignment(
+        process_request_pk
+    )
 
 
 def verify_worker(host, token, method=METHOD['https']):
     """
     Result will include 'worker': True if request.user is a Worker on host
     """
-    url = '%s%s%s' % (method, host, URLS['VERIFY_WORKER'])
-    filter_params = dict()
-
-    return get_request(token, url, filter_params)
+    return get_client(host, token, method).verify_worker()
 
 
 def post_cluster(
@@ -1233,40 +1142,10 @@ def post_cluster(
         'data': Dictionary string representation of object successfully posted,
                 empty string if unsuccessful
     """
-
-    url = '%s%s%s' % (method, host, URLS['CLUSTERS'])
-    headers = {'Authorization': "Token %s" % token}
-
-    # process_request and index are required
-    data = {
-        'process_request': process_request_id,
-        'index': cluster_index
-    }
-
-    try:
-        response = requests.post(
-            url,
-            headers=headers,
-            data=data,
-            verify=False)
-    except Exception as e:
-        print(e)
-        return {'status': None, 'reason': 'No response', 'data': ''}
-
-    if response.status_code == 201:
-        try:
-            data = response.json()
-        except Exception as e:
-            data = response.text()
-            print(e)
-    else:
-        data = response.text
-
-    return {
-        'status': response.status_code,
-        'reason': response.reason,
-        'data': data,
-    }
+    return get_client(host, token, method).post_cluster(
+        process_request_id,
+        cluster_index
+    )
 
 
 def post_sample_cluster(
@@ -1291,48 +1170,14 @@ def post_sample_cluster(
         'data': Dictionary string representation of object successfully posted,
                 empty string if unsuccessful
     """
-
-    url = '%s%s%s' % (method, host, URLS['SAMPLE_CLUSTERS'])
-    headers = {
-        'Authorization': "Token %s" % token,
-        'Content-type': 'application/json'  # b/c of the nested param_dict
-    }
-
-    # process_request and index are required
-    data = {
-        'cluster_id': cluster_id,
-        'sample_id': sample_id,
-        'parameters': param_dict,
-        'events': events,
-        'event_percentage': event_percentage,
-        'components': components
-    }
-
-    # convert to JSON b/c of nested objects (param_dict)
-    data = json.dumps(data)
-
-    response = requests.post(
-        url,
-        headers=headers,
-        data=data,
-        verify=False)
-
-    if response.status_code == 201:
-        try:
-            data = response.json()
-        except Exception as e:
-            # Since we got a 201 response but couldn't JSON-ify the response,
-            # we still need to return something sensible
-            data = response.text()
-            print(e)
-    else:
-        data = response.text
-
-    return {
-        'status': response.status_code,
-        'reason': response.reason,
-        'data': data,
-    }
+    return get_client(host, token, method).post_sample_cluster(
+        cluster_id,
+        sample_id,
+        param_dict,
+        events,
+        event_percentage,
+        components
+    )
 
 
 def get_sample_clusters(
@@ -1340,13 +1185,18 @@ def get_sample_clusters(
         token,
         process_request_pk=None,
         method=METHOD['https']):
-    url = '%s%s%s' % (method, host, URLS['SAMPLE_CLUSTERS'])
-    filter_params = dict()
+    return get_client(host, token, method).get_sample_clusters(
+        process_request_pk=process_request_pk
+    )
 
-    if process_request_pk is not None:
-        filter_params['process_request'] = process_request_pk
 
-    return get_request(token, url, filter_params)
+def iter_sample_clusters(host, token, method=METHOD['https'], **kwargs):
+    """
+    Iterates over the sample clusters matching the get_sample_clusters
+    filters, fetched lazily one page at a time (page_size sets the number
+    per page)
+    """
+    return get_client(host, token, method).iter_sample_clusters(**kwargs)
 
 
 def get_sample_cluster_components(
@@ -1355,15 +1205,10 @@ def get_sample_cluster_components(
         process_request_pk=None,
         sample_pk=None,
         method=METHOD['https']):
-    url = '%s%s%s' % (method, host, URLS['SAMPLE_CLUSTER_COMPONENTS'])
-    filter_params = dict()
-
-    if process_request_pk is not None:
-        filter_params['process_request'] = process_request_pk
-    if sample_pk is not None:
-        filter_params['sample'] = sample_pk
-
-    return get_request(token, url, filter_params)
+    return get_client(host, token, method).get_sample_cluster_components(
+        process_request_pk=process_request_pk,
+        sample_pk=sample_pk
+    )
 
 
 def download_sample_cluster_events(
@@ -1381,36 +1226,36 @@ def download_sample_cluster_events(
         'filename': filename to use for downloaded file
                     (default is the comp_<PK>.<format>, eg comp_42.npy)
     """
-    url = "%s%s/api/repository/sample_clusters/%d/csv/" % (
-        method,
-        host,
-        sample_cluster_pk
+    return get_client(host, token, method).download_sample_cluster_events(
+        sample_cluster_pk,
+        filename=filename,
+        directory=directory
     )
 
-    if filename is None:
-        filename = 'sample_cluster_' + str(sample_cluster_pk) + '.csv'
-    if directory is None:
-        directory = os.getcwd()
-
-    headers = {'Authorization': "Token %s" % token}
-    data = ''
-    try:
-        r = requests.get(url, headers=headers, verify=False)
-    except Exception as e:
-        print(e)
-        return {'status': None, 'reason': 'No response', 'data': data}
-
-    if r.status_code == 200:
-        try:
-            with open("%s/%s" % (directory, filename), "wb") as data_file:
-                data_file.write(r.content)
-        except Exception as e:
-            print(e)
-    else:
-        data = r.text
-
-    return {
-        'status': r.status_code,
-        'reason': r.reason,
-        'data': data,
-    }
+
+def download_sample_clusters_events(
+        host,
+        token,
+        sample_cluster_pk_list,
+        directory=None,
+        max_workers=4,
+        deadline=None,
+        method=METHOD['https']):
+    """
+    Download the events of multiple sample clusters concurrently as CSV,
+    named sample_cluster_<PK>.csv. deadline limits the seconds taken by
+    all the downloads.
+
+    Returns a dictionary with keys:
+        'results': List of the individual download_sample_cluster_events
+                   dictionaries
+        'bytes': Total number of bytes downloaded
+        'seconds': Wall-clock seconds taken by all the downloads
+        'mbps': Aggregate download rate in megabits per second
+    """
+    return get_client(host, token, method).download_sample_clusters_events(
+        sample_cluster_pk_list,
+        directory=directory,
+        max_workers=max_workers,
+        deadline=deadline
+    )
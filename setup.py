@@ -5,7 +5,7 @@ setup(
     version='0.5',
     author='Scott White',
     author_email='scott.white@duke.edu',
-    packages=['reflowrestclient'],
+    packages=['reflowrestclient', 'reflowrestclient.aio'],
     package_data={'': []},
     url='https://github.com/whitews/ReFlowRESTClient',
     license='LICENSE.txt',
@@ -13,5 +13,9 @@ setup(
     long_description=open('README.md').read(),
     requires=[
         'requests'
-    ]
+    ],
+    extras_require={
+        'aio': ['aiohttp'],
+        'fastjson': ['orjson']
+    }
 )
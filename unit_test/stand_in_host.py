@@ -0,0 +1,282 @@
+"""
+Local stand-in for a ReFlow host, serving a few repository endpoints
+from memory so the clients can be tested without a real server
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlsplit, parse_qs
+except ImportError:
+    # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlsplit, parse_qs
+
+TOKEN = 'stand-in-token'
+
+SUBJECT_COUNT = 25
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StandInHost(object):
+    """
+    Serves on a free local port once started. Every request is recorded
+    in requests as a (verb, path, headers) tuple, and the number of
+    accepted connections is counted.
+
+    Failures to simulate:
+        fail_next: number of next requests answered with a 503
+        truncate_next: number of next sample file responses cut off
+                       halfway through the body
+    """
+
+    def __init__(self):
+        self.files = dict(
+            (pk, os.urandom(64 * 1024 + pk * 1000)) for pk in range(1, 6)
+        )
+        self.requests = []
+        self.connections = 0
+        self.fail_next = 0
+        self.truncate_next = 0
+
+        self.lock = threading.Lock()
+        self.server = None
+
+    def start(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        self.server.stand_in = self
+
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def host(self):
+        return '127.0.0.1:%d' % self.server.server_address[1]
+
+    def paths(self):
+        return [path for verb, path, headers in self.requests]
+
+    def file_etag(self, pk):
+        return '"%s"' % hashlib.sha1(self.files[pk]).hexdigest()
+
+    def sample(self, pk):
+        return {
+            'id': pk,
+            'subject': 1 + pk % 3,
+            'site_panel': 1,
+            'original_filename': '%d.fcs' % pk,
+            'sha1': hashlib.sha1(self.files[pk]).hexdigest(),
+        }
+
+    @staticmethod
+    def subject(pk):
+        return {
+            'id': pk,
+            'subject_code': 'S%d' % pk,
+            'subject_group': 1 + pk % 2,
+            'project': 1,
+        }
+
+    @staticmethod
+    def sample_cluster(pk):
+        return {
+            'id': pk,
+            'sample': 1 + pk % 5,
+            'cluster_index': pk % 4,
+            'event_indices': list(range(pk * 10)),
+        }
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        stand_in = self.server.stand_in
+        with stand_in.lock:
+            stand_in.connections += 1
+
+    def send_body(self, status, body, content_type='application/json',
+                  headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_not_found(self):
+        self.send_body(404, {'detail': 'Not found.'})
+
+    def do_GET(self):
+        stand_in = self.server.stand_in
+        url = urlsplit(self.path)
+        query = dict((k, v[0]) for k, v in parse_qs(url.query).items())
+
+        with stand_in.lock:
+            stand_in.requests.append(
+                (self.command, url.path, dict(self.headers.items())))
+            failing = stand_in.fail_next > 0
+            if failing:
+                stand_in.fail_next -= 1
+
+        if failing:
+            self.send_body(
+                503, b'busy', 'text/plain', {'Retry-After': '0'})
+            return
+
+        if self.headers.get('Authorization') != 'Token %s' % TOKEN:
+            self.send_body(401, {'detail': 'Invalid token.'})
+            return
+
+        for pattern, route in ROUTES:
+            match = re.match(pattern, url.path)
+            if match:
+                route(self, query, *match.groups())
+                return
+
+        self.send_not_found()
+
+    def samples(self, query):
+        stand_in = self.server.stand_in
+        self.send_body(
+            200, [stand_in.sample(pk) for pk in sorted(stand_in.files)])
+
+    def sample(self, query, pk):
+        stand_in = self.server.stand_in
+        if int(pk) not in stand_in.files:
+            self.send_not_found()
+            return
+
+        self.send_body(200, stand_in.sample(int(pk)))
+
+    def sample_file(self, query, pk):
+        stand_in = self.server.stand_in
+        pk = int(pk)
+        if pk not in stand_in.files:
+            self.send_not_found()
+            return
+
+        data = stand_in.files[pk]
+        etag = stand_in.file_etag(pk)
+        headers = {'ETag': etag, 'Accept-Ranges': 'bytes'}
+
+        status = 200
+        byte_range = self.headers.get('Range')
+        if_range = self.headers.get('If-Range')
+        if byte_range and (if_range is None or if_range == etag):
+            start, end = byte_range.split('=')[1].split('-')
+            start = int(start)
+            end = int(end) if end else len(data) - 1
+            headers['Content-Range'] = 'bytes %d-%d/%d' % (
+                start, end, len(data))
+            data = data[start:end + 1]
+            status = 206
+
+        with stand_in.lock:
+            truncate = stand_in.truncate_next > 0
+            if truncate:
+                stand_in.truncate_next -= 1
+
+        if not truncate:
+            self.send_body(
+                status, data, 'application/octet-stream', headers)
+            return
+
+        # announce the whole body, send half of it and hang up
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/octet-stream')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data[:len(data) // 2])
+        self.wfile.flush()
+        self.close_connection = True
+
+    def subjects(self, query):
+        """
+        Paginated list, filtered by comma separated PKs with id__in
+        """
+        subjects = [
+            StandInHost.subject(pk) for pk in range(1, SUBJECT_COUNT + 1)
+        ]
+        if 'id__in' in query:
+            pks = query['id__in'].split(',')
+            subjects = [s for s in subjects if str(s['id']) in pks]
+
+        page = int(query.get('page', 1))
+        page_size = int(query.get('page_size', 10))
+        results = subjects[(page - 1) * page_size:page * page_size]
+
+        next_url = None
+        if page * page_size < len(subjects):
+            query['page'] = page + 1
+            next_url = 'http://%s/api/repository/subjects/?%s' % (
+                self.headers['Host'],
+                '&'.join('%s=%s' % item for item in sorted(query.items())))
+
+        self.send_body(200, {
+            'count': len(subjects),
+            'next': next_url,
+            'previous': None,
+            'results': results,
+        })
+
+    def subject(self, query, pk):
+        if int(pk) > SUBJECT_COUNT:
+            self.send_not_found()
+            return
+
+        self.send_body(200, StandInHost.subject(int(pk)))
+
+    def subject_group(self, query, pk):
+        self.send_body(200, {'id': int(pk), 'group_name': 'G%s' % pk})
+
+    def site_panel(self, query, pk):
+        self.send_body(200, {'id': int(pk), 'panel_type': 'FS'})
+
+    def sample_clusters(self, query):
+        self.send_body(
+            200, [StandInHost.sample_cluster(pk) for pk in range(20)])
+
+    def revoke_assignment(self, query, pk):
+        self.send_body(200, {'id': int(pk), 'status': 'Pending'})
+
+
+ROUTES = [
+    (r'^/api/repository/samples/$', StandInHandler.samples),
+    (r'^/api/repository/samples/(\d+)/$', StandInHandler.sample),
+    (r'^/api/repository/samples/(\d+)/fcs_original/$',
+     StandInHandler.sample_file),
+    (r'^/api/repository/subjects/$', StandInHandler.subjects),
+    (r'^/api/repository/subjects/(\d+)/$', StandInHandler.subject),
+    (r'^/api/repository/subject_groups/(\d+)/$',
+     StandInHandler.subject_group),
+    (r'^/api/repository/site_panels/(\d+)/$', StandInHandler.site_panel),
+    (r'^/api/repository/sample_clusters/$',
+     StandInHandler.sample_clusters),
+    (r'^/api/repository/process_requests/(\d+)/revoke_assignment/$',
+     StandInHandler.revoke_assignment),
+]
@@ -0,0 +1,192 @@
+"""
+Tests of AsyncReFlowClient against a local stand-in host, skipped
+without aiohttp
+"""
+import os
+import unittest
+
+try:
+    import asyncio
+    import aiohttp
+except ImportError:
+    aiohttp = None
+else:
+    from reflowrestclient.aio.client import AsyncReFlowClient
+
+from reflowrestclient.client import METHOD
+from reflowrestclient.retry import RetryPolicy
+from unit_test.stand_in_host import TOKEN, SUBJECT_COUNT
+from unit_test.test_client import StandInTestCase
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+class AsyncStandInTestCase(StandInTestCase):
+    """
+    Runs each test coroutine in a new event loop, with an
+    AsyncReFlowClient closed at the end
+    """
+
+    def run_client(self, test, **options):
+        options.setdefault('retry_policy', RetryPolicy(backoff_factor=0))
+
+        async def run():
+            async with AsyncReFlowClient(
+                    self.stand_in.host,
+                    TOKEN,
+                    method=METHOD['http'],
+                    **options) as client:
+                return await test(client)
+
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(run())
+        finally:
+            loop.close()
+
+
+class AsyncPoolingTest(AsyncStandInTestCase):
+
+    def test_requests_share_connections(self):
+        async def test(client):
+            return await asyncio.gather(
+                *[client.get_sample(1 + pk % 5) for pk in range(40)])
+
+        results = self.run_client(test, max_concurrency=4)
+
+        self.assertEqual(
+            [result['status'] for result in results], [200] * 40)
+        self.assertLessEqual(self.stand_in.connections, 4)
+
+
+class AsyncDownloadTest(AsyncStandInTestCase):
+
+    def test_interrupted_download_is_resumed(self):
+        data = self.stand_in.files[2]
+        self.stand_in.truncate_next = 1
+
+        async def test(client):
+            first = await client.download_sample(
+                2, directory=self.directory, resume=True)
+            part_size = os.path.getsize(self.path('2.fcs.part'))
+            second = await client.download_sample(
+                2, directory=self.directory, resume=True)
+            return first, part_size, second
+
+        first, part_size, second = self.run_client(test, chunk_size=4096)
+
+        self.assertIsNone(first['status'])
+        self.assertTrue(0 < part_size < len(data))
+        self.assertEqual(second['status'], 200)
+        self.assertEqual(second['bytes'], len(data) - part_size)
+        self.assertEqual(self.read('2.fcs'), data)
+
+        headers = self.stand_in.requests[-1][2]
+        self.assertEqual(headers['Range'], 'bytes=%d-' % part_size)
+        self.assertEqual(headers['If-Range'], self.stand_in.file_etag(2))
+
+    def test_segmented_download(self):
+        async def test(client):
+            return await client.download_sample(
+                4, directory=self.directory)
+
+        result = self.run_client(
+            test,
+            download_segments=4,
+            min_segment_size=16 * 1024
+        )
+
+        self.assertEqual(result['status'], 200)
+        self.assertEqual(self.read('4.fcs'), self.stand_in.files[4])
+        self.assertEqual(len(self.stand_in.requests), 5)
+
+    def test_sha1_mismatch(self):
+        async def test(client):
+            return await client.download_sample(
+                1, directory=self.directory, sha1='0' * 40)
+
+        result = self.run_client(test)
+
+        self.assertIsNone(result['status'])
+        self.assertEqual(result['reason'], 'SHA-1 mismatch')
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+class AsyncRetryTest(AsyncStandInTestCase):
+
+    def test_transient_errors_are_retried(self):
+        self.stand_in.fail_next = 2
+
+        async def test(client):
+            return await client.get_sample(1)
+
+        self.assertEqual(self.run_client(test)['status'], 200)
+        self.assertEqual(len(self.stand_in.requests), 3)
+
+    def test_requests_with_side_effects_are_not_retried(self):
+        self.stand_in.fail_next = 1
+
+        async def test(client):
+            return await client.revoke_pr_assignment(1)
+
+        self.assertEqual(self.run_client(test)['status'], 503)
+        self.assertEqual(len(self.stand_in.requests), 1)
+
+
+class AsyncStreamTest(AsyncStandInTestCase):
+
+    def test_stream_array(self):
+        async def test(client):
+            records = [
+                record async for record in client.stream_sample_clusters()
+            ]
+            return records, (await client.get_sample_clusters())['data']
+
+        records, expected = self.run_client(test, chunk_size=7)
+
+        self.assertEqual(records, expected)
+
+    def test_stream_paginated_list(self):
+        async def test(client):
+            return [
+                record async for record in client.stream(client.get_subjects)
+            ]
+
+        records = self.run_client(test, chunk_size=7)
+
+        self.assertEqual(
+            [record['id'] for record in records],
+            list(range(1, SUBJECT_COUNT + 1)))
+
+
+class AsyncRelatedObjectsTest(AsyncStandInTestCase):
+
+    def test_get_by_pks(self):
+        async def test(client):
+            return await client.get_subjects_by_pks([3, 1, 3, None, 99])
+
+        subjects = self.run_client(test)
+
+        self.assertEqual(sorted(subjects), [1, 3])
+        self.assertEqual(len(self.stand_in.requests), 3)
+
+    def test_prefetch(self):
+        async def test(client):
+            samples = (await client.get_samples())['data']
+            await client.prefetch(samples, ['subject_group'])
+            return samples
+
+        samples = self.run_client(test)
+
+        for sample in samples:
+            subject = sample['subject_object']
+            self.assertEqual(subject['id'], sample['subject'])
+            self.assertEqual(
+                subject['subject_group_object']['id'],
+                subject['subject_group'])
+
+        paths = self.stand_in.paths()
+        self.assertEqual(len(paths), len(set(paths)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,301 @@
+"""
+Tests of ReFlowClient against a local stand-in host
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from reflowrestclient.client import ReFlowClient, METHOD
+from reflowrestclient.retry import RetryPolicy, RetryBudget
+from unit_test.stand_in_host import StandInHost, TOKEN, SUBJECT_COUNT
+
+
+class StandInTestCase(unittest.TestCase):
+    """
+    Starts a stand-in host and creates a scratch directory for each test
+    """
+
+    def setUp(self):
+        self.stand_in = StandInHost()
+        self.stand_in.start()
+        self.addCleanup(self.stand_in.stop)
+
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def client(self, **options):
+        options.setdefault('retry_policy', RetryPolicy(backoff_factor=0))
+        client = ReFlowClient(
+            self.stand_in.host,
+            TOKEN,
+            method=METHOD['http'],
+            **options
+        )
+        self.addCleanup(client.close)
+
+        return client
+
+    def path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def read(self, filename):
+        with open(self.path(filename), 'rb') as downloaded:
+            return downloaded.read()
+
+
+class PoolingTest(StandInTestCase):
+
+    def test_requests_share_a_connection(self):
+        client = self.client()
+
+        for pk in range(1, 6):
+            self.assertEqual(client.get_sample(pk)['status'], 200)
+
+        self.assertEqual(self.stand_in.connections, 1)
+
+    def test_keep_alive_disabled(self):
+        client = self.client(keep_alive=False)
+
+        for pk in range(1, 6):
+            self.assertEqual(client.get_sample(pk)['status'], 200)
+
+        self.assertEqual(self.stand_in.connections, 5)
+
+
+class DownloadTest(StandInTestCase):
+
+    def test_download_sample(self):
+        client = self.client()
+        data = self.stand_in.files[1]
+
+        result = client.download_sample(1, directory=self.directory)
+
+        self.assertEqual(result['status'], 200)
+        self.assertEqual(result['bytes'], len(data))
+        self.assertEqual(result['sha1'], hashlib.sha1(data).hexdigest())
+        self.assertEqual(self.read('1.fcs'), data)
+
+    def test_interrupted_download_is_resumed(self):
+        client = self.client(chunk_size=4096)
+        data = self.stand_in.files[2]
+        self.stand_in.truncate_next = 1
+
+        result = client.download_sample(
+            2, directory=self.directory, resume=True)
+
+        self.assertIsNone(result['status'])
+        self.assertFalse(os.path.exists(self.path('2.fcs')))
+        part_size = os.path.getsize(self.path('2.fcs.part'))
+        self.assertTrue(0 < part_size < len(data))
+
+        result = client.download_sample(
+            2, directory=self.directory, resume=True)
+
+        self.assertEqual(result['status'], 200)
+        self.assertEqual(result['bytes'], len(data) - part_size)
+        self.assertEqual(self.read('2.fcs'), data)
+        self.assertFalse(os.path.exists(self.path('2.fcs.part')))
+        self.assertFalse(os.path.exists(self.path('2.fcs.part.json')))
+
+        headers = self.stand_in.requests[-1][2]
+        self.assertEqual(headers['Range'], 'bytes=%d-' % part_size)
+        self.assertEqual(headers['If-Range'], self.stand_in.file_etag(2))
+
+    def test_changed_file_is_downloaded_again(self):
+        client = self.client(chunk_size=4096)
+        self.stand_in.truncate_next = 1
+        client.download_sample(3, directory=self.directory, resume=True)
+
+        old_etag = self.stand_in.file_etag(3)
+        data = os.urandom(50 * 1024)
+        self.stand_in.files[3] = data
+        result = client.download_sample(
+            3, directory=self.directory, resume=True)
+
+        self.assertEqual(result['status'], 200)
+        self.assertEqual(result['bytes'], len(data))
+        self.assertEqual(self.read('3.fcs'), data)
+
+        # the If-Range validator no longer matches, the host sent it all
+        self.assertEqual(self.stand_in.requests[-1][2]['If-Range'], old_etag)
+
+    def test_segmented_download(self):
+        client = self.client(
+            download_segments=4,
+            min_segment_size=16 * 1024
+        )
+        data = self.stand_in.files[4]
+
+        result = client.download_sample(4, directory=self.directory)
+
+        self.assertEqual(result['status'], 200)
+        self.assertEqual(self.read('4.fcs'), data)
+
+        ranges = [
+            headers.get('Range')
+            for verb, path, headers in self.stand_in.requests
+        ]
+        self.assertEqual(ranges[0], 'bytes=0-0')
+        self.assertEqual(len(ranges), 5)
+        self.assertTrue(all(ranges))
+
+    def test_verified_download(self):
+        client = self.client()
+
+        result = client.download_sample(
+            5, directory=self.directory, verify=True)
+
+        self.assertEqual(result['status'], 200)
+        self.assertEqual(self.read('5.fcs'), self.stand_in.files[5])
+
+    def test_sha1_mismatch(self):
+        for segments in (1, 4):
+            client = self.client(
+                download_segments=segments,
+                min_segment_size=16 * 1024
+            )
+
+            result = client.download_sample(
+                1, directory=self.directory, sha1='0' * 40)
+
+            self.assertIsNone(result['status'])
+            self.assertEqual(result['reason'], 'SHA-1 mismatch')
+            self.assertEqual(os.listdir(self.directory), [])
+
+
+class RetryTest(StandInTestCase):
+
+    def test_transient_errors_are_retried(self):
+        client = self.client()
+        self.stand_in.fail_next = 2
+
+        self.assertEqual(client.get_sample(1)['status'], 200)
+        self.assertEqual(len(self.stand_in.requests), 3)
+
+    def test_max_retries(self):
+        client = self.client(
+            retry_policy=RetryPolicy(max_retries=1, backoff_factor=0))
+        self.stand_in.fail_next = 5
+
+        self.assertEqual(client.get_sample(1)['status'], 503)
+        self.assertEqual(len(self.stand_in.requests), 2)
+
+    def test_retry_budget(self):
+        budget = RetryBudget(ratio=0, max_tokens=1)
+        client = self.client(
+            retry_policy=RetryPolicy(backoff_factor=0, budget=budget))
+        self.stand_in.fail_next = 5
+
+        self.assertEqual(client.get_sample(1)['status'], 503)
+        self.assertEqual(len(self.stand_in.requests), 2)
+
+        # the budget is spent, the next failure is not retried
+        self.assertEqual(client.get_sample(1)['status'], 503)
+        self.assertEqual(len(self.stand_in.requests), 3)
+
+    def test_requests_with_side_effects_are_not_retried(self):
+        client = self.client()
+        self.stand_in.fail_next = 1
+
+        self.assertEqual(client.revoke_pr_assignment(1)['status'], 503)
+        self.assertEqual(len(self.stand_in.requests), 1)
+
+
+class StreamTest(StandInTestCase):
+
+    def test_stream_array(self):
+        client = self.client(chunk_size=7)
+
+        records = list(client.stream_sample_clusters())
+
+        self.assertEqual(records, client.get_sample_clusters()['data'])
+
+    def test_stream_raw_fields(self):
+        client = self.client(chunk_size=7)
+
+        records = list(
+            client.stream_sample_clusters(raw_fields=['event_indices']))
+
+        for pk, record in enumerate(records):
+            self.assertIsInstance(record['event_indices'], bytes)
+            self.assertEqual(
+                json.loads(record['event_indices'].decode('utf-8')),
+                list(range(pk * 10)))
+
+    def test_stream_paginated_list(self):
+        client = self.client(chunk_size=7)
+
+        records = list(client.stream(client.get_subjects))
+
+        self.assertEqual(
+            [record['id'] for record in records],
+            list(range(1, SUBJECT_COUNT + 1)))
+        self.assertEqual(records, list(client.iter_subjects()))
+
+    def test_iterate_page_size(self):
+        client = self.client()
+
+        records = list(client.iter_subjects(page_size=5))
+
+        self.assertEqual(len(records), SUBJECT_COUNT)
+        self.assertEqual(len(self.stand_in.requests), 5)
+
+
+class RelatedObjectsTest(StandInTestCase):
+
+    def test_get_by_pks(self):
+        client = self.client()
+
+        subjects = client.get_subjects_by_pks([3, 1, 3, None, 99])
+
+        self.assertEqual(sorted(subjects), [1, 3])
+        self.assertEqual(subjects[3]['subject_code'], 'S3')
+        self.assertEqual(
+            sorted(self.stand_in.paths()),
+            ['/api/repository/subjects/%d/' % pk for pk in (1, 3, 99)])
+
+    def test_get_by_pks_with_in_filter(self):
+        client = self.client()
+
+        subjects = client.get_objects(
+            'SUBJECTS',
+            range(1, SUBJECT_COUNT + 5),
+            in_filter='id__in',
+            in_filter_size=10
+        )
+
+        self.assertEqual(sorted(subjects), list(range(1, SUBJECT_COUNT + 1)))
+
+        # PKs missing from the filtered lists are looked up one by one
+        paths = self.stand_in.paths()
+        self.assertEqual(paths.count('/api/repository/subjects/'), 3)
+        self.assertEqual(
+            sorted(paths[3:]),
+            ['/api/repository/subjects/%d/' % pk for pk in range(26, 30)])
+
+    def test_prefetch(self):
+        client = self.client()
+        samples = client.get_samples()['data']
+
+        fetched = client.prefetch(samples, ['subject_group', 'site_panel'])
+
+        self.assertEqual(
+            sorted(fetched), ['site_panel', 'subject', 'subject_group'])
+        for sample in samples:
+            subject = sample['subject_object']
+            self.assertEqual(subject['id'], sample['subject'])
+            self.assertEqual(
+                subject['subject_group_object']['id'],
+                subject['subject_group'])
+            self.assertEqual(sample['site_panel_object']['id'], 1)
+
+        # each related object is requested once
+        paths = self.stand_in.paths()
+        self.assertEqual(len(paths), len(set(paths)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,7 +5,11 @@ Unit test framework
 import unittest
 
 # include all the TestCase imports here
+from unit_test.test_client import PoolingTest, DownloadTest, RetryTest, \
+    StreamTest, RelatedObjectsTest
+from unit_test.test_aio_client import AsyncPoolingTest, AsyncDownloadTest, \
+    AsyncRetryTest, AsyncStreamTest, AsyncRelatedObjectsTest
 
 
 if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+    unittest.main()